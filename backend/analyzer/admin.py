@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import WebsiteAnalysis, LegalDocument
+from django.http import HttpResponse
+from django.utils import timezone
+from .models import WebsiteAnalysis, LegalDocument, DiscoveredDocument, SectionAnalysis, AnalysisProfile, AnalysisCheckpoint, WebhookDelivery
 
 
 @admin.register(WebsiteAnalysis)
@@ -95,6 +97,156 @@ class LegalDocumentAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('analysis')
 
 
+@admin.register(DiscoveredDocument)
+class DiscoveredDocumentAdmin(admin.ModelAdmin):
+    """Administration du cache de découverte des documents"""
+    
+    list_display = [
+        'domain',
+        'is_negative',
+        'discovered_at',
+        'expires_at'
+    ]
+    
+    search_fields = ['domain']
+    
+    readonly_fields = ['discovered_at']
+    
+    @admin.display(boolean=True, description="Aucun document")
+    def is_negative(self, obj):
+        return obj.is_negative
+
+
+@admin.register(SectionAnalysis)
+class SectionAnalysisAdmin(admin.ModelAdmin):
+    """Administration du cache des analyses par type de document"""
+    
+    list_display = [
+        'domain',
+        'document_type',
+        'created_at',
+        'expires_at'
+    ]
+    
+    list_filter = ['document_type']
+    
+    search_fields = ['domain']
+    
+    readonly_fields = ['prompt_hash', 'created_at']
+
+
+
+@admin.register(AnalysisProfile)
+class AnalysisProfileAdmin(admin.ModelAdmin):
+    """Administration des profils d'exécution"""
+    
+    list_display = [
+        'domain',
+        'profiler',
+        'trigger',
+        'duration',
+        'status_code',
+        'size',
+        'created_at'
+    ]
+    
+    list_filter = [
+        'profiler',
+        'trigger',
+        'created_at'
+    ]
+    
+    search_fields = ['domain', 'path']
+    
+    exclude = ['data']
+    
+    readonly_fields = [
+        'analysis', 'domain', 'path', 'profiler', 'trigger', 'duration',
+        'status_code', 'summary', 'size', 'created_at'
+    ]
+    
+    actions = ['download_profile']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description="Télécharger le profil")
+    def download_profile(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Sélectionnez un seul profil à télécharger.", level='warning')
+            return None
+        profile = queryset.first()
+        response = HttpResponse(bytes(profile.data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{profile.filename}"'
+        return response
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('analysis').defer('data')
+
+
+@admin.register(AnalysisCheckpoint)
+class AnalysisCheckpointAdmin(admin.ModelAdmin):
+    """Administration des analyses en cours ou interrompues"""
+    
+    list_display = [
+        'domain',
+        'stage',
+        'attempts',
+        'updated_at'
+    ]
+    
+    list_filter = [
+        'stage',
+        'updated_at'
+    ]
+    
+    search_fields = ['domain', 'url']
+    
+    exclude = ['documents']
+    
+    readonly_fields = ['created_at', 'updated_at']
+    
+    actions = ['restart']
+    
+    @admin.action(description="Recommencer l'analyse depuis le début")
+    def restart(self, request, queryset):
+        updated = queryset.update(stage='pending', discovered=[], documents=[], result={}, attempts=0, last_error='')
+        self.message_user(request, f"{updated} analyse(s) réinitialisée(s).")
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """Administration des notifications de fin d'analyse"""
+    
+    list_display = [
+        'domain',
+        'callback_url',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'delivered_at'
+    ]
+    
+    list_filter = [
+        'status',
+        'created_at'
+    ]
+    
+    search_fields = ['domain', 'callback_url']
+    
+    exclude = ['secret', 'claim']
+    
+    readonly_fields = ['analysis', 'created_at', 'updated_at', 'delivered_at', 'last_error']
+    
+    actions = ['retry']
+    
+    @admin.action(description="Renvoyer la notification")
+    def retry(self, request, queryset):
+        updated = queryset.exclude(analysis=None).update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), claim='')
+        self.message_user(request, f"{updated} notification(s) à renvoyer.")
+
+
 # Configuration du site admin
 admin.site.site_header = "Legal Document Analyzer - Administration"
 admin.site.site_title = "Legal Analyzer Admin"
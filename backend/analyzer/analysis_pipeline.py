@@ -0,0 +1,244 @@
+import logging
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .deadline import Deadline, DeadlineExceeded
+from .document_extractor import DocumentExtractor
+from .llm_utils import LLMAnalysisError, analyze_legal_documents
+from .metrics import span
+from .models import AnalysisCheckpoint, LegalDocument, WebsiteAnalysis
+from .snapshots import store_snapshots
+from .stats import record_analysis
+from .typed_analysis import analyze_by_document_type
+from .webhooks import notify_completion
+
+logger = logging.getLogger(__name__)
+
+
+# Champs de WebsiteAnalysis renseignés par l'analyse LLM
+ANALYSIS_FIELDS = (
+    'summary',
+    'key_points',
+    'what_you_accept',
+    'data_collected',
+    'data_usage',
+    'data_sharing',
+    'retention_period',
+    'critical_points',
+    'readability_score',
+    'risk_level',
+)
+
+
+def save_analysis(domain, url, documents, **fields):
+    """
+    Enregistre l'analyse d'un domaine et ses documents
+
+    Le domaine est unique : une nouvelle analyse remplace la précédente
+    (résultats et documents). Un échec (erreur, délai dépassé, aucun
+    document) ne remplace pas une analyse réussie : celle-ci reste publiée
+    et l'erreur est conservée avec la reprise (AnalysisCheckpoint).
+
+    Returns:
+        Tuple[WebsiteAnalysis, bool]: Analyse enregistrée, ou la dernière
+        analyse réussie conservée, et si l'analyse a été enregistrée
+    """
+    defaults = {
+        'url': url,
+        'summary': '',
+        'key_points': [],
+        'what_you_accept': '',
+        'data_collected': '',
+        'data_usage': '',
+        'data_sharing': '',
+        'retention_period': '',
+        'critical_points': '',
+        'readability_score': 5,
+        'risk_level': 'moderate',
+        'documents_found': [{
+            'type': doc['type'],
+            'url': doc['url'],
+            'title': doc['title']
+        } for doc in documents],
+        'content_hash': WebsiteAnalysis.hash_documents(documents),
+        'is_successful': True,
+        'error_message': '',
+        'created_at': timezone.now(),
+    }
+    defaults.update(fields)
+
+    with transaction.atomic():
+        previous = WebsiteAnalysis.objects.select_for_update().filter(domain=domain).values(
+            'is_successful', 'risk_level', 'readability_score').first()
+
+        if not defaults['is_successful'] and previous and previous['is_successful']:
+            logger.warning(f"Analyse de {domain} en échec, dernière analyse réussie conservée: {defaults['error_message']}")
+            AnalysisCheckpoint.objects.filter(domain=domain).update(
+                last_error=defaults['error_message'], updated_at=timezone.now())
+            return WebsiteAnalysis.objects.get(domain=domain), False
+
+        analysis, _ = WebsiteAnalysis.objects.update_or_create(domain=domain, defaults=defaults)
+
+        # Sauvegarder les documents individuels
+        analysis.documents.all().delete()
+        LegalDocument.objects.bulk_create([
+            LegalDocument(
+                analysis=analysis,
+                document_type=doc['type'],
+                url=doc['url'],
+                title=doc['title'],
+                content=doc['content'],
+                content_length=len(doc['content'])
+            ) for doc in documents
+        ])
+
+        # Agrégats et classements de /api/stats/
+        record_analysis(previous, analysis)
+        
+        # Réponses précalculées de /api/snapshot/ et /api/badge/
+        store_snapshots([analysis])
+
+    return analysis, True
+
+
+class AnalysisPipeline:
+    """
+    Analyse d'un site en étapes reprenables
+
+    discovered → fetched → analysed → persisted : la sortie de chaque étape
+    est enregistrée dans un AnalysisCheckpoint. Après un échec (délai,
+    erreur du LLM...), la tentative suivante reprend à la dernière étape
+    terminée : les documents déjà téléchargés ne le sont pas à nouveau.
+    """
+
+    def __init__(self, url: str, deadline: Optional[Deadline] = None):
+        self.url = url
+        self.domain = urlparse(url).netloc.lower()
+        self.deadline = deadline or Deadline()
+        self.checkpoint = AnalysisCheckpoint.resume(self.domain, url, settings.ANALYSIS_CHECKPOINT_TTL)
+        self.resumed_from = self.checkpoint.stage
+        self.timed_out = False
+        # Aucun document juridique trouvé (analyse enregistrée en échec, ou
+        # dernière analyse réussie conservée)
+        self.no_documents = False
+        self._extractor = None
+
+    @property
+    def documents(self) -> List[Dict]:
+        return self.checkpoint.documents
+
+    @property
+    def extractor(self) -> DocumentExtractor:
+        # Découverte et téléchargement partagent un budget qui garde du temps pour le LLM
+        if self._extractor is None:
+            llm_reserve = min(settings.ANALYSIS_LLM_RESERVE, (self.deadline.budget or 0) / 2)
+            self._extractor = DocumentExtractor(deadline=self.deadline.reserve(llm_reserve))
+        return self._extractor
+
+    def run(self) -> WebsiteAnalysis:
+        """
+        Exécute les étapes restantes
+
+        Returns:
+            WebsiteAnalysis: Analyse enregistrée (en échec si aucun document)
+
+        Raises:
+            DeadlineExceeded: Budget épuisé (l'avancement est conservé)
+            LLMAnalysisError: Échec du LLM après les nouvelles tentatives
+        """
+        if self.resumed_from != 'pending':
+            logger.info(f"Reprise de l'analyse de {self.domain} à l'étape {self.resumed_from}")
+
+        try:
+            if not self.checkpoint.reached('discovered'):
+                self._discover()
+            if not self.checkpoint.reached('fetched'):
+                self._fetch()
+
+            if not self.documents:
+                self.no_documents = True
+                return self._persist(
+                    summary="Aucun document juridique trouvé sur ce site.",
+                    is_successful=False,
+                    error_message="Aucun document juridique détecté"
+                )
+
+            if not self.checkpoint.reached('analysed'):
+                self._analyse()
+
+            with span('db_write'):
+                return self._persist(**{
+                    field: self.checkpoint.result[field]
+                    for field in ANALYSIS_FIELDS if field in self.checkpoint.result
+                })
+        except Exception as e:
+            self.checkpoint.fail(e)
+            raise
+
+    def _discover(self):
+        normalized_url = self.extractor.normalize_url(self.url)
+        with span('discovery'):
+            discovered = self.extractor.find_legal_document_urls(normalized_url)
+        self.deadline.check('découverte')
+
+        if not discovered and self.extractor.timed_out:
+            raise DeadlineExceeded("délai dépassé pendant la découverte des documents")
+        self.checkpoint.advance('discovered', discovered=discovered)
+
+    def _fetch(self):
+        discovered = self.checkpoint.discovered
+        fetched = {doc['url']: doc for doc in self.documents}
+        missing = [doc for doc in discovered if doc['url'] not in fetched]
+        if missing:
+            logger.info(f"Téléchargement de {len(missing)}/{len(discovered)} document(s) pour {self.domain}")
+            for doc in self.extractor.extract_documents(missing, self.domain):
+                fetched[doc['url']] = doc
+
+        documents = [fetched[doc['url']] for doc in discovered if doc['url'] in fetched]
+        complete = len(documents) == len(discovered)
+        # Extraction partielle : l'analyse continue avec les documents obtenus,
+        # les manquants seront téléchargés à la prochaine tentative
+        self.checkpoint.advance('fetched' if complete else None, documents=documents)
+        self.deadline.check('extraction')
+
+        if not complete:
+            self.timed_out = True
+            logger.warning(f"Extraction partielle pour {self.domain}: {len(documents)} document(s) dans le budget")
+            if not documents:
+                raise DeadlineExceeded("délai dépassé pendant l'extraction des documents")
+
+    def _analyse(self):
+        logger.info(f"Documents trouvés: {len(self.documents)}")
+
+        # per_type : un prompt par type de document, en parallèle et en cache
+        analyze = analyze_by_document_type if settings.LLM_ANALYSIS_MODE == 'per_type' else analyze_legal_documents
+        retries = settings.ANALYSIS_LLM_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                result = analyze(
+                    self.documents, self.domain, deadline=self.deadline, raise_errors=True)
+                break
+            except LLMAnalysisError as e:
+                delay = min(2 ** attempt, self.deadline.remaining())
+                if attempt == retries or delay >= self.deadline.remaining():
+                    raise
+                logger.warning(f"Analyse LLM de {self.domain} en échec ({str(e)}), nouvelle tentative dans {delay}s")
+                time.sleep(delay)
+
+        self.checkpoint.advance('analysed', result=result)
+
+    def _persist(self, **fields) -> WebsiteAnalysis:
+        analysis, saved = save_analysis(self.domain, self.url, self.documents, **fields)
+        if not saved:
+            # Échec écarté, dernière analyse réussie conservée : rien à
+            # notifier, la prochaine demande reprend à la découverte
+            self.checkpoint.advance('pending', discovered=[], documents=[])
+            return analysis
+        self.checkpoint.advance('persisted')
+        notify_completion(analysis)
+        return analysis
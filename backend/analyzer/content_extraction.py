@@ -0,0 +1,254 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+
+# Éléments jamais porteurs du contenu juridique
+NOISE_TAGS = ['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'iframe', 'svg', 'button']
+
+# Éléments dont le texte forme un bloc
+BLOCK_TAGS = {'p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'td', 'th', 'pre', 'blockquote', 'dd', 'dt'}
+
+# Conteneurs candidats au contenu principal
+CONTAINER_TAGS = {'div', 'section', 'article', 'main', 'body', 'td'}
+
+# Classes/identifiants typiques des blocs parasites et du contenu principal
+NEGATIVE_RE = re.compile(
+    r'cookie|consent|gdpr|banner|popup|modal|menu|navbar|breadcrumb|sidebar|share|social|newsletter|subscribe|promo|advert|footer|header',
+    re.IGNORECASE
+)
+POSITIVE_RE = re.compile(r'content|main|article|legal|terms|privacy|policy|body|text|post', re.IGNORECASE)
+
+# Un bloc dont plus de la moitié du texte est dans des liens est de la navigation
+MAX_LINK_DENSITY = 0.5
+
+# Longueur en dessous de laquelle un bloc très lié est ignoré
+MIN_BLOCK_LENGTH = 25
+
+# Au-delà de cette longueur, un bloc répété n'est pas considéré comme du boilerplate
+MAX_BOILERPLATE_LENGTH = 500
+
+# Blocs répétés plus courts, en tête ou en fin de document (bandeau, pied de
+# page) : retirés de tous les documents ; ailleurs, première occurrence gardée
+MAX_CHROME_LENGTH = 120
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _attributes(element: Tag) -> str:
+    classes = element.get('class') or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return ' '.join(classes) + ' ' + (element.get('id') or '')
+
+
+def _is_negative(element: Tag) -> bool:
+    attrs = _attributes(element)
+    return bool(attrs.strip()) and bool(NEGATIVE_RE.search(attrs)) and not POSITIVE_RE.search(attrs)
+
+
+def _is_chrome(element: Tag) -> bool:
+    """
+    Bloc parasite à retirer : classe/identifiant négatif, et peu de texte ou
+    surtout des liens (un conteneur « with-sidebar » qui englobe la page
+    entière est conservé)
+    """
+    if not _is_negative(element):
+        return False
+    text = _block_text(element)
+    if len(text) <= MAX_BOILERPLATE_LENGTH:
+        return True
+    return _link_length(element) / len(text) > MAX_LINK_DENSITY
+
+
+def _block_text(element: Tag) -> str:
+    return _WHITESPACE_RE.sub(' ', element.get_text(separator=' ')).strip()
+
+
+def _link_length(element: Tag) -> int:
+    return sum(len(_WHITESPACE_RE.sub(' ', a.get_text()).strip()) for a in element.find_all('a'))
+
+
+def _own_text(element: Tag) -> str:
+    """Texte porté directement par un conteneur (hors blocs enfants)"""
+    parts = [str(child) for child in element.children if isinstance(child, NavigableString)]
+    return _WHITESPACE_RE.sub(' ', ' '.join(parts)).strip()
+
+
+def _iter_blocks(root: Tag) -> Iterable[Tag]:
+    for element in root.find_all(True):
+        if element.name in BLOCK_TAGS:
+            # Un <li> contenant un <p> est représenté par ses paragraphes
+            if not element.find(BLOCK_TAGS):
+                yield element
+        elif element.name in CONTAINER_TAGS and len(_own_text(element)) >= MIN_BLOCK_LENGTH:
+            yield element
+
+
+def block_fingerprint(text: str) -> int:
+    """Empreinte stable d'un bloc, identique d'un processus à l'autre"""
+    return zlib.crc32(_WHITESPACE_RE.sub(' ', text).strip().lower().encode('utf-8'))
+
+
+def extract_main_content(html) -> Dict:
+    """
+    Extrait le titre et les blocs de texte du contenu principal d'une page
+
+    Chaque bloc est évalué selon sa densité de texte et sa densité de liens ;
+    le score est propagé aux conteneurs parents et le conteneur le mieux noté
+    est retenu. Les blocs de navigation restants y sont ensuite écartés.
+
+    Returns:
+        Dict: {'title': str, 'blocks': List[str]}
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = ""
+    title_tag = soup.find('title')
+    if title_tag:
+        title = title_tag.get_text(strip=True)
+
+    for element in soup(NOISE_TAGS):
+        element.decompose()
+    for element in soup.find_all(True):
+        if element.decomposed:
+            continue
+        if element.name not in ('html', 'body') and _is_chrome(element):
+            element.decompose()
+
+    if not title:
+        heading = soup.find(['h1', 'h2'])
+        if heading:
+            title = heading.get_text(strip=True)
+
+    root = soup.find('body') or soup
+    scores: Dict[int, float] = {}
+    containers: Dict[int, Tag] = {}
+    block_info = []
+
+    for block in _iter_blocks(root):
+        text = _own_text(block) if block.name in CONTAINER_TAGS and block.name not in BLOCK_TAGS else _block_text(block)
+        if not text:
+            continue
+        link_density = min(1.0, _link_length(block) / len(text)) if block.name in BLOCK_TAGS else 0.0
+        block_info.append((block, text, link_density))
+
+        if link_density > MAX_LINK_DENSITY:
+            continue
+        score = len(text) * (1 - link_density) + text.count('.') * 10
+
+        # Propagation au parent (plein) et au grand-parent (moitié)
+        weight = 1.0
+        for parent in block.parents:
+            if parent.name in CONTAINER_TAGS:
+                key = id(parent)
+                containers[key] = parent
+                bonus = 1.2 if POSITIVE_RE.search(_attributes(parent)) else 1.0
+                scores[key] = scores.get(key, 0.0) + score * weight * bonus
+                weight /= 2
+                if weight < 0.25:
+                    break
+
+    best = containers[max(scores, key=scores.get)] if scores else root
+
+    blocks = []
+    for block, text, link_density in block_info:
+        if block is not best and not any(parent is best for parent in block.parents):
+            continue
+        if link_density > MAX_LINK_DENSITY and len(text) < 4 * MIN_BLOCK_LENGTH:
+            continue
+        blocks.append(text)
+
+    return {'title': title, 'blocks': blocks}
+
+
+class DomainBoilerplate:
+    """
+    Mémoire des blocs répétés entre les documents d'un même site
+
+    Un bloc observé à l'identique dans plusieurs documents d'un domaine
+    est du boilerplate s'il se trouve en tête ou en fin de document
+    (bandeau cookies, menu, pied de page non balisé) ; une clause commune
+    à plusieurs documents n'est gardée qu'une fois. Le nombre de domaines
+    retenus, et de blocs par domaine, est borné (LRU).
+    """
+
+    def __init__(self, max_domains: int = 1000, min_documents: int = 2, max_blocks: int = 2000):
+        self.max_domains = max_domains
+        self.min_documents = min_documents
+        self.max_blocks = max_blocks
+        self._domains: "OrderedDict[str, OrderedDict[int, set]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, domain: str, url: str, blocks: List[str]):
+        """Enregistre les blocs courts d'un document du domaine"""
+        with self._lock:
+            seen = self._domains.pop(domain, None) or OrderedDict()
+            self._domains[domain] = seen
+            for text in blocks:
+                if len(text) <= MAX_BOILERPLATE_LENGTH:
+                    fingerprint = block_fingerprint(text)
+                    urls = seen.pop(fingerprint, None) or set()
+                    seen[fingerprint] = urls
+                    if len(urls) < self.min_documents:
+                        urls.add(url)
+            while len(seen) > self.max_blocks:
+                seen.popitem(last=False)
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+
+    def is_boilerplate(self, domain: str, text: str) -> bool:
+        """Bloc observé dans plusieurs documents du domaine"""
+        if len(text) > MAX_BOILERPLATE_LENGTH:
+            return False
+        seen = self._domains.get(domain)
+        if not seen:
+            return False
+        return len(seen.get(block_fingerprint(text), ())) >= self.min_documents
+
+    def filter(self, domain: str, blocks: List[str], kept: Optional[set] = None) -> List[str]:
+        """
+        Retire les blocs reconnus comme boilerplate pour ce domaine
+
+        Args:
+            kept: Empreintes des blocs répétés déjà gardés, partagées par les
+                documents d'une même extraction (première occurrence gardée)
+        """
+        repeated = [self.is_boilerplate(domain, text) for text in blocks]
+
+        def is_chrome(index: int) -> bool:
+            return repeated[index] and len(blocks[index]) <= MAX_CHROME_LENGTH
+
+        # Blocs courts répétés en tête et en fin de document
+        start = 0
+        while start < len(blocks) and is_chrome(start):
+            start += 1
+        end = len(blocks)
+        while end > start and is_chrome(end - 1):
+            end -= 1
+
+        kept = set() if kept is None else kept
+        filtered = []
+        for index, text in enumerate(blocks):
+            if repeated[index]:
+                fingerprint = block_fingerprint(text)
+                if index < start or index >= end or fingerprint in kept:
+                    continue
+                kept.add(fingerprint)
+            filtered.append(text)
+        return filtered
+
+    def clear(self, domain: Optional[str] = None):
+        with self._lock:
+            if domain is None:
+                self._domains.clear()
+            else:
+                self._domains.pop(domain, None)
+
+
+# Mémoire partagée par les extracteurs du processus
+domain_boilerplate = DomainBoilerplate()
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """Budget de temps de l'analyse épuisé (ou client déconnecté)"""
+
+
+class Deadline:
+    """
+    Budget de temps d'une analyse, partagé par toutes ses étapes
+
+    Chaque appel bloquant prend pour délai `timeout(plafond)` : le minimum
+    entre son plafond habituel et ce qui reste du budget. L'annulation
+    (déconnexion du client) est coopérative : les étapes consultent
+    `expired` entre deux opérations.
+    """
+
+    def __init__(self, budget: Optional[float] = None, cancelled: Optional[threading.Event] = None,
+                 parent: Optional['Deadline'] = None):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget if budget is not None else None
+        self.cancelled = cancelled if cancelled is not None else threading.Event()
+        self.parent = parent
+
+    def remaining(self) -> float:
+        """Temps restant en secondes (infini sans budget, 0 si annulé)"""
+        if self.is_cancelled:
+            return 0.0
+        remaining = float('inf') if self.expires_at is None else max(0.0, self.expires_at - time.monotonic())
+        if self.parent is not None:
+            remaining = min(remaining, self.parent.remaining())
+        return remaining
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set() or (self.parent is not None and self.parent.is_cancelled)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self, stage: str = ''):
+        """Lève DeadlineExceeded si le budget est épuisé"""
+        if self.expired:
+            reason = "client déconnecté" if self.is_cancelled else "délai dépassé"
+            raise DeadlineExceeded(f"{reason}{' pendant ' + stage if stage else ''}")
+
+    def timeout(self, cap: float, stage: str = '') -> float:
+        """Délai à accorder à un appel bloquant plafonné à `cap` secondes"""
+        self.check(stage)
+        return min(cap, self.remaining())
+
+    def reserve(self, seconds: float) -> 'Deadline':
+        """
+        Sous-budget qui expire `seconds` avant celui-ci (pour garder du temps
+        aux étapes suivantes), annulé avec lui
+        """
+        if self.expires_at is None:
+            return Deadline(parent=self)
+        return Deadline(max(0.0, self.remaining() - seconds), parent=self)
+
+
+class ClientDisconnectMiddleware:
+    """
+    Expose `request.disconnected` (threading.Event), positionné quand le
+    client se déconnecte avant la réponse
+
+    Sous ASGI, Django annule la tâche de la requête à la déconnexion : la
+    vue synchrone continue dans son thread, mais les étapes de l'analyse
+    voient l'annulation via leur `Deadline` et s'arrêtent. Sous WSGI,
+    l'événement n'est jamais positionné.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.disconnected = threading.Event()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.disconnected = threading.Event()
+        try:
+            return await self.get_response(request)
+        except asyncio.CancelledError:
+            logger.info(f"Client déconnecté, annulation de {request.path}")
+            request.disconnected.set()
+            raise
@@ -1,52 +1,61 @@
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
 import logging
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .content_extraction import domain_boilerplate, extract_main_content
+from .deadline import Deadline, DeadlineExceeded
+from .document_formats import MAX_CONTENT_LENGTH, read_capped, title_from_url
+from .fetch_scheduler import ScheduledSession, get_scheduler
+from .headless_render import get_render_pool, needs_render
+from .http_transport import get_session
+from .languages import detect_page_language
+from .legal_patterns import LEGAL_PATTERNS, common_paths, identify_document_type
+from .metrics import CACHE_REQUESTS, FALLBACKS, FETCH_ERRORS, bind_trace, error_type, span
+from .models import DiscoveredDocument
+from .parsing_service import parse_document, parse_links
+from .sitemap_discovery import SitemapDiscovery
 
 logger = logging.getLogger(__name__)
 
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+# Threads dédiés à la découverte par sitemap et au téléchargement des
+# documents, partagés par les extracteurs
+_discovery_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sitemap-discovery')
+_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='document-fetch')
+
 
 class DocumentExtractor:
     """Classe pour extraire les documents juridiques des sites web"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, deadline: Optional[Deadline] = None):
+        # Budget de temps de l'extraction (illimité par défaut) : chaque
+        # requête, attente ou analyse prend au plus ce qu'il en reste
+        self.deadline = deadline or Deadline()
+        
+        # Session partagée par le processus (pool de connexions, cache DNS),
+        # dont les requêtes passent par l'ordonnanceur de politesse
+        self.session = ScheduledSession(get_session(), get_scheduler(), self.deadline)
+        
+        # Documents abandonnés faute de temps lors de la dernière extraction
+        self.timed_out = False
+        
+        # Indique si la dernière découverte provient du cache par domaine
+        self.discovery_cached = False
         
         # Patterns pour identifier les documents juridiques
-        self.legal_patterns = {
-            'terms': [
-                r'terms?[-_\s]*(of[-_\s]*)?use',
-                r'terms?[-_\s]*(of[-_\s]*)?service',
-                r'terms?[-_\s]*and[-_\s]*conditions?',
-                r'conditions?[-_\s]*(of[-_\s]*)?use',
-                r'user[-_\s]*agreement',
-                r'cgu',
-                r'cgv'
-            ],
-            'privacy': [
-                r'privacy[-_\s]*policy',
-                r'privacy[-_\s]*notice',
-                r'data[-_\s]*protection',
-                r'confidentialit[eé]',
-                r'donn[eé]es[-_\s]*personnelles'
-            ],
-            'cookies': [
-                r'cookie[-_\s]*policy',
-                r'cookie[-_\s]*notice',
-                r'cookies?'
-            ],
-            'legal': [
-                r'legal[-_\s]*notice',
-                r'mentions?[-_\s]*l[eé]gales?',
-                r'legal[-_\s]*information',
-                r'imprint'
-            ]
-        }
+        self.legal_patterns = LEGAL_PATTERNS
+        
+        # Langue de la page d'accueil (patterns et URLs communes), None si inconnue
+        self.language = None
+        
+        # Statut HTTP de la page d'accueil, None si elle n'a pas pu être lue
+        # (erreur DNS, connexion interrompue...)
+        self.homepage_status = None
     
     def normalize_url(self, url: str) -> str:
         """Normalise l'URL d'entrée"""
@@ -66,82 +75,103 @@ class DocumentExtractor:
         Returns:
             List[Dict]: Liste des documents trouvés avec type et URL
         """
+        domain = self.get_domain(base_url)
+        
+        # Réutiliser une découverte récente (y compris « aucun document »)
+        cached = DiscoveredDocument.lookup(domain)
+        self.discovery_cached = cached is not None
+        CACHE_REQUESTS.inc(cache='discovery', result='hit' if self.discovery_cached else 'miss')
+        if cached is not None:
+            logger.info(f"Découverte en cache pour {domain}: {len(cached)} document(s)")
+            return cached
+        
+        documents = self._discover_legal_documents(base_url)
+        
+        # Découverte interrompue : résultat partiel, à ne pas mettre en cache
+        if self.deadline.expired:
+            self.timed_out = True
+            return documents
+        
+        # « Aucun document » n'est mis en cache que si le site a répondu :
+        # page d'accueil lue, ou refusée (4xx) ; pas après une panne passagère
+        if not documents and (self.homepage_status is None or self.homepage_status >= 500):
+            logger.info(f"Aucun document pour {domain} (page d'accueil indisponible), non mis en cache")
+            return documents
+        
+        ttl = settings.DISCOVERY_CACHE_TTL if documents else settings.DISCOVERY_NEGATIVE_TTL
+        DiscoveredDocument.store(domain, documents, ttl)
+        
+        return documents
+    
+    def _discover_legal_documents(self, base_url: str) -> List[Dict[str, str]]:
+        """Découverte complète : page d'accueil, sitemaps puis URLs communes"""
+        # Les sitemaps sont explorés en parallèle de la page d'accueil
+        discovery = SitemapDiscovery(self.session, self._identify_document_type, self.deadline)
+        sitemap_future = _discovery_pool.submit(bind_trace(discovery.discover), base_url)
+        
+        self.homepage_status = None
         try:
-            response = self.session.get(base_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            found_documents = []
-            
-            # Chercher dans tous les liens
-            links = soup.find_all('a', href=True)
-            
-            for link in links:
-                href = link.get('href', '').lower()
-                text = link.get_text(strip=True).lower()
-                
-                # Construire l'URL complète
-                full_url = urljoin(base_url, link['href'])
-                
-                # Identifier le type de document
-                doc_type = self._identify_document_type(href, text)
-                
-                if doc_type:
-                    found_documents.append({
-                        'type': doc_type,
-                        'url': full_url,
-                        'text': link.get_text(strip=True)
-                    })
-            
-            # Supprimer les doublons
-            unique_docs = []
-            seen_urls = set()
-            
-            for doc in found_documents:
-                if doc['url'] not in seen_urls:
-                    unique_docs.append(doc)
-                    seen_urls.add(doc['url'])
-            
-            # Essayer des URLs communes si rien n'est trouvé
-            if not unique_docs:
-                unique_docs = self._try_common_urls(base_url)
-            
-            return unique_docs
-            
+            unique_docs = self._scan_homepage(base_url)
         except Exception as e:
             logger.error(f"Erreur lors de la recherche des documents: {str(e)}")
-            return self._try_common_urls(base_url)
+            self.homepage_status = getattr(getattr(e, 'response', None), 'status_code', None)
+            unique_docs = []
+        
+        # Compléter avec les types de documents trouvés uniquement dans les sitemaps
+        try:
+            sitemap_docs = sitemap_future.result(timeout=self.deadline.timeout(15, 'découverte par sitemap'))
+        except Exception as e:
+            logger.warning(f"Découverte par sitemap abandonnée: {str(e)}")
+            sitemap_docs = []
+        
+        # Respecter le Crawl-delay de robots.txt pour les téléchargements suivants
+        if discovery.crawl_delay:
+            self.session.scheduler.set_crawl_delay(self.get_domain(base_url), discovery.crawl_delay)
+        
+        found_types = {doc['type'] for doc in unique_docs}
+        seen_urls = {doc['url'] for doc in unique_docs}
+        for doc in sitemap_docs:
+            if doc['type'] not in found_types and doc['url'] not in seen_urls:
+                unique_docs.append(doc)
+                seen_urls.add(doc['url'])
+        
+        # Essayer des URLs communes (de la langue du site) si rien n'est trouvé
+        if not unique_docs:
+            FALLBACKS.inc(kind='common_urls')
+            unique_docs = self._try_common_urls(base_url, self.language)
+        
+        return unique_docs
+    
+    def _scan_homepage(self, base_url: str) -> List[Dict[str, str]]:
+        """Cherche les liens vers les documents juridiques sur la page d'accueil"""
+        with span('fetch'):
+            response = self.session.get(base_url, timeout=10, stream=True)
+            with response:
+                self.homepage_status = response.status_code
+                response.raise_for_status()
+                content = read_capped(response, deadline=self.deadline)
+        
+        # Analyse HTML et classification des liens (patterns de la langue de
+        # la page) dans le pool de processus
+        with span('parse'):
+            self.language = detect_page_language(content)
+            return parse_links(content, base_url, timeout=self.deadline.timeout(settings.PARSER_TIMEOUT),
+                               language=self.language)
     
     def _identify_document_type(self, href: str, text: str) -> str:
         """Identifie le type de document basé sur l'URL et le texte"""
-        combined = f"{href} {text}".lower()
-        
-        for doc_type, patterns in self.legal_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, combined, re.IGNORECASE):
-                    return doc_type
-        
-        return None
+        return identify_document_type(href, text)
     
-    def _try_common_urls(self, base_url: str) -> List[Dict[str, str]]:
+    def _try_common_urls(self, base_url: str, language: Optional[str] = None) -> List[Dict[str, str]]:
         """Essaie des URLs communes pour les documents juridiques"""
-        common_paths = [
-            ('/terms', 'terms'),
-            ('/terms-of-use', 'terms'),
-            ('/terms-of-service', 'terms'),
-            ('/privacy', 'privacy'),
-            ('/privacy-policy', 'privacy'),
-            ('/legal', 'legal'),
-            ('/cookies', 'cookies'),
-            ('/cgu', 'terms'),
-            ('/cgv', 'terms'),
-            ('/mentions-legales', 'legal'),
-            ('/confidentialite', 'privacy')
-        ]
-        
         found_documents = []
         
-        for path, doc_type in common_paths:
+        for path, doc_type in common_paths(language):
+            if self.deadline.expired:
+                break
+            # Un document par type : inutile d'essayer les autres chemins
+            if any(doc['type'] == doc_type for doc in found_documents):
+                continue
             try:
                 test_url = urljoin(base_url, path)
                 response = self.session.head(test_url, timeout=5)
@@ -164,70 +194,92 @@ class DocumentExtractor:
         Returns:
             Dict: Contenu du document avec titre et texte
         """
+        document = self._extract_blocks(url)
+        blocks = document.pop('blocks')
+        if blocks is not None:
+            domain = self.get_domain(url)
+            document['content'] = self._clean_content(
+                '\n'.join(domain_boilerplate.filter(domain, blocks))
+            )
+        return document
+    
+    def _extract_blocks(self, url: str) -> Dict:
+        """
+        Télécharge un document et en extrait les blocs du contenu principal
+        
+        Returns:
+            Dict: Titre, URL et blocs de texte (None en cas d'erreur)
+        """
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Supprimer les éléments non pertinents
-            for element in soup(['script', 'style', 'nav', 'header', 'footer']):
-                element.decompose()
+            with span('fetch'):
+                response = self.session.get(url, timeout=15, stream=True)
+                with response:
+                    response.raise_for_status()
+                    content = read_capped(response, deadline=self.deadline)
             
-            # Extraire le titre
-            title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text(strip=True)
+            with span('parse'):
+                extracted = parse_document(
+                    content, response.headers.get('Content-Type', ''), url,
+                    timeout=self.deadline.timeout(settings.PARSER_TIMEOUT)
+                )
             
-            # Chercher le titre dans les balises h1, h2
-            if not title:
-                for tag in soup.find_all(['h1', 'h2']):
-                    title = tag.get_text(strip=True)
-                    break
-            
-            # Extraire le contenu principal
-            content = ""
-            
-            # Essayer de trouver le contenu principal
-            main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=re.compile(r'content|main|body'))
-            
-            if main_content:
-                content = main_content.get_text(separator='\n', strip=True)
-            else:
-                # Fallback: prendre tout le body
-                body = soup.find('body')
-                if body:
-                    content = body.get_text(separator='\n', strip=True)
-            
-            # Nettoyer le contenu
-            content = self._clean_content(content)
+            # Page rendue côté client : passer par le navigateur headless
+            text_length = sum(map(len, extracted['blocks']))
+            if extracted['format'] == 'html' and needs_render(len(content), text_length):
+                extracted = self._render_blocks(url, extracted)
             
             return {
-                'title': title,
-                'content': content,
-                'url': url
+                'title': extracted['title'] or title_from_url(url),
+                'content': '',
+                'url': url,
+                'blocks': extracted['blocks']
             }
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            # Délai de la requête réduit au budget restant : c'est le budget qui a expiré
+            if self.deadline.expired:
+                raise DeadlineExceeded(f"délai dépassé pendant le téléchargement de {url}") from e
+            FETCH_ERRORS.inc(error=error_type(e))
             logger.error(f"Erreur lors de l'extraction du contenu de {url}: {str(e)}")
             return {
                 'title': f"Erreur d'extraction",
                 'content': f"Impossible d'extraire le contenu: {str(e)}",
-                'url': url
+                'url': url,
+                'blocks': None
             }
     
+    def _render_blocks(self, url: str, extracted: Dict) -> Dict:
+        """Extrait le contenu de la page rendue, s'il est plus riche que la version statique"""
+        render_pool = get_render_pool()
+        if render_pool is None or self.deadline.remaining() < render_pool.timeout:
+            return extracted
+        
+        FALLBACKS.inc(kind='headless_render')
+        with span('render'):
+            with self.session.scheduler.slot(url, self.deadline):
+                html = render_pool.render(url)
+            if not html:
+                return extracted
+            
+            rendered = extract_main_content(html)
+        if sum(map(len, rendered['blocks'])) > sum(map(len, extracted['blocks'])):
+            logger.info(f"Contenu obtenu par rendu headless pour {url}")
+            return rendered
+        return extracted
+    
     def _clean_content(self, content: str) -> str:
         """Nettoie le contenu extrait"""
         # Supprimer les lignes vides multiples
-        content = re.sub(r'\n\s*\n', '\n\n', content)
+        content = _BLANK_LINES_RE.sub('\n\n', content)
         
         # Supprimer les espaces en début et fin
         content = content.strip()
         
         # Limiter la taille si trop long
-        if len(content) > 100000:
-            content = content[:100000] + "... [contenu tronqué]"
+        if len(content) > MAX_CONTENT_LENGTH:
+            content = content[:MAX_CONTENT_LENGTH] + "... [contenu tronqué]"
         
         return content
     
@@ -242,17 +294,58 @@ class DocumentExtractor:
         domain = self.get_domain(normalized_url)
         
         # Trouver les URLs des documents
-        document_urls = self.find_legal_document_urls(normalized_url)
+        with span('discovery'):
+            document_urls = self.find_legal_document_urls(normalized_url)
         
-        # Extraire le contenu de chaque document
+        return self.extract_documents(document_urls, domain), domain
+    
+    def extract_documents(self, document_urls: List[Dict[str, str]], domain: str) -> List[Dict]:
+        """
+        Télécharge et nettoie les documents découverts
+        
+        Returns:
+            List[Dict]: Documents extraits (titre, URL, contenu, type), dans
+            l'ordre de `document_urls` ; ceux abandonnés faute de temps sont omis
+        """
+        # Extraire les blocs de chaque document, en parallèle : l'ordonnanceur
+        # limite le nombre de requêtes simultanées vers le site
+        extract_blocks = bind_trace(self._extract_blocks)
+        futures = [_fetch_pool.submit(extract_blocks, doc_info['url']) for doc_info in document_urls]
+        remaining = self.deadline.remaining()
+        done, _ = wait(futures, timeout=None if remaining == float('inf') else remaining)
+        
+        extracted = []
+        for doc_info, future in zip(document_urls, futures):
+            if future not in done or future.exception() is not None:
+                # Budget épuisé : garder les documents déjà extraits
+                future.cancel()
+                self.timed_out = True
+                logger.warning(f"Document abandonné faute de temps: {doc_info['url']}")
+                continue
+            document = future.result()
+            if document['blocks'] is not None:
+                domain_boilerplate.observe(domain, document['url'], document['blocks'])
+            extracted.append((doc_info, document))
+        
+        # Une URL en cache devenue inaccessible : redécouvrir à la prochaine analyse
+        if self.discovery_cached and any(document['blocks'] is None for _, document in extracted):
+            DiscoveredDocument.invalidate(domain)
+        
+        # Retirer les blocs répétés d'un document à l'autre du site
         documents = []
-        for doc_info in document_urls:
-            content = self.extract_document_content(doc_info['url'])
-            content.update({
-                'type': doc_info['type'],
-                'link_text': doc_info['text']
-            })
-            documents.append(content)
-        
-        return documents, domain
+        kept = set()
+        with span('clean'):
+            for doc_info, document in extracted:
+                blocks = document.pop('blocks')
+                if blocks is not None:
+                    document['content'] = self._clean_content(
+                        '\n'.join(domain_boilerplate.filter(domain, blocks, kept))
+                    )
+                document.update({
+                    'type': doc_info['type'],
+                    'link_text': doc_info['text']
+                })
+                documents.append(document)
+        
+        return documents
 
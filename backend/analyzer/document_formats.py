@@ -0,0 +1,221 @@
+import io
+import logging
+import re
+import zipfile
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import iterparse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .content_extraction import extract_main_content
+from .legal_patterns import identify_document_type
+
+logger = logging.getLogger(__name__)
+
+
+# Taille maximale du contenu extrait (caractères) et du fichier téléchargé (octets)
+MAX_CONTENT_LENGTH = 100000
+MAX_DOCUMENT_BYTES = 20 * 1024 * 1024
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+_EXTENSIONS = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.txt': 'text',
+    '.md': 'text',
+}
+
+
+def detect_format(content: bytes, content_type: str = '', url: str = '') -> str:
+    """
+    Détermine le format d'un document : en-tête Content-Type, extension de
+    l'URL puis signature du fichier
+
+    Returns:
+        str: 'html', 'pdf', 'docx' ou 'text'
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type == 'application/pdf':
+        return 'pdf'
+    if content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+        return 'docx'
+    if content_type in ('text/plain', 'text/markdown'):
+        return 'text'
+
+    path = urlparse(url).path.lower()
+    for extension, doc_format in _EXTENSIONS.items():
+        if path.endswith(extension):
+            return doc_format
+
+    if content.startswith(b'%PDF-'):
+        return 'pdf'
+    if content.startswith(b'PK\x03\x04') and b'word/' in content[:4096]:
+        return 'docx'
+    return 'html'
+
+
+def _capped(blocks: Iterator[str], max_length: int) -> List[str]:
+    """Accumule les blocs jusqu'à la taille maximale, puis arrête la lecture"""
+    kept = []
+    total = 0
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        kept.append(block)
+        total += len(block)
+        if total >= max_length:
+            break
+    return kept
+
+
+def _iter_pdf_pages(content: bytes) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    # Les pages sont décodées une à une : l'extraction s'arrête dès que la
+    # taille maximale est atteinte, sans parcourir le reste du fichier
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        yield from _PARAGRAPH_SPLIT_RE.split(text)
+
+
+def _pdf_title(content: bytes) -> str:
+    from pypdf import PdfReader
+
+    try:
+        metadata = PdfReader(io.BytesIO(content)).metadata
+        return (metadata.title or '') if metadata else ''
+    except Exception:
+        return ''
+
+
+def _iter_docx_paragraphs(content: bytes) -> Iterator[str]:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        with archive.open('word/document.xml') as document:
+            parts = []
+            for _, element in iterparse(document, events=('end',)):
+                if element.tag == f'{_WORD_NS}t' and element.text:
+                    parts.append(element.text)
+                elif element.tag == f'{_WORD_NS}tab':
+                    parts.append('\t')
+                elif element.tag == f'{_WORD_NS}p':
+                    yield ''.join(parts)
+                    parts = []
+                    element.clear()
+
+
+def _decode_text(content: bytes, content_type: str) -> str:
+    match = re.search(r'charset=([\w-]+)', content_type or '', re.IGNORECASE)
+    for encoding in ([match.group(1)] if match else []) + ['utf-8', 'latin-1']:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode('utf-8', errors='replace')
+
+
+def extract_document(content: bytes, content_type: str = '', url: str = '',
+                     max_length: int = MAX_CONTENT_LENGTH) -> Dict:
+    """
+    Extrait le titre et les blocs de texte d'un document selon son format
+
+    Fonction pure (aucune dépendance à Django), exécutable dans un processus
+    séparé : seul le résultat compact repasse dans le processus appelant.
+
+    Returns:
+        Dict: {'title': str, 'blocks': List[str], 'format': str}
+    """
+    doc_format = detect_format(content, content_type, url)
+
+    if doc_format == 'pdf':
+        try:
+            blocks = _capped(_iter_pdf_pages(content), max_length)
+        except ImportError:
+            raise ValueError("Extraction PDF indisponible : installez pypdf") from None
+        return {'title': _pdf_title(content), 'blocks': blocks, 'format': doc_format}
+
+    if doc_format == 'docx':
+        return {
+            'title': '',
+            'blocks': _capped(_iter_docx_paragraphs(content), max_length),
+            'format': doc_format
+        }
+
+    if doc_format == 'text':
+        text = _decode_text(content, content_type)
+        return {
+            'title': '',
+            'blocks': _capped(iter(_PARAGRAPH_SPLIT_RE.split(text)), max_length),
+            'format': doc_format
+        }
+
+    extracted = extract_main_content(content)
+    extracted['format'] = doc_format
+    return extracted
+
+
+def extract_legal_links(content: bytes, base_url: str, language: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Trouve les liens vers des documents juridiques dans une page HTML
+
+    Seules les balises <a> sont construites (SoupStrainer), le reste de la
+    page n'est pas transformé en arbre.
+
+    Args:
+        language: Langue de la page (patterns de cette langue), toutes si None
+
+    Returns:
+        List[Dict]: Documents trouvés avec type, URL et texte du lien, sans doublon
+    """
+    soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer('a', href=True))
+
+    found_documents = []
+    seen_urls = set()
+    for link in soup.find_all('a', href=True):
+        text = link.get_text(strip=True)
+        doc_type = identify_document_type(link['href'].lower(), text.lower(), language)
+        if not doc_type:
+            continue
+
+        full_url = urljoin(base_url, link['href'])
+        if full_url in seen_urls:
+            continue
+        seen_urls.add(full_url)
+        found_documents.append({
+            'type': doc_type,
+            'url': full_url,
+            'text': text
+        })
+
+    return found_documents
+
+
+def title_from_url(url: str) -> str:
+    """Titre par défaut d'un document sans métadonnées (nom du fichier)"""
+    name = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+    return re.sub(r'\.\w+$', '', name).replace('-', ' ').replace('_', ' ').strip()
+
+
+def read_capped(response, max_bytes: int = MAX_DOCUMENT_BYTES, deadline=None) -> bytes:
+    """
+    Lit le corps d'une réponse en streaming, en s'arrêtant à `max_bytes`
+
+    Avec une `deadline`, le budget est vérifié entre deux morceaux : le
+    délai de lecture de requests ne borne que l'attente de chaque morceau.
+    """
+    chunks = []
+    total = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        if deadline is not None:
+            deadline.check(f"lecture de {response.url}")
+        chunks.append(chunk)
+        total += len(chunk)
+        if total >= max_bytes:
+            logger.info(f"Document tronqué à {max_bytes} octets: {response.url}")
+            break
+    return b''.join(chunks)
@@ -0,0 +1,164 @@
+import csv
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .models import LegalDocument, WebsiteAnalysis
+
+FORMATS = ('ndjson', 'csv')
+
+# Champs exportables ; `documents` (ou `documents.<champ>`) ajoute les documents de l'analyse
+ANALYSIS_FIELDS = (
+    'domain',
+    'url',
+    'summary',
+    'key_points',
+    'what_you_accept',
+    'data_collected',
+    'data_usage',
+    'data_sharing',
+    'retention_period',
+    'critical_points',
+    'readability_score',
+    'risk_level',
+    'documents_found',
+    'content_hash',
+    'is_successful',
+    'error_message',
+    'created_at',
+    'updated_at',
+)
+DOCUMENT_FIELDS = (
+    'document_type',
+    'url',
+    'title',
+    'content',
+    'content_length',
+    'extracted_at',
+)
+
+# Taille des blocs compressés envoyés au client
+GZIP_CHUNK_SIZE = 64 * 1024
+
+
+def parse_fields(value: Optional[str]) -> Tuple[List[str], List[str]]:
+    """
+    Sélection de champs : « domain,risk_level,documents.url » → (champs de
+    l'analyse, champs des documents) ; tous les champs par défaut
+
+    Raises:
+        ValueError: Champ inconnu
+    """
+    if not value:
+        return list(ANALYSIS_FIELDS), list(DOCUMENT_FIELDS)
+
+    fields, document_fields = [], []
+    for name in (name.strip() for name in value.split(',')):
+        if not name:
+            continue
+        if name == 'documents':
+            document_fields.extend(field for field in DOCUMENT_FIELDS if field not in document_fields)
+        elif name.startswith('documents.') and name[len('documents.'):] in DOCUMENT_FIELDS:
+            if name[len('documents.'):] not in document_fields:
+                document_fields.append(name[len('documents.'):])
+        elif name in ANALYSIS_FIELDS:
+            if name not in fields:
+                fields.append(name)
+        else:
+            raise ValueError(f"Champ inconnu: {name}")
+    return fields, document_fields
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_records(fields: List[str], document_fields: List[str], chunk_size: int = 500) -> Iterator[Dict]:
+    """
+    Analyses (et leurs documents) par lots de `chunk_size` : curseur côté
+    serveur si la base le permet, seules les colonnes demandées sont lues
+
+    La mémoire utilisée dépend de `chunk_size`, pas du nombre d'analyses :
+    les lignes sont lues en dictionnaires (pas d'instances de modèles, dont
+    les références croisées avec les documents préchargés ne seraient
+    libérées que par le ramasse-miettes).
+    """
+    rows = WebsiteAnalysis.objects.order_by('pk').values('pk', *fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        documents = defaultdict(list)
+        if document_fields:
+            for document in LegalDocument.objects.filter(
+                analysis_id__in=[row['pk'] for row in chunk]
+            ).order_by('analysis_id', 'pk').values('analysis_id', *document_fields).iterator(chunk_size=chunk_size):
+                analysis_id = document.pop('analysis_id')
+                documents[analysis_id].append({field: _value(document[field]) for field in document_fields})
+
+        for row in chunk:
+            record = {field: _value(row[field]) for field in fields}
+            if document_fields:
+                record['documents'] = documents.pop(row['pk'], [])
+            yield record
+
+
+def ndjson_lines(records: Iterable[Dict]) -> Iterator[bytes]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False).encode() + b'\n'
+
+
+class _Line:
+    """Pseudo-fichier pour csv.writer : retourne la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records: Iterable[Dict], fields: List[str], document_fields: List[str]) -> Iterator[bytes]:
+    """Lignes CSV ; les champs structurés (listes, documents) sont encodés en JSON"""
+    writer = csv.writer(_Line())
+    columns = fields + (['documents'] if document_fields else [])
+    yield writer.writerow(columns).encode()
+    for record in records:
+        yield writer.writerow([
+            json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+            for value in (record[column] for column in columns)
+        ]).encode()
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compresse un flux à la volée (format gzip), par blocs d'environ 64 Ko"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            buffer.append(compressed)
+            size += len(compressed)
+        if size >= GZIP_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(compressor.flush())
+    yield b''.join(buffer)
+
+
+def export_stream(export_format: str, fields: List[str], document_fields: List[str],
+                  compress: bool = False, chunk_size: int = 500) -> Iterator[bytes]:
+    """
+    Export des analyses au format NDJSON (une analyse par ligne, documents
+    imbriqués) ou CSV, éventuellement compressé en gzip
+    """
+    records = iter_records(fields, document_fields, chunk_size)
+    if export_format == 'csv':
+        lines = csv_lines(records, fields, document_fields)
+    else:
+        lines = ndjson_lines(records)
+    return gzip_stream(lines) if compress else lines
@@ -1,2 +1,2 @@
-
-
+# Conservé pour compatibilité : l'extraction est implémentée dans json_extractor
+from .json_extractor import extract_json, validate_analysis  # noqa: F401
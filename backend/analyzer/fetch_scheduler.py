@@ -0,0 +1,336 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from .deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+# Statuts indiquant que l'hôte demande de ralentir
+BACKOFF_STATUSES = (429, 503)
+
+# Nombre d'hôtes dont on conserve l'état (délais de crawl, pénalités)
+MAX_TRACKED_HOSTS = 10000
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` requêtes par seconde, rafales jusqu'à `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Temps d'attente avant qu'un jeton soit disponible"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _HostState:
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.active = 0
+        self.waiting = deque()
+        self.not_before = 0.0
+        self.crawl_delay = 0.0
+        self.failures = 0
+
+
+class FetchScheduler:
+    """
+    Ordonnanceur de requêtes respectueux des hôtes
+
+    - plafond global de requêtes simultanées ;
+    - par hôte : nombre de requêtes simultanées, seau à jetons et Crawl-delay ;
+    - file équitable : les hôtes en attente sont servis à tour de rôle, un
+      domaine très demandé ne monopolise pas les créneaux ;
+    - ralentissement exponentiel (ou Retry-After) sur 429/503, avec reprise.
+    """
+
+    def __init__(self, max_concurrency: int = 32, host_concurrency: int = 2,
+                 host_rate: float = 5.0, host_burst: float = 10.0, max_retries: int = 2,
+                 backoff_base: float = 1.0, max_backoff: float = 30.0, max_crawl_delay: float = 5.0):
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = host_concurrency
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.max_crawl_delay = max_crawl_delay
+
+        self._cond = threading.Condition()
+        self._hosts: "OrderedDict[str, _HostState]" = OrderedDict()
+        self._active = 0
+
+    def _host(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.host_rate, self.host_burst)
+            self._prune()
+        return state
+
+    def _prune(self):
+        """Oublie les hôtes inactifs les plus anciens au-delà de la limite"""
+        if len(self._hosts) <= MAX_TRACKED_HOSTS:
+            return
+        for host in list(self._hosts):
+            state = self._hosts[host]
+            if not state.active and not state.waiting:
+                del self._hosts[host]
+            if len(self._hosts) <= MAX_TRACKED_HOSTS:
+                break
+
+    def set_crawl_delay(self, host: str, delay: float):
+        """Applique le Crawl-delay de robots.txt (plafonné)"""
+        with self._cond:
+            self._host(host.lower()).crawl_delay = min(max(0.0, delay), self.max_crawl_delay)
+
+    def _host_delay(self, state: _HostState, now: float) -> Optional[float]:
+        """Attente avant que l'hôte puisse recevoir une requête (None : limite de concurrence)"""
+        if state.active >= self.host_concurrency:
+            return None
+        return max(state.not_before - now, state.bucket.delay(now), 0.0)
+
+    def _acquire(self, host: str, deadline: Optional[Deadline] = None):
+        with self._cond:
+            state = self._host(host)
+            ticket = object()
+            state.waiting.append(ticket)
+            try:
+                while True:
+                    timeout = self._grant(host, ticket)
+                    if timeout == 0:
+                        return
+                    if deadline is not None:
+                        # Ne pas attendre un créneau au-delà du budget de l'analyse
+                        remaining = deadline.remaining()
+                        if remaining <= 0:
+                            raise DeadlineExceeded(f"délai dépassé en attente de {host}")
+                        timeout = remaining if timeout is None else min(timeout, remaining)
+                    self._cond.wait(timeout)
+            except BaseException:
+                if ticket in state.waiting:
+                    state.waiting.remove(ticket)
+                self._cond.notify_all()
+                raise
+
+    def _grant(self, host: str, ticket) -> Optional[float]:
+        """
+        Choisit, à tour de rôle parmi les hôtes en attente, la prochaine
+        requête autorisée. Retourne 0 si c'est celle de l'appelant, sinon le
+        délai d'attente maximal avant de réévaluer.
+        """
+        if self._active >= self.max_concurrency:
+            return None
+
+        now = time.monotonic()
+        shortest = None
+        for candidate, state in self._hosts.items():
+            if not state.waiting:
+                continue
+            delay = self._host_delay(state, now)
+            if delay is None:
+                continue
+            if delay > 0:
+                shortest = delay if shortest is None else min(shortest, delay)
+                continue
+
+            if candidate != host or state.waiting[0] is not ticket:
+                # Un autre hôte passe en premier : le réveiller
+                self._cond.notify_all()
+                return shortest
+
+            state.waiting.popleft()
+            state.active += 1
+            state.bucket.consume(now)
+            state.not_before = now + state.crawl_delay
+            self._active += 1
+            # Tour de rôle : l'hôte servi passe en fin de file
+            self._hosts.move_to_end(candidate)
+            self._cond.notify_all()
+            return 0
+
+        return shortest
+
+    def _release(self, host: str):
+        with self._cond:
+            state = self._host(host)
+            state.active -= 1
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _release_on_close(self, host: str, response):
+        """Libère le créneau à la fermeture de la réponse (ou à sa destruction, si elle n'est pas fermée)"""
+        release = weakref.finalize(response, self._release, host)
+        close = response.close
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                release()
+
+        response.close = close_and_release
+
+    def _backoff(self, host: str, response) -> float:
+        """Pénalise un hôte qui a répondu 429/503 et retourne le délai appliqué"""
+        with self._cond:
+            state = self._host(host)
+            state.failures += 1
+            delay = _retry_after(response)
+            if delay is None:
+                delay = self.backoff_base * (2 ** (state.failures - 1)) * (1 + random.random() / 2)
+            delay = min(delay, self.max_backoff)
+            state.not_before = max(state.not_before, time.monotonic() + delay)
+            return delay
+
+    def _success(self, host: str):
+        with self._cond:
+            self._host(host).failures = 0
+
+    @contextmanager
+    def slot(self, url: str, deadline: Optional[Deadline] = None):
+        """Réserve un créneau pour un accès à l'hôte de `url` hors session HTTP (rendu headless)"""
+        host = urlparse(url).netloc.lower()
+        self._acquire(host, deadline)
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    def request(self, session, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs):
+        """
+        Exécute une requête HTTP via `session` en respectant les règles de politesse
+
+        Avec une `deadline`, l'attente d'un créneau et le délai de la requête
+        sont bornés par le budget restant. Avec `stream=True`, le créneau est
+        gardé pendant le téléchargement du corps : il est libéré à la
+        fermeture de la réponse.
+        """
+        host = urlparse(url).netloc.lower()
+        timeout = kwargs.get('timeout')
+        attempt = 0
+        while True:
+            self._acquire(host, deadline)
+            try:
+                if deadline is not None and timeout is not None:
+                    kwargs['timeout'] = deadline.timeout(timeout, host)
+                response = session.request(method, url, **kwargs)
+            except BaseException:
+                self._release(host)
+                raise
+            if kwargs.get('stream'):
+                self._release_on_close(host, response)
+            else:
+                self._release(host)
+
+            if response.status_code in BACKOFF_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(host, response)
+                if deadline is not None and delay >= deadline.remaining():
+                    # Pas de nouvel essai possible dans le budget restant
+                    return response
+                logger.info(f"{host} a répondu {response.status_code}, nouvel essai dans {delay:.1f}s")
+                response.close()
+                attempt += 1
+                continue
+
+            if response.status_code not in BACKOFF_STATUSES:
+                self._success(host)
+            return response
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduledSession:
+    """Session dont toutes les requêtes passent par l'ordonnanceur"""
+
+    def __init__(self, session, scheduler: FetchScheduler, deadline: Optional[Deadline] = None):
+        self.session = session
+        self.scheduler = scheduler
+        self.deadline = deadline
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.scheduler.request(self.session, method, url, deadline=self.deadline, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FetchScheduler:
+    """Ordonnanceur partagé par le processus (recréé après un fork)"""
+    global _scheduler, _scheduler_pid
+    pid = os.getpid()
+    if _scheduler is not None and _scheduler_pid == pid:
+        return _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler_pid != pid:
+            _scheduler = FetchScheduler(
+                max_concurrency=settings.SCRAPER_MAX_CONCURRENCY,
+                host_concurrency=settings.SCRAPER_HOST_CONCURRENCY,
+                host_rate=settings.SCRAPER_HOST_RATE,
+                host_burst=settings.SCRAPER_HOST_BURST,
+                max_retries=settings.SCRAPER_MAX_RETRIES,
+                backoff_base=settings.SCRAPER_BACKOFF_BASE,
+                max_backoff=settings.SCRAPER_MAX_BACKOFF,
+                max_crawl_delay=settings.SCRAPER_MAX_CRAWL_DELAY,
+            )
+            _scheduler_pid = pid
+    return _scheduler
+
+
+def reset_scheduler():
+    global _scheduler, _scheduler_pid
+    with _scheduler_lock:
+        _scheduler = None
+        _scheduler_pid = None
@@ -0,0 +1,223 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Ressources inutiles pour lire le texte d'une page
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+
+# Nombre de rendus avant de relancer un navigateur (bornage mémoire)
+RENDERS_PER_BROWSER = 200
+
+
+def is_available() -> bool:
+    """Indique si Playwright est installé"""
+    try:
+        import playwright.sync_api  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def needs_render(html_size: int, text_length: int) -> bool:
+    """
+    Indique si une page doit être rendue par le navigateur
+
+    Une page rendue côté client ne contient presque pas de texte, et ce peu
+    de texte est noyé dans le HTML (scripts, attributs) : les deux critères
+    doivent être réunis pour ne pas pénaliser les pages statiques courtes.
+    """
+    if text_length >= settings.RENDER_MIN_TEXT_LENGTH:
+        return False
+    density = text_length / max(1, html_size)
+    return density < settings.RENDER_MIN_TEXT_DENSITY
+
+
+class _RenderWorker(threading.Thread):
+    """
+    Thread propriétaire d'un navigateur headless
+
+    L'API synchrone de Playwright doit être utilisée depuis le thread qui
+    l'a démarrée : chaque worker garde son navigateur et sa page, réutilisée
+    d'un rendu à l'autre.
+    """
+
+    def __init__(self, jobs: "queue.Queue", timeout: float, index: int, on_failure=None):
+        super().__init__(name=f'headless-render-{index}', daemon=True)
+        self.jobs = jobs
+        self.on_failure = on_failure
+        self.timeout_ms = int(timeout * 1000)
+        self._playwright = None
+        self._browser = None
+        self._page = None
+        self._renders = 0
+
+    def run(self):
+        try:
+            from playwright.sync_api import sync_playwright
+
+            self._playwright = sync_playwright().start()
+        except Exception as e:
+            logger.error(f"Démarrage de Playwright impossible ({self.name}): {str(e)}")
+            if self.on_failure is not None:
+                self.on_failure(str(e))
+            return
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                url, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._render(url))
+                except Exception as e:
+                    logger.warning(f"Rendu headless impossible pour {url}: {str(e)}")
+                    self._close_browser()
+                    future.set_result(None)
+        finally:
+            self._close_browser()
+            self._playwright.stop()
+
+    def _ensure_page(self):
+        if self._renders >= RENDERS_PER_BROWSER:
+            self._close_browser()
+        if self._browser is None:
+            self._browser = self._playwright.chromium.launch(headless=True)
+            context = self._browser.new_context(java_script_enabled=True)
+            context.route('**/*', self._route)
+            self._page = context.new_page()
+            self._renders = 0
+        return self._page
+
+    @staticmethod
+    def _route(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            route.abort()
+        else:
+            route.continue_()
+
+    def _render(self, url: str) -> str:
+        page = self._ensure_page()
+        self._renders += 1
+        page.goto(url, wait_until='networkidle', timeout=self.timeout_ms)
+        html = page.content()
+        # Libérer le DOM avant le rendu suivant
+        page.goto('about:blank')
+        return html
+
+    def _close_browser(self):
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+        self._page = None
+
+
+class RenderPool:
+    """Pool de navigateurs headless réutilisables"""
+
+    def __init__(self, size: int = 2, timeout: float = 15.0):
+        self.size = size
+        self.timeout = timeout
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._workers = []
+        self._failed = 0
+        self._lock = threading.Lock()
+        
+        # Erreur de démarrage, si aucun navigateur n'a pu démarrer
+        self.error: Optional[str] = None
+
+    def _start(self):
+        with self._lock:
+            if not self._workers:
+                self._workers = [
+                    _RenderWorker(self._jobs, self.timeout, i, on_failure=self._worker_failed)
+                    for i in range(self.size)
+                ]
+                for worker in self._workers:
+                    worker.start()
+
+    def _worker_failed(self, error: str):
+        with self._lock:
+            self._failed += 1
+            if self._failed < len(self._workers):
+                return
+            self.error = error
+        self._drain()
+
+    def _drain(self):
+        # Plus aucun worker : les rendus en attente échouent aussitôt
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[1].set_running_or_notify_cancel():
+                job[1].set_result(None)
+
+    def render(self, url: str) -> Optional[str]:
+        """
+        Rend une page et retourne son HTML
+
+        Returns:
+            str: HTML après exécution du JavaScript, ou None en cas d'échec
+            (immédiatement si le navigateur n'a pas pu démarrer)
+        """
+        self._start()
+        if self.error is not None:
+            return None
+        future: Future = Future()
+        self._jobs.put((url, future))
+        if self.error is not None:
+            # Dernier worker arrêté pendant le dépôt de la demande
+            self._drain()
+        try:
+            # Marge pour l'attente d'un worker libre en plus du rendu lui-même
+            return future.result(timeout=self.timeout * 2)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Délai de rendu dépassé pour {url}")
+            return None
+
+    def close(self):
+        with self._lock:
+            for _ in self._workers:
+                self._jobs.put(None)
+            self._workers = []
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> Optional[RenderPool]:
+    """Pool partagé par le processus, ou None si le rendu est désactivé ou indisponible"""
+    global _pool, _pool_pid
+    if not settings.RENDER_FALLBACK_ENABLED:
+        return None
+
+    pid = os.getpid()
+    if _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool_pid != pid:
+            _pool = None
+            if is_available():
+                _pool = RenderPool(settings.RENDER_POOL_SIZE, settings.RENDER_TIMEOUT)
+            else:
+                logger.warning("Rendu headless activé mais Playwright n'est pas installé")
+            _pool_pid = pid
+    return _pool
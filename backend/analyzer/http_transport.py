@@ -0,0 +1,333 @@
+import http.cookiejar
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+
+logger = logging.getLogger(__name__)
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class DNSCache:
+    """
+    Cache en mémoire des résolutions DNS avec durée de vie
+
+    Utilisé par les connexions du scraper seulement (adaptateur requests,
+    transport httpx) : de nombreux sites partagent les mêmes CDN, inutile de
+    résoudre à nouveau à chaque analyse. Base de données, clients LLM et
+    notifications gardent la résolution du système.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 4096, resolver=socket.getaddrinfo):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._resolve = resolver
+        self.hits = 0
+        self.misses = 0
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        result = self._resolve(host, port, family, type, proto, flags)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def addresses(self, host: str, port: int) -> List[str]:
+        """Adresses IP d'un hôte, dans l'ordre de la résolution, sans doublon"""
+        infos = self.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _CachedDNSConnectionMixin:
+    """Connexion urllib3 résolue par `dns_cache` (TLS et en-tête Host gardent le nom d'hôte)"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = dns_cache.addresses(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for address in addresses:
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except ConnectTimeoutError as e:
+                # Inclut NewConnectionError : adresse suivante
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+class _CachedDNSHTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """Adaptateur requests dont les connexions passent par le cache DNS du scraper"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CachedDNSHTTPConnectionPool,
+            'https': _CachedDNSHTTPSConnectionPool,
+        }
+
+
+def _cached_dns_backend():
+    """Backend réseau httpcore résolvant les hôtes par `dns_cache`"""
+    import httpcore
+
+    class CachedDNSBackend(httpcore.SyncBackend):
+        def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            try:
+                addresses = dns_cache.addresses(host, port)
+            except socket.gaierror as e:
+                raise httpcore.ConnectError(str(e)) from e
+            error = None
+            for address in addresses:
+                try:
+                    return super().connect_tcp(address, port, timeout, local_address, socket_options)
+                except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                    error = e
+            raise error
+
+    return CachedDNSBackend()
+
+
+class HttpxResponse:
+    """Réponse httpx exposant l'interface de `requests.Response` utilisée par l'extracteur"""
+
+    def __init__(self, response):
+        self._response = response
+
+    @property
+    def status_code(self) -> int:
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def url(self) -> str:
+        return str(self._response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def raise_for_status(self):
+        if self._response.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self._response.status_code} Error for url: {self._response.url}",
+                response=self
+            )
+
+    def iter_content(self, chunk_size: int = 65536):
+        return self._response.iter_bytes(chunk_size)
+
+    def iter_lines(self, chunk_size: int = 65536):
+        pending = b''
+        for chunk in self._response.iter_bytes(chunk_size):
+            lines = (pending + chunk).splitlines(keepends=True)
+            pending = lines.pop() if lines and not lines[-1].endswith((b'\n', b'\r')) else b''
+            for line in lines:
+                yield line.rstrip(b'\r\n')
+        if pending:
+            yield pending
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HttpxSession:
+    """
+    Session HTTP/2 basée sur httpx, compatible avec l'usage de `requests.Session`
+    dans l'extracteur (get/head, timeout, stream)
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @property
+    def headers(self):
+        return self.client.headers
+
+    def request(self, method: str, url: str, timeout=None, stream: bool = False,
+                allow_redirects: bool = True, headers: Optional[Dict] = None, **kwargs):
+        request = self.client.build_request(method, url, headers=headers, timeout=timeout)
+        try:
+            response = self.client.send(request, stream=True, follow_redirects=allow_redirects)
+        except Exception as e:
+            # Homogénéiser les erreurs avec celles de requests
+            raise requests.ConnectionError(str(e)) from e
+        wrapped = HttpxResponse(response)
+        if not stream:
+            try:
+                response.read()
+            finally:
+                response.close()
+        return wrapped
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+def _mount_adapters(session: requests.Session):
+    """Pool de connexions borné, avec des limites propres à certains hôtes"""
+    adapter_class = CachedDNSAdapter if settings.SCRAPER_DNS_CACHE_TTL > 0 else HTTPAdapter
+    default_adapter = adapter_class(
+        pool_connections=settings.SCRAPER_POOL_HOSTS,
+        pool_maxsize=settings.SCRAPER_MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+        max_retries=0,
+    )
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+
+    # Les adaptateurs sont choisis par préfixe le plus long
+    for host, limit in settings.SCRAPER_HOST_LIMITS.items():
+        adapter = adapter_class(pool_connections=1, pool_maxsize=limit, pool_block=True, max_retries=0)
+        session.mount(f'http://{host}', adapter)
+        session.mount(f'https://{host}', adapter)
+
+
+def _reject_cookies(jar: http.cookiejar.CookieJar):
+    """
+    Session partagée par toutes les analyses du processus : aucun cookie
+    conservé, sinon le jar grossit sans limite et renvoie les cookies d'une
+    analyse dans les suivantes (ceux d'une chaîne de redirections restent
+    transmis, le temps de la requête)
+    """
+    jar.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+
+def build_session():
+    """Construit la session HTTP du scraper selon la configuration"""
+    if settings.SCRAPER_HTTP2:
+        try:
+            import httpx
+            import h2  # noqa: F401  (requis par httpx pour HTTP/2)
+
+            transport = httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=settings.SCRAPER_POOL_HOSTS * settings.SCRAPER_MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=settings.SCRAPER_POOL_HOSTS,
+                ),
+            )
+            if settings.SCRAPER_DNS_CACHE_TTL > 0:
+                # httpx n'expose pas le backend réseau de son pool httpcore
+                transport._pool._network_backend = _cached_dns_backend()
+            client = httpx.Client(transport=transport, headers={'User-Agent': USER_AGENT})
+            _reject_cookies(client.cookies.jar)
+            return HttpxSession(client)
+        except ImportError:
+            logger.warning("HTTP/2 demandé mais httpx[http2] n'est pas installé, utilisation de requests")
+
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    _reject_cookies(session.cookies)
+    _mount_adapters(session)
+    return session
+
+
+dns_cache = DNSCache()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Retourne la session HTTP partagée par tous les extracteurs du processus
+
+    Connexions, sessions TLS et résolutions DNS sont ainsi réutilisées d'une
+    analyse à l'autre. La session est recréée après un fork (worker gunicorn)
+    pour ne pas partager de sockets avec le processus parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            dns_cache.ttl = settings.SCRAPER_DNS_CACHE_TTL
+            _session = build_session()
+            _session_pid = pid
+    return _session
+
+
+def reset_session():
+    """Ferme la session partagée (tests, rechargement de configuration)"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
@@ -0,0 +1,179 @@
+import gzip
+import io
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Dict, IO, Iterable, Iterator, List, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exports import ANALYSIS_FIELDS, DOCUMENT_FIELDS
+from .models import LegalDocument, WebsiteAnalysis
+from .snapshots import store_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+# Analyse déjà présente pour le domaine, avec un contenu différent :
+# - newer   : remplacer si l'analyse importée est plus récente
+# - replace : toujours remplacer
+# - skip    : conserver l'analyse existante
+CONFLICT_POLICIES = ('newer', 'replace', 'skip')
+
+# Champs de l'export non importés (gérés par la base)
+_IGNORED_FIELDS = ('updated_at', 'content_hash')
+
+# Champs réécrits lors d'un remplacement ; ceux absents de l'export
+# reprennent la valeur par défaut du modèle, comme à la création
+_UPDATE_FIELDS = [field for field in ANALYSIS_FIELDS if field not in ('domain', 'updated_at')]
+
+
+def open_snapshot(stream: IO[bytes]) -> Iterator[str]:
+    """Lignes d'un export NDJSON, compressé en gzip ou non (détecté au premier octet)"""
+    stream = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def _datetime(value) -> datetime:
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f"date invalide: {value}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def _parse(line: str) -> Tuple[Dict, List[Dict]]:
+    """
+    Analyse et documents d'une ligne d'export
+
+    Raises:
+        ValueError: Ligne invalide ou sans domaine
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict) or not record.get('domain'):
+        raise ValueError("enregistrement sans domaine")
+    if not isinstance(record['domain'], str):
+        raise ValueError(f"domaine invalide: {record['domain']!r}")
+
+    fields = {
+        field: record[field] for field in ANALYSIS_FIELDS
+        if field in record and field not in _IGNORED_FIELDS
+    }
+    fields['domain'] = fields['domain'].lower()
+    fields.setdefault('url', f"https://{fields['domain']}/")
+    if fields.get('created_at'):
+        fields['created_at'] = _datetime(fields['created_at'])
+
+    documents = {}
+    for document in record.get('documents') or []:
+        if not isinstance(document, dict):
+            raise ValueError("document invalide")
+        document = {field: document[field] for field in DOCUMENT_FIELDS if field in document}
+        if not document.get('url'):
+            raise ValueError("document sans URL")
+        document.setdefault('content', '')
+        document.setdefault('document_type', 'other')
+        # Le contenu fait foi : pas de save() pour le recalculer
+        document['content_length'] = len(document['content'])
+        if document.get('extracted_at'):
+            document['extracted_at'] = _datetime(document['extracted_at'])
+        # Une URL par analyse (contrainte d'unicité)
+        documents[document['url']] = document
+
+    documents = list(documents.values())
+    fields['content_hash'] = WebsiteAnalysis.hash_documents(documents)
+    return fields, documents
+
+
+def _records(lines: Iterable[str], report: Counter) -> Iterator[Tuple[Dict, List[Dict]]]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield _parse(line)
+        except ValueError as e:
+            report['invalid'] += 1
+            logger.warning(f"Ligne {number} ignorée: {str(e)}")
+
+
+def import_analyses(lines: Iterable[str], on_conflict: str = 'newer', batch_size: int = 500,
+                    progress=None) -> Counter:
+    """
+    Importe un export NDJSON par lots de `batch_size` analyses
+
+    Chaque lot : une requête pour les domaines déjà présents, puis
+    bulk_create / bulk_update des analyses et bulk_create des documents,
+    dans une transaction. Une analyse identique (même empreinte des
+    documents) n'est jamais réécrite.
+
+    Args:
+        progress: Appelé après chaque lot avec le compte rendu courant
+
+    Returns:
+        Counter: created, updated, unchanged, skipped, invalid, documents
+    """
+    report = Counter()
+    records = _records(lines, report)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, on_conflict, report)
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def _import_batch(batch: List[Tuple[Dict, List[Dict]]], on_conflict: str, report: Counter):
+    # Un domaine présent plusieurs fois dans le lot : la dernière ligne l'emporte
+    records = {fields['domain']: (fields, documents) for fields, documents in batch}
+    report['skipped'] += len(batch) - len(records)
+
+    existing = {
+        row['domain']: row for row in WebsiteAnalysis.objects.filter(
+            domain__in=list(records)
+        ).values('pk', 'domain', 'content_hash', 'created_at')
+    }
+
+    created: List[Tuple[WebsiteAnalysis, List[Dict]]] = []
+    updated: List[Tuple[WebsiteAnalysis, List[Dict]]] = []
+    for domain, (fields, documents) in records.items():
+        current = existing.get(domain)
+        if current is None:
+            created.append((WebsiteAnalysis(**fields), documents))
+            continue
+        if current['content_hash'] and current['content_hash'] == fields['content_hash']:
+            report['unchanged'] += 1
+            continue
+        incoming_date = fields.get('created_at')
+        if on_conflict == 'skip' or (
+            on_conflict == 'newer' and (incoming_date is None or incoming_date <= current['created_at'])
+        ):
+            report['skipped'] += 1
+            continue
+        updated.append((WebsiteAnalysis(pk=current['pk'], **fields), documents))
+
+    with transaction.atomic():
+        if created:
+            WebsiteAnalysis.objects.bulk_create([analysis for analysis, _ in created])
+        if updated:
+            WebsiteAnalysis.objects.bulk_update([analysis for analysis, _ in updated], _UPDATE_FIELDS)
+            LegalDocument.objects.filter(analysis_id__in=[analysis.pk for analysis, _ in updated]).delete()
+
+        documents = [
+            LegalDocument(analysis_id=analysis.pk, **document)
+            for analysis, analysis_documents in created + updated
+            for document in analysis_documents
+        ]
+        LegalDocument.objects.bulk_create(documents)
+        store_snapshots(analysis for analysis, _ in created + updated)
+
+    report['created'] += len(created)
+    report['updated'] += len(updated)
+    report['documents'] += len(documents)
+
@@ -0,0 +1,268 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Structure attendue de la réponse du modèle, avec les valeurs par défaut
+# utilisées pour compléter une réponse partielle
+ANALYSIS_SCHEMA = {
+    'summary': "Analyse automatique non disponible. Veuillez consulter les documents directement.",
+    'what_you_accept': "Information non disponible",
+    'data_collected': "Information non disponible",
+    'data_usage': "Information non disponible",
+    'data_sharing': "Information non disponible",
+    'retention_period': "Information non disponible",
+    'critical_points': "Information non disponible",
+    'key_points': ["Analyse automatique non disponible"],
+    'readability_score': 5,
+    'risk_level': "moderate",
+    'risk_explanation': "Analyse automatique non disponible",
+}
+
+RISK_LEVELS = ('low', 'moderate', 'high')
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# Nombre maximal de coupures essayées pour réparer un objet tronqué
+_MAX_CUTS = 5
+
+# Nombre maximal de reprises après une accolade parasite
+_MAX_RESTARTS = 3
+
+
+class JSONStreamExtractor:
+    """
+    Extracteur incrémental d'objets JSON dans une sortie de modèle.
+
+    Le texte est parcouru une seule fois, caractère par caractère : les
+    accolades et crochets sont équilibrés en tenant compte des chaînes et des
+    échappements, de sorte qu'une accolade dans une valeur ou un texte
+    d'accompagnement ne casse pas l'extraction. Les morceaux peuvent être
+    fournis au fil de l'eau (réponse en streaming) via `feed`.
+    """
+
+    def __init__(self):
+        self.objects: List[str] = []
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        # Positions des virgules hors chaîne, pour réparer un objet tronqué
+        self._cuts: List[Tuple[int, Tuple[str, ...]]] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Ajoute un morceau de texte au flux
+
+        Returns:
+            List[str]: Objets JSON complets terminés dans ce morceau
+        """
+        completed = []
+        for char in chunk:
+            if not self._stack:
+                # Hors d'un objet : on attend la prochaine accolade ouvrante
+                if char == '{':
+                    self._stack.append('{')
+                    self._buffer = [char]
+                    self._cuts = []
+                continue
+
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == ',':
+                self._cuts.append((len(self._buffer) - 1, tuple(self._stack)))
+            elif char in _CLOSERS:
+                self._stack.append(char)
+            elif char in ('}', ']'):
+                if _CLOSERS[self._stack[-1]] != char:
+                    # Fermeture incohérente : on abandonne ce candidat
+                    self._reset()
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    obj = ''.join(self._buffer)
+                    self.objects.append(obj)
+                    completed.append(obj)
+                    self._buffer = []
+
+        return completed
+
+    def pending(self) -> List[str]:
+        """
+        Retourne l'objet en cours refermé artificiellement s'il est tronqué
+        (réponse coupée par la limite de tokens), puis des variantes coupées
+        aux dernières virgules pour écarter une clé ou une valeur incomplète
+        """
+        if not self._stack:
+            return []
+
+        text = ''.join(self._buffer)
+        if self._in_string:
+            if self._escape:
+                text = text[:-1]
+            text += '"'
+        variants = [text + ''.join(_CLOSERS[c] for c in reversed(self._stack))]
+
+        for position, stack in reversed(self._cuts[-_MAX_CUTS:]):
+            variants.append(
+                text[:position] + ''.join(_CLOSERS[c] for c in reversed(stack))
+            )
+        return variants
+
+    def _reset(self):
+        self._buffer = []
+        self._stack = []
+        self._cuts = []
+        self._in_string = False
+        self._escape = False
+
+
+def _repair(candidate: str) -> str:
+    """Corrections légères des erreurs fréquentes des modèles"""
+    out = []
+    in_string = False
+    escape = False
+    for char in candidate:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                # Retour à la ligne brut interdit dans une chaîne JSON
+                out.append('\\n')
+                continue
+            out.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '}]':
+            # Virgule finale avant une fermeture
+            while out and out[-1] in ' \t\r\n':
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+        out.append(char)
+    return ''.join(out)
+
+
+def _loads(candidate: str) -> Optional[Dict]:
+    for text in (candidate, _repair(candidate)):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _schema_hits(data: Dict) -> int:
+    return sum(1 for key in ANALYSIS_SCHEMA if key in data)
+
+
+def parse_candidates(candidates: Iterable[str]) -> Optional[Dict]:
+    """Retourne le candidat décodable qui couvre le mieux le schéma d'analyse"""
+    best = None
+    best_hits = -1
+    for candidate in candidates:
+        data = _loads(candidate)
+        if data is None:
+            continue
+        hits = _schema_hits(data)
+        if hits > best_hits:
+            best, best_hits = data, hits
+    return best
+
+
+def extract_json(text: str) -> Dict:
+    """
+    Extrait la partie JSON d'un texte qui contient du contenu supplémentaire (ex: commentaires IA).
+    Retourne un dictionnaire Python.
+    """
+    for _ in range(_MAX_RESTARTS):
+        extractor = JSONStreamExtractor()
+        extractor.feed(text)
+
+        candidates = list(extractor.objects)
+        candidates.extend(extractor.pending())
+
+        data = parse_candidates(candidates)
+        if data is not None:
+            return data
+
+        # Une accolade isolée dans le texte d'accompagnement peut englober
+        # le vrai JSON : on reprend juste après elle
+        start = text.find('{')
+        if start == -1:
+            break
+        text = text[start + 1:]
+
+    raise ValueError("Aucun JSON valide trouvé dans le texte.")
+
+
+def validate_analysis(data: Dict, fields: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Valide une réponse du modèle contre le schéma d'analyse
+
+    Les champs manquants ou mal typés sont remplacés par les valeurs par
+    défaut, ce qui permet de conserver une réponse partielle plutôt que de
+    la remplacer entièrement par l'analyse de secours.
+
+    Args:
+        fields: Champs attendus (tous ceux du schéma par défaut)
+    """
+    fields = list(fields or ANALYSIS_SCHEMA)
+    result = {}
+    for key in fields:
+        default = ANALYSIS_SCHEMA[key]
+        value = data.get(key)
+
+        if key == 'key_points':
+            if isinstance(value, str):
+                value = [value]
+            if isinstance(value, list):
+                value = [str(point) for point in value if point]
+            if not value:
+                value = list(default)
+
+        elif key == 'readability_score':
+            try:
+                value = min(10, max(1, int(float(value))))
+            except (TypeError, ValueError, OverflowError):
+                value = default
+
+        elif key == 'risk_level':
+            value = str(value).strip().lower() if value else ''
+            if value not in RISK_LEVELS:
+                value = default
+
+        elif not isinstance(value, str) or not value.strip():
+            if isinstance(value, (list, dict)) and value:
+                value = json.dumps(value, ensure_ascii=False)
+            else:
+                value = default
+
+        result[key] = value
+
+    missing = [key for key in fields if key not in data]
+    if missing:
+        logger.warning(f"Réponse LLM incomplète, champs complétés: {', '.join(missing)}")
+
+    return result
@@ -0,0 +1,139 @@
+import re
+from typing import Dict, List, Optional
+
+# Langues reconnues : mots très fréquents (détection), nom et vocabulaire
+# juridique courant (prompt d'analyse, qui reste rédigé en français)
+LANGUAGE_PROFILES: Dict[str, Dict] = {
+    'fr': {
+        'name': 'français',
+        'stopwords': {
+            'le', 'les', 'et', 'des', 'du', 'vous', 'votre', 'vos', 'nous', 'notre', 'est', 'sont', 'pour',
+            'avec', 'dans', 'une', 'sur', 'qui', 'par', 'pas', 'ces', 'au', 'aux', 'données', 'être',
+        },
+        'glossary': {},
+    },
+    'en': {
+        'name': 'anglais',
+        'stopwords': {
+            'the', 'and', 'of', 'to', 'you', 'your', 'we', 'our', 'is', 'are', 'for', 'with', 'this', 'that',
+            'by', 'or', 'be', 'will', 'may', 'not', 'any', 'which', 'information', 'us', 'from',
+        },
+        'glossary': {
+            'terms of service': "conditions d'utilisation",
+            'privacy policy': 'politique de confidentialité',
+            'legal notice': 'mentions légales',
+        },
+    },
+    'de': {
+        'name': 'allemand',
+        'stopwords': {
+            'der', 'die', 'das', 'und', 'sie', 'ihre', 'wir', 'unsere', 'ist', 'sind', 'für', 'mit', 'von',
+            'zu', 'den', 'dem', 'nicht', 'oder', 'auf', 'eine', 'ein', 'werden', 'daten', 'bei', 'sich',
+        },
+        'glossary': {
+            'AGB / Nutzungsbedingungen': "conditions générales / conditions d'utilisation",
+            'Datenschutzerklärung': 'politique de confidentialité',
+            'Impressum': 'mentions légales',
+            'Widerrufsrecht': 'droit de rétractation',
+        },
+    },
+    'es': {
+        'name': 'espagnol',
+        'stopwords': {
+            'el', 'los', 'las', 'y', 'que', 'del', 'usted', 'su', 'sus', 'es', 'son', 'para', 'con', 'por',
+            'una', 'en', 'se', 'datos', 'como', 'al', 'lo', 'nuestro', 'nuestros', 'puede', 'sobre',
+        },
+        'glossary': {
+            'términos y condiciones': "conditions d'utilisation",
+            'política de privacidad': 'politique de confidentialité',
+            'aviso legal': 'mentions légales',
+            'responsable del tratamiento': 'responsable du traitement',
+        },
+    },
+    'it': {
+        'name': 'italien',
+        'stopwords': {
+            'il', 'gli', 'e', 'che', 'di', 'della', 'dei', 'delle', 'tuo', 'tuoi', 'noi', 'è', 'sono', 'per',
+            'con', 'da', 'non', 'dati', 'nel', 'alla', 'al', 'degli', 'questo', 'può', 'nostro',
+        },
+        'glossary': {
+            'termini e condizioni': "conditions d'utilisation",
+            'informativa sulla privacy': 'politique de confidentialité',
+            'note legali': 'mentions légales',
+            'titolare del trattamento': 'responsable du traitement',
+        },
+    },
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_HTML_LANG_RE = re.compile(rb'<html\b[^>]*?\blang\s*=\s*["\']?([a-zA-Z]{2,3})', re.IGNORECASE)
+_TAG_RE = re.compile(r'<(script|style)\b.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+
+# Texte examiné : le début suffit et borne le coût de la détection
+SAMPLE_LENGTH = 5000
+
+# Nombre minimal de mots reconnus, et avance sur la langue suivante,
+# pour que le texte l'emporte sur l'attribut lang de la page
+MIN_HITS = 5
+MIN_MARGIN = 1.5
+
+
+def html_language(content: bytes) -> Optional[str]:
+    """Langue déclarée par l'attribut lang de la balise <html>, si elle est reconnue"""
+    match = _HTML_LANG_RE.search(content[:4096])
+    if match is None:
+        return None
+    language = match.group(1).decode('ascii').lower()
+    return language if language in LANGUAGE_PROFILES else None
+
+
+def detect_language(text: str, declared: Optional[str] = None) -> Optional[str]:
+    """
+    Langue d'un texte, par fréquence des mots les plus courants de chaque langue
+
+    Le texte l'emporte s'il est concluant ; sinon la langue déclarée
+    (attribut lang) est retenue, puis la langue la plus probable.
+
+    Returns:
+        Optional[str]: Code de la langue (fr, en, de, es, it), None si inconnue
+    """
+    scores = dict.fromkeys(LANGUAGE_PROFILES, 0)
+    for word in _WORD_RE.findall(text[:SAMPLE_LENGTH].lower()):
+        for language, profile in LANGUAGE_PROFILES.items():
+            if word in profile['stopwords']:
+                scores[language] += 1
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    if best_score >= MIN_HITS and best_score >= MIN_MARGIN * second_score:
+        return best
+    if declared in LANGUAGE_PROFILES:
+        return declared
+    return best if best_score >= MIN_HITS else None
+
+
+def detect_page_language(content: bytes) -> Optional[str]:
+    """Langue d'une page HTML : texte visible (approximatif) et attribut lang"""
+    text = _TAG_RE.sub(' ', content[:SAMPLE_LENGTH * 8].decode('utf-8', errors='ignore'))
+    return detect_language(text, html_language(content))
+
+
+def documents_language(documents: List[Dict]) -> Optional[str]:
+    """Langue dominante des documents extraits (début de chacun)"""
+    sample_length = SAMPLE_LENGTH // max(1, len(documents))
+    return detect_language(' '.join(doc.get('content', '')[:sample_length] for doc in documents))
+
+
+def prompt_language_note(language: Optional[str]) -> str:
+    """
+    Consigne du prompt pour des documents rédigés dans une autre langue
+    que le français (vide sinon)
+    """
+    if language not in LANGUAGE_PROFILES or language == 'fr':
+        return ''
+    profile = LANGUAGE_PROFILES[language]
+    glossary = '; '.join(f'« {term} » = {translation}' for term, translation in profile['glossary'].items())
+    return (
+        f"\nLes documents sont rédigés en {profile['name']} : répondez en français et traduisez "
+        f"les clauses citées. Vocabulaire : {glossary}.\n"
+    )
@@ -0,0 +1,210 @@
+import re
+from typing import Dict, List, Optional, Pattern, Tuple
+
+
+# Patterns pour identifier les documents juridiques, par langue
+LEGAL_PATTERNS_BY_LANGUAGE: Dict[str, Dict[str, List[str]]] = {
+    'en': {
+        'terms': [
+            r'terms?[-_\s]*(of[-_\s]*)?use',
+            r'terms?[-_\s]*(of[-_\s]*)?service',
+            r'terms?[-_\s]*and[-_\s]*conditions?',
+            r'conditions?[-_\s]*(of[-_\s]*)?use',
+            r'user[-_\s]*agreement',
+        ],
+        'privacy': [
+            r'privacy[-_\s]*policy',
+            r'privacy[-_\s]*notice',
+            r'data[-_\s]*protection',
+        ],
+        'cookies': [
+            r'cookie[-_\s]*policy',
+            r'cookie[-_\s]*notice',
+            r'cookies?',
+        ],
+        'legal': [
+            r'legal[-_\s]*notice',
+            r'legal[-_\s]*information',
+            r'imprint',
+        ],
+    },
+    'fr': {
+        'terms': [
+            r'cgu',
+            r'cgv',
+            r'conditions?[-_\s]*g[eé]n[eé]rales',
+            r'conditions?[-_\s]*d[\'’_\s-]*utilisation',
+        ],
+        'privacy': [
+            r'confidentialit[eé]',
+            r'donn[eé]es[-_\s]*personnelles',
+        ],
+        'cookies': [
+            r'cookies?',
+            r'traceurs',
+        ],
+        'legal': [
+            r'mentions?[-_\s]*l[eé]gales?',
+        ],
+    },
+    'de': {
+        'terms': [
+            r'\bagb\b',
+            r'gesch[aä]ftsbedingungen',
+            r'nutzungsbedingungen',
+        ],
+        'privacy': [
+            r'datenschutz',
+        ],
+        'cookies': [
+            r'cookie[-_\s]*richtlinie',
+            r'cookies?',
+        ],
+        'legal': [
+            r'impressum',
+            r'rechtliche[-_\s]*hinweise',
+        ],
+    },
+    'es': {
+        'terms': [
+            r't[eé]rminos[-_\s]*y[-_\s]*condiciones',
+            r't[eé]rminos[-_\s]*(de[-_\s]*)?(uso|servicio)',
+            r'condiciones[-_\s]*(generales|de[-_\s]*uso)',
+        ],
+        'privacy': [
+            r'pol[ií]tica[-_\s]*de[-_\s]*privacidad',
+            r'privacidad',
+            r'protecci[oó]n[-_\s]*de[-_\s]*datos',
+        ],
+        'cookies': [
+            r'pol[ií]tica[-_\s]*de[-_\s]*cookies',
+            r'cookies?',
+        ],
+        'legal': [
+            r'aviso[-_\s]*legal',
+        ],
+    },
+    'it': {
+        'terms': [
+            r'termini[-_\s]*e[-_\s]*condizioni',
+            r'termini[-_\s]*(di[-_\s]*)?(uso|servizio)',
+            r'condizioni[-_\s]*(generali|d[\'’_\s-]*uso|di[-_\s]*uso)',
+        ],
+        'privacy': [
+            r'informativa[-_\s]*(sulla[-_\s]*)?privacy',
+            r'protezione[-_\s]*(dei[-_\s]*)?dati',
+        ],
+        'cookies': [
+            r'cookies?',
+        ],
+        'legal': [
+            r'note[-_\s]*legali',
+        ],
+    },
+}
+
+# Ordre de priorité des types : un lien « conditions et cookies » est un document de conditions
+DOCUMENT_TYPES = ('terms', 'privacy', 'cookies', 'legal')
+
+# Patterns anglais et français (historiques), pour compatibilité
+LEGAL_PATTERNS: Dict[str, List[str]] = {
+    doc_type: LEGAL_PATTERNS_BY_LANGUAGE['en'][doc_type] + LEGAL_PATTERNS_BY_LANGUAGE['fr'][doc_type]
+    for doc_type in DOCUMENT_TYPES
+}
+
+# Chemins essayés quand aucun lien n'est trouvé, par langue ; les chemins
+# anglais sont aussi essayés (slugs fréquents quelle que soit la langue du site)
+COMMON_PATHS_BY_LANGUAGE: Dict[str, List[Tuple[str, str]]] = {
+    'en': [
+        ('/terms', 'terms'),
+        ('/terms-of-use', 'terms'),
+        ('/terms-of-service', 'terms'),
+        ('/privacy', 'privacy'),
+        ('/privacy-policy', 'privacy'),
+        ('/legal', 'legal'),
+        ('/cookies', 'cookies'),
+    ],
+    'fr': [
+        ('/cgu', 'terms'),
+        ('/cgv', 'terms'),
+        ('/mentions-legales', 'legal'),
+        ('/confidentialite', 'privacy'),
+    ],
+    'de': [
+        ('/agb', 'terms'),
+        ('/nutzungsbedingungen', 'terms'),
+        ('/datenschutz', 'privacy'),
+        ('/impressum', 'legal'),
+    ],
+    'es': [
+        ('/terminos-y-condiciones', 'terms'),
+        ('/politica-de-privacidad', 'privacy'),
+        ('/privacidad', 'privacy'),
+        ('/aviso-legal', 'legal'),
+        ('/politica-de-cookies', 'cookies'),
+    ],
+    'it': [
+        ('/termini-e-condizioni', 'terms'),
+        ('/privacy-policy', 'privacy'),
+        ('/note-legali', 'legal'),
+        ('/cookie-policy', 'cookies'),
+    ],
+}
+
+# Langue inconnue : jeu historique (anglais et français)
+DEFAULT_LANGUAGES = ('en', 'fr')
+
+
+def _languages(language: Optional[str]) -> Tuple[str, ...]:
+    if language is None:
+        return tuple(LEGAL_PATTERNS_BY_LANGUAGE)
+    if language not in LEGAL_PATTERNS_BY_LANGUAGE:
+        return DEFAULT_LANGUAGES
+    return (language, 'en') if language != 'en' else ('en',)
+
+
+def _compile(languages: Tuple[str, ...]) -> List[Tuple[str, Pattern]]:
+    # Une seule expression par type : les alternatives sont essayées en une passe
+    return [
+        (doc_type, re.compile('|'.join(
+            f'(?:{pattern})'
+            for language in languages
+            for pattern in LEGAL_PATTERNS_BY_LANGUAGE[language].get(doc_type, [])
+        ), re.IGNORECASE))
+        for doc_type in DOCUMENT_TYPES
+    ]
+
+
+# Patterns compilés une seule fois par processus, dans l'ordre de priorité des
+# types : langue détectée (et anglais), ou toutes les langues (clé None)
+COMPILED_PATTERNS: Dict[Optional[str], List[Tuple[str, Pattern]]] = {
+    language: _compile(_languages(language))
+    for language in [None, *LEGAL_PATTERNS_BY_LANGUAGE]
+}
+
+
+def identify_document_type(href: str, text: str, language: Optional[str] = None) -> Optional[str]:
+    """
+    Identifie le type de document basé sur l'URL et le texte
+
+    Args:
+        language: Langue de la page (patterns de cette langue et anglais),
+            toutes les langues si elle est inconnue
+    """
+    combined = f"{href} {text}".lower()
+
+    for doc_type, pattern in COMPILED_PATTERNS.get(language, COMPILED_PATTERNS[None]):
+        if pattern.search(combined):
+            return doc_type
+
+    return None
+
+
+def common_paths(language: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Chemins usuels des documents juridiques pour une langue (sans doublon)"""
+    paths = []
+    for code in _languages(language) if language is not None else DEFAULT_LANGUAGES:
+        for path in COMMON_PATHS_BY_LANGUAGE[code]:
+            if path not in paths:
+                paths.append(path)
+    return paths
@@ -0,0 +1,341 @@
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .metrics import LLM_HEDGES, LLM_PROVIDER_SECONDS, LLM_REQUESTS, bind_trace, record_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRouterError(Exception):
+    """Aucun fournisseur n'a répondu"""
+
+
+class Provider:
+    """
+    Fournisseur LLM compatible OpenAI et ses statistiques
+
+    Latence : moyenne et variance mobiles exponentielles des appels réussis.
+    Erreurs : taux mobile, et mise à l'écart pendant `cooldown` secondes
+    après `failure_threshold` échecs consécutifs.
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, alpha: float = 0.2):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.variance = 0.0
+        self.error_rate = 0.0
+        self.failures = 0
+        self.disabled_until = 0.0
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Client partagé : connexions HTTP réutilisées d'un appel à l'autre.
+        # openai (et pydantic) n'est importé qu'ici : la moitié du temps
+        # d'import de l'application, inutile aux commandes manage.py
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(base_url=self.base_url, api_key=self.api_key or 'none', max_retries=0)
+        return self._client
+
+    def record_success(self, duration: float):
+        with self._lock:
+            if self.latency is None:
+                self.latency = duration
+            else:
+                diff = duration - self.latency
+                self.latency += self.alpha * diff
+                self.variance = (1 - self.alpha) * (self.variance + self.alpha * diff * diff)
+            self.error_rate *= 1 - self.alpha
+            self.failures = 0
+            self.disabled_until = 0.0
+
+    def record_failure(self, failure_threshold: int, cooldown: float):
+        with self._lock:
+            self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+            self.failures += 1
+            if self.failures >= failure_threshold:
+                self.disabled_until = time.monotonic() + cooldown
+                logger.warning(f"Fournisseur LLM {self.name} écarté {cooldown:.0f}s après {self.failures} échecs")
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.disabled_until
+
+    def expected_duration(self) -> float:
+        """
+        Durée attendue d'une réponse, nouveaux essais compris (latence
+        divisée par le taux de succès) ; 0 sans mesure, pour l'essayer
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(0.05, 1 - self.error_rate)
+
+    def tail_latency(self) -> Optional[float]:
+        """Estimation du p99 : moyenne + 3 écarts-types (None sans mesure)"""
+        if self.latency is None:
+            return None
+        return self.latency + 3 * math.sqrt(self.variance)
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'model': self.model,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'tail_latency': round(self.tail_latency(), 3) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'healthy': self.healthy,
+        }
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Threads des appels LLM, recréés après un fork"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llm')
+            _executor_pid = pid
+    return _executor
+
+
+class LLMRouter:
+    """
+    Choisit le fournisseur le plus rapide parmi ceux en bonne santé
+
+    Si sa réponse tarde au-delà de sa latence de queue (ou de `hedge_delay`),
+    la même requête est envoyée au fournisseur suivant et la première
+    réponse est retenue ; l'autre appel se termine en arrière-plan et met à
+    jour les statistiques de son fournisseur. En cas d'erreur, bascule sur
+    le fournisseur suivant tant que le délai le permet.
+    """
+
+    def __init__(self, providers: List[Provider], hedge: bool = True, hedge_delay: float = 0.0,
+                 min_hedge_delay: float = 2.0, failure_threshold: int = 3, cooldown: float = 30.0):
+        if not providers:
+            raise ValueError("Aucun fournisseur LLM configuré")
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    def ranked(self) -> List[Provider]:
+        """Fournisseurs par durée attendue ; tous, si aucun n'est en bonne santé"""
+        healthy = [provider for provider in self.providers if provider.healthy]
+        if not healthy:
+            return sorted(self.providers, key=lambda provider: provider.disabled_until)
+        return sorted(healthy, key=lambda provider: provider.expected_duration())
+
+    def _hedge_after(self, provider: Provider) -> Optional[float]:
+        if self.hedge_delay > 0:
+            return self.hedge_delay
+        tail = provider.tail_latency()
+        # Pas de mesure : pas de duplication (coût doublé sans référence)
+        return None if tail is None else max(self.min_hedge_delay, tail)
+
+    def _call(self, provider: Provider, timeout: float, max_retries: int, request: Dict):
+        start = time.monotonic()
+        try:
+            response = provider.client.with_options(timeout=max(timeout, 0.001), max_retries=max_retries) \
+                .chat.completions.create(model=provider.model, **request)
+        except Exception:
+            provider.record_failure(self.failure_threshold, self.cooldown)
+            LLM_REQUESTS.inc(provider=provider.name, outcome='error')
+            raise
+        duration = time.monotonic() - start
+        provider.record_success(duration)
+        LLM_REQUESTS.inc(provider=provider.name, outcome='success')
+        LLM_PROVIDER_SECONDS.observe(duration, provider=provider.name)
+        return response
+
+    def complete(self, timeout: float, max_retries: int = 0, **request) -> Tuple[object, Provider]:
+        """
+        Requête `chat.completions.create` (sans `model`, propre à chaque fournisseur)
+
+        Returns:
+            Tuple: (réponse, fournisseur ayant répondu)
+
+        Raises:
+            LLMRouterError: Aucun fournisseur n'a répondu dans le délai
+        """
+        start = time.monotonic()
+        candidates = self.ranked()
+        pending: Dict = {}
+        errors = []
+
+        def remaining() -> float:
+            return timeout - (time.monotonic() - start)
+
+        def launch(provider: Provider):
+            future = _get_executor().submit(bind_trace(self._call), provider, remaining(), max_retries, request)
+            pending[future] = (provider, time.monotonic())
+
+        primary = candidates.pop(0)
+        launch(primary)
+        hedged = False
+
+        while pending:
+            wait_for = remaining()
+            slow = None
+            if self.hedge and not hedged and candidates and len(pending) == 1:
+                slow, started = next(iter(pending.values()))
+                hedge_after = self._hedge_after(slow)
+                if hedge_after is not None and hedge_after - (time.monotonic() - started) < wait_for:
+                    wait_for = hedge_after - (time.monotonic() - started)
+                else:
+                    slow = None
+
+            done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            if not done:
+                if slow is None or remaining() <= 0:
+                    break
+                # Réponse en retard : même requête au fournisseur suivant
+                hedged = True
+                LLM_HEDGES.inc(outcome='sent')
+                logger.info(f"Requête LLM dupliquée vers {candidates[0].name} ({slow.name} en retard)")
+                launch(candidates.pop(0))
+                continue
+
+            for future in done:
+                provider, _ = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {str(e)}")
+                    continue
+                if hedged:
+                    # won : la requête dupliquée a répondu avant le fournisseur principal
+                    LLM_HEDGES.inc(outcome='lost' if provider is primary else 'won')
+                self._abandon(pending)
+                return response, provider
+
+            # Échec : fournisseur suivant, s'il reste du temps
+            if not pending and candidates and remaining() > 0:
+                logger.warning(f"Fournisseur LLM en échec, bascule vers {candidates[0].name}: {errors[-1]}")
+                launch(candidates.pop(0))
+
+        self._abandon(pending)
+        if not errors:
+            errors.append(f"aucune réponse en {timeout:.1f}s")
+        raise LLMRouterError('; '.join(errors))
+
+    @staticmethod
+    def _abandon(pending: Dict):
+        """Appels perdants : leurs tokens sont comptés à leur terme"""
+        for future in pending:
+            future.add_done_callback(_record_abandoned_tokens)
+
+
+def _record_abandoned_tokens(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    usage = getattr(future.result(), 'usage', None)
+    record_tokens('prompt', getattr(usage, 'prompt_tokens', None) or 0)
+    record_tokens('completion', getattr(usage, 'completion_tokens', None) or 0)
+
+
+def configured_providers() -> List[Dict]:
+    """Fournisseurs de LLM_PROVIDERS, ou le fournisseur unique LLM_API_BASE / LLM_MODEL"""
+    if not settings.LLM_PROVIDERS:
+        return [{
+            'name': 'default',
+            'base_url': settings.LLM_API_BASE,
+            'api_key': settings.LLM_API_KEY,
+            'model': settings.LLM_MODEL,
+        }]
+    providers = []
+    for index, provider in enumerate(settings.LLM_PROVIDERS):
+        api_key = provider.get('api_key') or os.environ.get(provider.get('api_key_env', ''), '')
+        providers.append({
+            'name': provider.get('name') or f'provider-{index}',
+            'base_url': provider['base_url'],
+            'api_key': api_key,
+            'model': provider.get('model') or settings.LLM_MODEL,
+        })
+    return providers
+
+
+_router = None
+_router_key = None
+_router_lock = threading.Lock()
+
+
+def _provider(entry: Dict, previous: Optional[Provider]) -> Provider:
+    """
+    Fournisseur d'une entrée de configuration : le précédent s'il est
+    inchangé, sinon un nouveau (nouveau client, clé API renouvelée par
+    exemple) qui reprend les statistiques du même point d'accès
+    """
+    if previous is not None and previous.api_key == entry['api_key'] and previous.alpha == settings.LLM_EWMA_ALPHA:
+        return previous
+
+    provider = Provider(alpha=settings.LLM_EWMA_ALPHA, **entry)
+    if previous is not None:
+        with previous._lock:
+            provider.latency = previous.latency
+            provider.variance = previous.variance
+            provider.error_rate = previous.error_rate
+            provider.failures = previous.failures
+            provider.disabled_until = previous.disabled_until
+    return provider
+
+
+def get_router() -> LLMRouter:
+    """
+    Routeur partagé par le processus
+
+    Reconstruit si la configuration change : les statistiques des
+    fournisseurs inchangés sont conservées.
+    """
+    global _router, _router_key
+    config = configured_providers()
+    key = (
+        repr(config), settings.LLM_HEDGE_ENABLED, settings.LLM_HEDGE_DELAY, settings.LLM_HEDGE_MIN_DELAY,
+        settings.LLM_EWMA_ALPHA, settings.LLM_FAILURE_THRESHOLD, settings.LLM_PROVIDER_COOLDOWN,
+    )
+    if _router is not None and _router_key == key:
+        return _router
+
+    with _router_lock:
+        if _router is None or _router_key != key:
+            previous = {
+                (provider.name, provider.base_url, provider.model): provider
+                for provider in (_router.providers if _router is not None else [])
+            }
+            providers = [
+                _provider(entry, previous.get((entry['name'], entry['base_url'], entry['model'])))
+                for entry in config
+            ]
+            _router = LLMRouter(
+                providers,
+                hedge=settings.LLM_HEDGE_ENABLED,
+                hedge_delay=settings.LLM_HEDGE_DELAY,
+                min_hedge_delay=settings.LLM_HEDGE_MIN_DELAY,
+                failure_threshold=settings.LLM_FAILURE_THRESHOLD,
+                cooldown=settings.LLM_PROVIDER_COOLDOWN,
+            )
+            _router_key = key
+    return _router
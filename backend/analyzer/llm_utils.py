@@ -1,33 +1,13 @@
-import os
-from openai import OpenAI
 from django.conf import settings
-import json
 import logging
-from decouple import config
 
 
-import json
-import re
-
-def extract_json(text: str):
-    """
-    Extrait la partie JSON d'un texte qui contient du contenu supplémentaire (ex: commentaires IA).
-    Retourne un dictionnaire Python.
-    """
-    try:
-        # Trouver la première accolade ouvrante et la dernière fermante
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if not match:
-            raise ValueError("Aucun JSON trouvé dans le texte.")
-        
-        json_str = match.group(0).strip()
-        
-        # Charger en objet Python
-        #data = json.loads(json_str)
-        return json_str
-    except Exception as e:
-        raise ValueError(f"Erreur lors de l'extraction du JSON : {e}")
-
+from .deadline import DeadlineExceeded
+from .json_extractor import ANALYSIS_SCHEMA, extract_json, validate_analysis
+from .languages import documents_language, prompt_language_note
+from .llm_router import get_router
+from .metrics import FALLBACKS, record_tokens, span
+from .prompt_budget import build_prompt_content
 
 
 logger = logging.getLogger(__name__)
@@ -38,31 +18,102 @@ logger = logging.getLogger(__name__)
 #     openai.api_base = settings.OPENAI_API_BASE
 
 
-def analyze_legal_documents(documents_content, domain):
+class LLMAnalysisError(Exception):
+    """Analyse LLM impossible (erreur du fournisseur ou réponse inexploitable)"""
+
+
+SYSTEM_PROMPT = "Vous êtes un expert juridique spécialisé dans l'analyse de documents juridiques web. Votre rôle est d'expliquer ces documents de manière claire et accessible au grand public."
+
+
+def request_completion(prompt, domain, deadline=None, prompt_tokens=0):
+    """
+    Envoie un prompt au LLM (fournisseur choisi par le routeur)
+    
+    Args:
+        prompt_tokens (int): Estimation locale des tokens du prompt, comptée
+            si le fournisseur ne renvoie pas sa consommation
+    
+    Returns:
+        str: Texte de la réponse
+    
+    Raises:
+        DeadlineExceeded: Budget épuisé avant l'appel
+        Exception: Erreur du fournisseur
+    """
+    # Délai de l'appel borné par le budget restant, sans nouvel essai
+    # qui le dépasserait
+    timeout = settings.LLM_TIMEOUT if deadline is None else deadline.timeout(settings.LLM_TIMEOUT, 'llm')
+    
+    # Fournisseur le plus rapide, requête dupliquée vers un autre s'il tarde
+    response, provider = get_router().complete(
+        timeout=timeout,
+        max_retries=2 if deadline is None or deadline.budget is None else 0,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+    )
+    logger.info(f"Analyse LLM de {domain} par {provider.name}")
+    
+    # Tokens facturés (estimation locale si le fournisseur ne les renvoie pas)
+    usage = getattr(response, 'usage', None)
+    record_tokens('prompt', getattr(usage, 'prompt_tokens', None) or prompt_tokens)
+    record_tokens('completion', getattr(usage, 'completion_tokens', None) or 0)
+    
+    return response.choices[0].message.content.strip()
+
+
+def error_analysis(error):
+    """Analyse de repli après une erreur du LLM"""
+    return {
+        "summary": f"Erreur lors de l'analyse automatique: {str(error)}",
+        "what_you_accept": "Information non disponible",
+        "data_collected": "Information non disponible",
+        "data_usage": "Information non disponible",
+        "data_sharing": "Information non disponible", 
+        "retention_period": "Information non disponible",
+        "critical_points": "Information non disponible",
+        "key_points": ["Erreur lors de l'analyse"],
+        "readability_score": 1,
+        "risk_level": "high",
+        "risk_explanation": "Impossible d'analyser les documents"
+    }
+
+
+def analyze_legal_documents(documents_content, domain, deadline=None, raise_errors=False):
     """
     Analyse les documents juridiques avec l'IA
     
     Args:
         documents_content (list): Liste des contenus des documents
         domain (str): Nom de domaine du site
+        deadline (Deadline): Budget de temps restant de l'analyse (optionnel)
+        raise_errors (bool): Lever LLMAnalysisError au lieu de retourner une
+            analyse de repli (pour pouvoir réessayer plus tard)
     
     Returns:
         dict: Résultats de l'analyse
+    
+    Raises:
+        DeadlineExceeded: Budget épuisé avant la réponse du modèle
+        LLMAnalysisError: Échec de l'analyse, si `raise_errors`
     """
     
-    # Combiner tous les documents
-    combined_content = "\n\n".join([
-        f"=== {doc.get('title', 'Document')} ===\n{doc.get('content', '')}"
-        for doc in documents_content
-    ])
+    # Combiner tous les documents dans le budget de tokens du modèle
+    with span('prompt_build'):
+        combined_content, budget_report = build_prompt_content(documents_content)
+    logger.info(
+        f"Prompt {domain}: {budget_report['tokens_after']} tokens "
+        f"({budget_report['tokens_saved']} économisés, "
+        f"{budget_report['tokens_deduplicated']} dédupliqués)"
+    )
     
-    # Limiter la taille du contenu pour éviter les erreurs de token
-    if len(combined_content) > 50000:
-        combined_content = combined_content[:50000] + "... [contenu tronqué]"
+    # Documents dans une autre langue : consigne de traduction et vocabulaire
+    language_note = prompt_language_note(documents_language(documents_content))
     
     prompt = f"""
 Analysez les documents juridiques suivants du site web "{domain}" et fournissez une analyse structurée en français.
-
+{language_note}
 DOCUMENTS À ANALYSER:
 {combined_content}
 
@@ -98,72 +149,33 @@ INSTRUCTIONS:
 """
 
     try:
-        client = OpenAI(
-            base_url="https://router.huggingface.co/v1",
-            api_key=config('HF_TOKEN'),
-        )
-        
-        response = client.chat.completions.create(
-            model="deepseek-ai/DeepSeek-V3.1:fireworks-ai",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Vous êtes un expert juridique spécialisé dans l'analyse de documents juridiques web. Votre rôle est d'expliquer ces documents de manière claire et accessible au grand public."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-        )
-        
-        # Extraire le contenu de la réponse
-        content = extract_json(response.choices[0].message.content.strip())
-        
-        print(content)
-        # # Nettoyer le JSON si nécessaire
-        # if content.startswith('```json'):
-        #     content = content[7:]
-        # if content.endswith('```'):
-        #     content = content[:-3]
+        with span('llm'):
+            raw_content = request_completion(prompt, domain, deadline, budget_report['tokens_after'])
         
         # Parser le JSON
         try:
-            analysis_result = json.loads(content)
-        except json.JSONDecodeError:
-            logger.error(f"Erreur de parsing JSON: {content}")
+            with span('json_parse'):
+                analysis_result = validate_analysis(extract_json(raw_content))
+        except ValueError as e:
+            FALLBACKS.inc(kind='json_parse')
+            logger.error(f"Erreur de parsing JSON: {raw_content}")
+            if raise_errors:
+                raise LLMAnalysisError(f"Réponse LLM inexploitable: {str(e)}") from e
             # Fallback avec une structure de base
-            analysis_result = {
-                "summary": "Analyse automatique non disponible. Veuillez consulter les documents directement.",
-                "what_you_accept": "Information non disponible",
-                "data_collected": "Information non disponible",
-                "data_usage": "Information non disponible", 
-                "data_sharing": "Information non disponible",
-                "retention_period": "Information non disponible",
-                "critical_points": "Information non disponible",
-                "key_points": ["Analyse automatique non disponible"],
-                "readability_score": 5,
-                "risk_level": "moderate",
-                "risk_explanation": "Analyse automatique non disponible"
-            }
+            analysis_result = dict(ANALYSIS_SCHEMA, key_points=list(ANALYSIS_SCHEMA['key_points']))
         
         return analysis_result
         
+    except (DeadlineExceeded, LLMAnalysisError):
+        raise
     except Exception as e:
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"délai dépassé pendant l'analyse LLM: {str(e)}") from e
+        FALLBACKS.inc(kind='llm_error')
         logger.error(f"Erreur lors de l'analyse LLM: {str(e)}")
-        return {
-            "summary": f"Erreur lors de l'analyse automatique: {str(e)}",
-            "what_you_accept": "Information non disponible",
-            "data_collected": "Information non disponible",
-            "data_usage": "Information non disponible",
-            "data_sharing": "Information non disponible", 
-            "retention_period": "Information non disponible",
-            "critical_points": "Information non disponible",
-            "key_points": ["Erreur lors de l'analyse"],
-            "readability_score": 1,
-            "risk_level": "high",
-            "risk_explanation": "Impossible d'analyser les documents"
-        }
+        if raise_errors:
+            raise LLMAnalysisError(str(e)) from e
+        return error_analysis(e)
 
 
 def get_risk_score_color(risk_level):
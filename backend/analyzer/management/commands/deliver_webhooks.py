@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.webhooks import deliver_due
+
+
+class Command(BaseCommand):
+    """
+    Envoie les notifications de fin d'analyse dues (nouvelles tentatives)
+
+    Les notifications partent en arrière-plan à la fin de chaque analyse ;
+    les nouvelles tentatives après un échec sont envoyées par cette commande,
+    à planifier (cron) toutes les minutes par exemple.
+    """
+
+    help = "Envoie les notifications de fin d'analyse en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Nombre maximal de notifications envoyées")
+
+    def handle(self, *args, **options):
+        report = deliver_due(options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['delivered']} notification(s) envoyée(s), {report['retried']} reportée(s), "
+            f"{report['failed']} en échec"
+        ))
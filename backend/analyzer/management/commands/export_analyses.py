@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.exports import FORMATS, export_stream, parse_fields
+
+
+class Command(BaseCommand):
+    """
+    Exporte les analyses et leurs documents en NDJSON ou CSV
+
+    Exemple : python manage.py export_analyses --gzip --output analyses.ndjson.gz
+    """
+
+    help = "Exporte les analyses (NDJSON ou CSV, éventuellement compressé)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--fields',
+            help="Champs séparés par des virgules (ex: domain,risk_level,documents.url) ; tous par défaut"
+        )
+        parser.add_argument('--gzip', action='store_true', help="Compresser la sortie (gzip)")
+        parser.add_argument('--output', default='-', help="Fichier de sortie (sortie standard par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help="Analyses lues par lot")
+
+    def handle(self, *args, **options):
+        try:
+            fields, document_fields = parse_fields(options['fields'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        stream = export_stream(options['format'], fields, document_fields, options['gzip'], options['chunk_size'])
+        start = time.perf_counter()
+        written = 0
+
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in stream:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Export terminé: {written} octets en {time.perf_counter() - start:.1f}s ({options['output']})"
+            ))
@@ -0,0 +1,59 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.imports import CONFLICT_POLICIES, import_analyses, open_snapshot
+from analyzer.stats import refresh_stats
+
+
+class Command(BaseCommand):
+    """
+    Importe un export NDJSON (éventuellement gzip) d'analyses et de leurs
+    documents, pour démarrer un environnement sans tout réanalyser
+
+    Exemple : python manage.py import_analyses analyses.ndjson.gz --on-conflict newer
+    """
+
+    help = "Importe des analyses depuis un export NDJSON (manage.py export_analyses)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier d'export (- pour l'entrée standard)")
+        parser.add_argument(
+            '--on-conflict', choices=CONFLICT_POLICIES, default='newer',
+            help="Domaine déjà analysé avec un contenu différent : remplacer si plus récent, "
+                 "toujours remplacer, ou conserver l'existant"
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help="Analyses écrites par lot")
+
+    def handle(self, *args, **options):
+        try:
+            stream = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+
+        def progress(report):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - start
+                rows = report['created'] + report['updated'] + report['unchanged'] + report['skipped']
+                self.stdout.write(f"{rows} analyses lues ({rows / elapsed:.0f}/s)")
+
+        try:
+            report = import_analyses(open_snapshot(stream), options['on_conflict'], options['batch_size'], progress)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        written = report['created'] + report['updated']
+        refresh_stats()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé en {elapsed:.1f}s: {report['created']} créée(s), {report['updated']} remplacée(s), "
+            f"{report['unchanged']} identique(s), {report['skipped']} conservée(s), {report['invalid']} invalide(s) ; "
+            f"{report['documents']} document(s) ; "
+            f"{written / elapsed if elapsed else 0:.0f} analyses/s, "
+            f"{(written + report['documents']) / elapsed if elapsed else 0:.0f} lignes/s"
+        ))
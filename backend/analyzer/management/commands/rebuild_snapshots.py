@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Republie toutes les analyses réussies pour /api/snapshot/ et /api/badge/
+
+    Les analyses sont publiées à leur enregistrement ; à lancer après un
+    déploiement qui modifie leur sérialisation (ou pour les analyses
+    antérieures à la publication).
+    """
+
+    help = "Recalcule les réponses précalculées des analyses et des badges"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Analyses sérialisées par lot")
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} analyse(s) publiée(s)"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.stats import get_stats, refresh_stats
+
+
+class Command(BaseCommand):
+    """
+    Recalcule les statistiques et classements de /api/stats/
+
+    Les analyses les mettent à jour au fil de l'eau ; ce recalcul complet,
+    à planifier (cron), corrige les écarts (suppressions, imports).
+    """
+
+    help = "Recalcule les statistiques agrégées des analyses"
+
+    def handle(self, *args, **options):
+        refresh_stats()
+        stats = get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Statistiques recalculées: {stats['analyses']['successful']} analyse(s) réussie(s), "
+            f"{stats['analyses']['failed']} en échec"
+        ))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analyzer.analysis_pipeline import AnalysisPipeline
+from analyzer.deadline import Deadline
+from analyzer.models import AnalysisCheckpoint
+
+
+class Command(BaseCommand):
+    """
+    Reprend les analyses interrompues à leur dernière étape terminée
+
+    À planifier (cron, timer systemd) : chaque exécution fait une tentative
+    par analyse, jusqu'à ANALYSIS_MAX_ATTEMPTS.
+    """
+
+    help = "Reprend les analyses interrompues (délai dépassé, erreur du LLM...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help="Nombre maximal d'analyses reprises")
+        parser.add_argument(
+            '--idle', type=float, default=settings.ANALYSIS_DEADLINE,
+            help="Ancienneté minimale de la dernière tentative (secondes), pour ne pas doubler une requête en cours"
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        checkpoints = AnalysisCheckpoint.objects.exclude(stage='persisted').filter(
+            attempts__lt=settings.ANALYSIS_MAX_ATTEMPTS,
+            updated_at__lt=now - timezone.timedelta(seconds=options['idle']),
+            created_at__gte=now - timezone.timedelta(seconds=settings.ANALYSIS_CHECKPOINT_TTL),
+        ).order_by('updated_at')[:options['limit']]
+
+        resumed = failed = 0
+        for checkpoint in checkpoints:
+            pipeline = AnalysisPipeline(checkpoint.url, Deadline(settings.ANALYSIS_DEADLINE))
+            try:
+                pipeline.run()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{checkpoint.domain}: échec à l'étape {pipeline.checkpoint.stage} ({str(e)})")
+                continue
+
+            resumed += 1
+            self.stdout.write(
+                f"{checkpoint.domain}: repris à l'étape {pipeline.resumed_from}, "
+                f"{'aucun document' if pipeline.no_documents else 'terminé'}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"{resumed} analyse(s) reprise(s), {failed} échec(s)"))
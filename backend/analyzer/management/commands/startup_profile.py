@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.startup import profile_imports, summarize_import_times
+
+
+class Command(BaseCommand):
+    """
+    Temps d'import au démarrage d'un worker (`python -X importtime`),
+    regroupé par paquet, et modules les plus lents
+
+    Mesuré dans un nouveau processus : à comparer avant et après l'ajout
+    d'une dépendance importée au chargement d'un module.
+    """
+
+    help = "Décompose le temps d'import au démarrage de l'application"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='legal_analyzer.wsgi', help="Point d'entrée importé")
+        parser.add_argument('--top', type=int, default=15, help="Nombre de paquets et de modules affichés")
+        parser.add_argument('--no-warm-up', action='store_true', help="Sans le préchauffage de wsgi/asgi")
+
+    def handle(self, *args, **options):
+        try:
+            entries = profile_imports(options['module'], warm_up=not options['no_warm_up'])
+        except RuntimeError as e:
+            raise CommandError(f"Import de {options['module']} impossible: {str(e)}")
+
+        total = sum(entry['self'] for entry in entries)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(entries)} module(s) importé(s) en {total / 1000:.1f} ms ({options['module']})"
+        ))
+
+        self.stdout.write("\nPar paquet (temps propre) :")
+        for package, duration in list(summarize_import_times(entries).items())[:options['top']]:
+            self.stdout.write(f"  {duration / 1000:8.1f} ms  {100 * duration / total:5.1f} %  {package}")
+
+        self.stdout.write("\nModules les plus lents (import compris de leurs dépendances) :")
+        slowest = sorted(entries, key=lambda entry: entry['cumulative'], reverse=True)[:options['top']]
+        for entry in slowest:
+            self.stdout.write(f"  {entry['cumulative'] / 1000:8.1f} ms  {entry['module']}")
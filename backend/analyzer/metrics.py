@@ -0,0 +1,298 @@
+import contextvars
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Bornes des histogrammes de durée (secondes) et de tokens
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 12000, 16000, 32000, 64000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """Compteur monotone, éventuellement ventilé par étiquettes"""
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in values
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes (format Prometheus : buckets cumulés, somme, nombre)"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu d'étiquettes : [compte par bucket (+Inf en dernier), somme, nombre]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """Ensemble des métriques du processus, exportées au format texte Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'guardclause_stage_duration_seconds', "Durée des étapes du pipeline d'analyse", ['stage'])
+ANALYSIS_SECONDS = registry.histogram(
+    'guardclause_analysis_duration_seconds', "Durée totale d'une analyse", ['outcome'])
+ANALYSES = registry.counter(
+    'guardclause_analyses_total', "Analyses demandées, par issue", ['outcome'])
+CACHE_REQUESTS = registry.counter(
+    'guardclause_cache_requests_total', "Consultations des caches", ['cache', 'result'])
+FALLBACKS = registry.counter(
+    'guardclause_fallbacks_total', "Recours aux solutions de repli", ['kind'])
+FETCH_ERRORS = registry.counter(
+    'guardclause_fetch_errors_total', "Erreurs de téléchargement des documents, par type", ['error'])
+LLM_TOKENS = registry.counter(
+    'guardclause_llm_tokens_total', "Tokens consommés auprès du LLM", ['kind'])
+LLM_REQUESTS = registry.counter(
+    'guardclause_llm_requests_total', "Appels aux fournisseurs LLM, par issue", ['provider', 'outcome'])
+LLM_PROVIDER_SECONDS = registry.histogram(
+    'guardclause_llm_provider_duration_seconds', "Durée des appels LLM réussis, par fournisseur", ['provider'])
+LLM_HEDGES = registry.counter(
+    'guardclause_llm_hedges_total', "Requêtes LLM dupliquées vers un second fournisseur, par issue", ['outcome'])
+WEBHOOK_DELIVERIES = registry.counter(
+    'guardclause_webhook_deliveries_total', "Notifications de fin d'analyse, par issue", ['outcome'])
+ANALYSIS_TOKENS = registry.histogram(
+    'guardclause_analysis_tokens', "Tokens consommés par analyse", ['kind'], buckets=TOKEN_BUCKETS)
+
+
+class AnalysisTrace:
+    """Durées par étape et tokens consommés d'une analyse"""
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self.outcome = 'error'
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, duration: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+    def add_tokens(self, kind: str, count: int):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def as_dict(self) -> Dict:
+        return {
+            'domain': self.domain,
+            'duration': round(time.perf_counter() - self.started, 4),
+            'stages': {stage: round(duration, 4) for stage, duration in self.stages.items()},
+            'tokens': dict(self.tokens),
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[AnalysisTrace]] = contextvars.ContextVar(
+    'analysis_trace', default=None)
+
+
+def current_trace() -> Optional[AnalysisTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_analysis(domain: str):
+    """
+    Suit une analyse : les étapes exécutées dans ce contexte (et dans les
+    threads lancés via `bind_trace`) y sont rattachées
+
+    Yields:
+        AnalysisTrace: Trace de l'analyse, dont `outcome` est à renseigner
+    """
+    trace = AnalysisTrace(domain)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        duration = time.perf_counter() - trace.started
+        ANALYSES.inc(outcome=trace.outcome)
+        ANALYSIS_SECONDS.observe(duration, outcome=trace.outcome)
+        for kind, count in trace.tokens.items():
+            ANALYSIS_TOKENS.observe(count, kind=kind)
+        logger.info(f"Trace d'analyse ({trace.outcome}): {trace.as_dict()}")
+
+
+def bind_trace(function):
+    """Propage la trace courante à `function`, exécutée dans un autre thread"""
+    trace = _current_trace.get()
+    if trace is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return wrapper
+
+
+@contextmanager
+def span(stage: str):
+    """Mesure la durée d'une étape du pipeline"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(stage, duration)
+
+
+def record_tokens(kind: str, count: int):
+    """Comptabilise des tokens LLM (globalement et pour l'analyse en cours)"""
+    if not count:
+        return
+    LLM_TOKENS.inc(count, kind=kind)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_tokens(kind, count)
+
+
+def error_type(error: BaseException) -> str:
+    """Étiquette courte d'une erreur de téléchargement (http_404, Timeout...)"""
+    response = getattr(error, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code:
+        return f'http_{status_code}'
+    return type(error).__name__
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveredDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True, verbose_name='Domaine')),
+                ('documents', models.JSONField(default=list, verbose_name='Documents découverts')),
+                ('discovered_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de découverte')),
+                ('expires_at', models.DateTimeField(verbose_name="Date d'expiration")),
+            ],
+            options={
+                'verbose_name': 'Découverte de documents',
+                'verbose_name_plural': 'Découvertes de documents',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_discovereddocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(blank=True, max_length=255, verbose_name='Domaine')),
+                ('path', models.CharField(max_length=255, verbose_name='Chemin')),
+                ('profiler', models.CharField(choices=[('cprofile', 'cProfile'), ('sampling', 'Échantillonnage')], max_length=10, verbose_name='Profileur')),
+                ('trigger', models.CharField(choices=[('request', 'Demandé'), ('sample', 'Échantillon automatique')], max_length=10, verbose_name='Déclenchement')),
+                ('duration', models.FloatField(verbose_name='Durée (s)')),
+                ('status_code', models.IntegerField(verbose_name='Statut HTTP')),
+                ('summary', models.TextField(blank=True, verbose_name='Résumé')),
+                ('data', models.BinaryField(verbose_name='Profil')),
+                ('size', models.IntegerField(default=0, verbose_name='Taille (octets)')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de création')),
+                ('analysis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='analyzer.websiteanalysis', verbose_name='Analyse')),
+            ],
+            options={
+                'verbose_name': "Profil d'analyse",
+                'verbose_name_plural': "Profils d'analyse",
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_analysisprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True, verbose_name='Domaine')),
+                ('url', models.URLField(verbose_name="URL d'origine")),
+                ('stage', models.CharField(choices=[('pending', 'En attente'), ('discovered', 'Documents découverts'), ('fetched', 'Documents extraits'), ('analysed', 'Analyse LLM terminée'), ('persisted', 'Enregistrée')], default='pending', max_length=20, verbose_name='Étape')),
+                ('discovered', models.JSONField(default=list, verbose_name='Documents découverts')),
+                ('documents', models.JSONField(default=list, verbose_name='Documents extraits')),
+                ('result', models.JSONField(default=dict, verbose_name="Résultat de l'analyse")),
+                ('attempts', models.IntegerField(default=0, verbose_name='Tentatives')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+            ],
+            options={
+                'verbose_name': "Reprise d'analyse",
+                'verbose_name_plural': "Reprises d'analyses",
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_analysischeckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('worst', 'Sites les plus risqués'), ('best', 'Sites les plus respectueux')], max_length=10, verbose_name='Classement')),
+                ('rank', models.PositiveIntegerField(verbose_name='Rang')),
+                ('domain', models.CharField(max_length=255, verbose_name='Domaine')),
+                ('risk_level', models.CharField(choices=[('low', 'Faible'), ('moderate', 'Modéré'), ('high', 'Élevé')], max_length=10, verbose_name='Niveau de risque')),
+                ('readability_score', models.IntegerField(verbose_name='Score de lisibilité')),
+                ('analysed_at', models.DateTimeField(verbose_name="Date de l'analyse")),
+            ],
+            options={
+                'verbose_name': 'Entrée de classement',
+                'verbose_name_plural': 'Classements',
+                'ordering': ['board', 'rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True, verbose_name='Clé')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Valeur')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Statistique',
+                'verbose_name_plural': 'Statistiques',
+                'ordering': ['key'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='websiteanalysis',
+            index=models.Index(fields=['risk_level'], name='analysis_risk_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='websiteanalysis',
+            index=models.Index(fields=['readability_score'], name='analysis_readability_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['board', 'rank'], name='leaderboard_board_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_stats_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websiteanalysis',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte du contenu'),
+        ),
+    ]
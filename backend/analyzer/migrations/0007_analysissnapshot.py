@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_websiteanalysis_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True, verbose_name='Domaine')),
+                ('payload', models.BinaryField(verbose_name='Analyse (JSON)')),
+                ('payload_etag', models.CharField(max_length=66, verbose_name="ETag de l'analyse")),
+                ('badge', models.BinaryField(verbose_name='Badge (JSON)')),
+                ('badge_etag', models.CharField(max_length=66, verbose_name='ETag du badge')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='analyzer.websiteanalysis', verbose_name='Analyse')),
+            ],
+            options={
+                'verbose_name': 'Analyse publiée',
+                'verbose_name_plural': 'Analyses publiées',
+                'ordering': ['domain'],
+            },
+        ),
+    ]
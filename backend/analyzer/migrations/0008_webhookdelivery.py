@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_analysissnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, verbose_name='Domaine')),
+                ('callback_url', models.URLField(max_length=1000, verbose_name='URL de rappel')),
+                ('secret', models.CharField(blank=True, max_length=128, verbose_name='Clé de signature')),
+                ('status', models.CharField(choices=[('waiting', "En attente de l'analyse"), ('pending', 'À envoyer'), ('sending', "En cours d'envoi"), ('delivered', 'Envoyée'), ('failed', 'En échec'), ('expired', 'Expirée')], default='waiting', max_length=10, verbose_name='Statut')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Tentatives')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Prochaine tentative')),
+                ('claim', models.CharField(blank=True, max_length=32, verbose_name='Envoi en cours')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name="Date d'envoi")),
+                ('analysis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_deliveries', to='analyzer.websiteanalysis', verbose_name='Analyse')),
+            ],
+            options={
+                'verbose_name': "Notification de fin d'analyse",
+                'verbose_name_plural': "Notifications de fin d'analyse",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['domain', 'status'], name='webhook_domain_status_idx'), models.Index(fields=['status', 'next_attempt_at'], name='webhook_status_due_idx')],
+            },
+        ),
+    ]
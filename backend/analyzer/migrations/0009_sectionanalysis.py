@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_webhookdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt_hash', models.CharField(max_length=64, unique=True, verbose_name='Empreinte du prompt')),
+                ('domain', models.CharField(max_length=255, verbose_name='Domaine')),
+                ('document_type', models.CharField(choices=[('terms', "Conditions d'utilisation"), ('privacy', 'Politique de confidentialité'), ('cookies', 'Politique de cookies'), ('legal', 'Mentions légales'), ('other', 'Autre')], max_length=20, verbose_name='Type de document')),
+                ('result', models.JSONField(default=dict, verbose_name="Résultat de l'analyse")),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de création')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name="Date d'expiration")),
+            ],
+            options={
+                'verbose_name': 'Analyse par type de document',
+                'verbose_name_plural': 'Analyses par type de document',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from django.utils import timezone
 
@@ -43,6 +45,9 @@ class WebsiteAnalysis(models.Model):
     # Documents trouvés
     documents_found = models.JSONField(default=list, verbose_name="Documents trouvés")
     
+    # Empreinte des documents analysés (import : détection des analyses identiques)
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name="Empreinte du contenu")
+    
     # Statut de l'analyse
     is_successful = models.BooleanField(default=True, verbose_name="Analyse réussie")
     error_message = models.TextField(blank=True, verbose_name="Message d'erreur")
@@ -51,6 +56,22 @@ class WebsiteAnalysis(models.Model):
         verbose_name = "Analyse de site web"
         verbose_name_plural = "Analyses de sites web"
         ordering = ['-created_at']
+        indexes = [
+            # Filtres de l'administration
+            models.Index(fields=['risk_level'], name='analysis_risk_level_idx'),
+            models.Index(fields=['readability_score'], name='analysis_readability_idx'),
+        ]
+    
+    @staticmethod
+    def hash_documents(documents):
+        """Empreinte SHA-256 des documents [{'url', 'content'}], indépendante de leur ordre"""
+        digest = hashlib.sha256()
+        for url, content in sorted((doc.get('url', ''), doc.get('content', '')) for doc in documents):
+            digest.update(url.encode())
+            digest.update(b'\0')
+            digest.update(content.encode())
+            digest.update(b'\0')
+        return digest.hexdigest() if documents else ''
     
     def __str__(self):
         return f"Analyse de {self.domain}"
@@ -101,3 +122,372 @@ class LegalDocument(models.Model):
     def __str__(self):
         return f"{self.get_document_type_display()} - {self.analysis.domain}"
 
+
+
+class DiscoveredDocument(models.Model):
+    """Cache des URLs de documents juridiques découvertes pour un domaine"""
+    
+    domain = models.CharField(max_length=255, unique=True, verbose_name="Domaine")
+    
+    # Liste des documents trouvés : [{'type', 'url', 'text'}] (vide = cache négatif)
+    documents = models.JSONField(default=list, verbose_name="Documents découverts")
+    
+    discovered_at = models.DateTimeField(default=timezone.now, verbose_name="Date de découverte")
+    expires_at = models.DateTimeField(verbose_name="Date d'expiration")
+    
+    class Meta:
+        verbose_name = "Découverte de documents"
+        verbose_name_plural = "Découvertes de documents"
+    
+    @classmethod
+    def lookup(cls, domain):
+        """Retourne les documents en cache pour le domaine, ou None si absent ou expiré"""
+        entry = cls.objects.filter(domain=domain, expires_at__gt=timezone.now()).first()
+        return entry.documents if entry else None
+    
+    @classmethod
+    def store(cls, domain, documents, ttl):
+        """Enregistre le résultat d'une découverte pour `ttl` secondes"""
+        now = timezone.now()
+        cls.objects.update_or_create(
+            domain=domain,
+            defaults={
+                'documents': documents,
+                'discovered_at': now,
+                'expires_at': now + timezone.timedelta(seconds=ttl),
+            }
+        )
+    
+    @classmethod
+    def invalidate(cls, domain):
+        cls.objects.filter(domain=domain).delete()
+    
+    @property
+    def is_negative(self):
+        return not self.documents
+    
+    def __str__(self):
+        return f"Découverte de {self.domain}"
+
+
+class SectionAnalysis(models.Model):
+    """
+    Analyse LLM d'un type de document (mode per_type), réutilisée tant que
+    son prompt (domaine, contenu après budget, consignes) ne change pas
+
+    En base plutôt que dans le cache Django : partagée par tous les workers
+    et conservée au redémarrage.
+    """
+    
+    prompt_hash = models.CharField(max_length=64, unique=True, verbose_name="Empreinte du prompt")
+    domain = models.CharField(max_length=255, verbose_name="Domaine")
+    document_type = models.CharField(
+        max_length=20,
+        choices=LegalDocument.DOCUMENT_TYPES,
+        verbose_name="Type de document"
+    )
+    result = models.JSONField(default=dict, verbose_name="Résultat de l'analyse")
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date de création")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Date d'expiration")
+    
+    class Meta:
+        verbose_name = "Analyse par type de document"
+        verbose_name_plural = "Analyses par type de document"
+        ordering = ['-created_at']
+    
+    @classmethod
+    def lookup(cls, prompt_hashes):
+        """Résultats en cache non expirés : {empreinte: résultat}"""
+        return dict(cls.objects.filter(
+            prompt_hash__in=prompt_hashes, expires_at__gt=timezone.now()
+        ).values_list('prompt_hash', 'result'))
+    
+    @classmethod
+    def store(cls, prompt_hash, domain, document_type, result, ttl):
+        """Enregistre un résultat pour `ttl` secondes (et purge les résultats expirés)"""
+        now = timezone.now()
+        cls.objects.filter(expires_at__lte=now).delete()
+        cls.objects.update_or_create(
+            prompt_hash=prompt_hash,
+            defaults={
+                'domain': domain,
+                'document_type': document_type,
+                'result': result,
+                'created_at': now,
+                'expires_at': now + timezone.timedelta(seconds=ttl),
+            }
+        )
+    
+    def __str__(self):
+        return f"Analyse {self.get_document_type_display()} de {self.domain}"
+
+
+class AnalysisProfile(models.Model):
+    """Profil d'exécution d'une requête d'analyse (cProfile ou échantillonnage)"""
+    
+    PROFILER_CHOICES = [
+        ('cprofile', 'cProfile'),
+        ('sampling', 'Échantillonnage'),
+    ]
+    
+    TRIGGER_CHOICES = [
+        ('request', 'Demandé'),
+        ('sample', 'Échantillon automatique'),
+    ]
+    
+    analysis = models.ForeignKey(
+        WebsiteAnalysis,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='profiles',
+        verbose_name="Analyse"
+    )
+    domain = models.CharField(max_length=255, blank=True, verbose_name="Domaine")
+    path = models.CharField(max_length=255, verbose_name="Chemin")
+    
+    profiler = models.CharField(max_length=10, choices=PROFILER_CHOICES, verbose_name="Profileur")
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, verbose_name="Déclenchement")
+    duration = models.FloatField(verbose_name="Durée (s)")
+    status_code = models.IntegerField(verbose_name="Statut HTTP")
+    
+    # Fonctions les plus coûteuses (texte) et profil complet (pstats ou piles agrégées)
+    summary = models.TextField(blank=True, verbose_name="Résumé")
+    data = models.BinaryField(verbose_name="Profil")
+    size = models.IntegerField(default=0, verbose_name="Taille (octets)")
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date de création")
+    
+    class Meta:
+        verbose_name = "Profil d'analyse"
+        verbose_name_plural = "Profils d'analyse"
+        ordering = ['-created_at']
+    
+    def save(self, *args, **kwargs):
+        self.size = len(self.data or b'')
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def prune(cls, max_profiles):
+        """Ne conserve que les `max_profiles` profils les plus récents"""
+        stale = cls.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[max_profiles:]
+        stale_ids = list(stale)
+        if stale_ids:
+            cls.objects.filter(pk__in=stale_ids).delete()
+    
+    @property
+    def filename(self):
+        extension = 'prof' if self.profiler == 'cprofile' else 'collapsed.txt'
+        return f"profil-{self.domain or 'requete'}-{self.pk}.{extension}"
+    
+    def __str__(self):
+        return f"Profil {self.get_profiler_display()} - {self.domain or self.path}"
+
+
+class AnalysisCheckpoint(models.Model):
+    """
+    Avancement d'une analyse, pour la reprendre à la dernière étape terminée
+    
+    Étapes : pending → discovered → fetched → analysed → persisted
+    """
+    
+    STAGES = ['pending', 'discovered', 'fetched', 'analysed', 'persisted']
+    
+    STAGE_CHOICES = [
+        ('pending', 'En attente'),
+        ('discovered', 'Documents découverts'),
+        ('fetched', 'Documents extraits'),
+        ('analysed', 'Analyse LLM terminée'),
+        ('persisted', 'Enregistrée'),
+    ]
+    
+    domain = models.CharField(max_length=255, unique=True, verbose_name="Domaine")
+    url = models.URLField(verbose_name="URL d'origine")
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='pending', verbose_name="Étape")
+    
+    # Sorties des étapes : URLs découvertes, documents extraits, résultat du LLM
+    discovered = models.JSONField(default=list, verbose_name="Documents découverts")
+    documents = models.JSONField(default=list, verbose_name="Documents extraits")
+    result = models.JSONField(default=dict, verbose_name="Résultat de l'analyse")
+    
+    attempts = models.IntegerField(default=0, verbose_name="Tentatives")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date de création")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+    
+    class Meta:
+        verbose_name = "Reprise d'analyse"
+        verbose_name_plural = "Reprises d'analyses"
+        ordering = ['-updated_at']
+    
+    @classmethod
+    def resume(cls, domain, url, max_age):
+        """
+        Retourne l'analyse en cours du domaine, ou en démarre une nouvelle si
+        la précédente est terminée ou plus ancienne que `max_age` secondes
+        """
+        checkpoint, created = cls.objects.get_or_create(domain=domain, defaults={'url': url})
+        stale = checkpoint.created_at < timezone.now() - timezone.timedelta(seconds=max_age)
+        if not created and (checkpoint.stage == 'persisted' or stale):
+            checkpoint.url = url
+            checkpoint.stage = 'pending'
+            checkpoint.discovered = []
+            checkpoint.documents = []
+            checkpoint.result = {}
+            checkpoint.attempts = 0
+            checkpoint.last_error = ''
+            checkpoint.created_at = timezone.now()
+            checkpoint.save()
+        return checkpoint
+    
+    def reached(self, stage):
+        return self.STAGES.index(self.stage) >= self.STAGES.index(stage)
+    
+    def advance(self, stage, **outputs):
+        """Enregistre la sortie d'une étape (et l'étape atteinte, si `stage`)"""
+        for field, value in outputs.items():
+            setattr(self, field, value)
+        if stage:
+            self.stage = stage
+        self.save(update_fields=['stage', 'updated_at', *outputs])
+    
+    def fail(self, error):
+        self.attempts += 1
+        self.last_error = str(error)
+        self.save(update_fields=['attempts', 'last_error', 'updated_at'])
+    
+    def __str__(self):
+        return f"Analyse de {self.domain} ({self.get_stage_display()})"
+
+
+class StatsCounter(models.Model):
+    """
+    Agrégat précalculé des analyses (voir analyzer.stats)
+    
+    Clés : `successful`, `failed`, `risk:<niveau>`, `readability:<score>`
+    """
+    
+    key = models.CharField(max_length=50, unique=True, verbose_name="Clé")
+    value = models.BigIntegerField(default=0, verbose_name="Valeur")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+    
+    class Meta:
+        verbose_name = "Statistique"
+        verbose_name_plural = "Statistiques"
+        ordering = ['key']
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class LeaderboardEntry(models.Model):
+    """Entrée d'un classement précalculé des domaines (voir analyzer.stats)"""
+    
+    BOARD_CHOICES = [
+        ('worst', 'Sites les plus risqués'),
+        ('best', 'Sites les plus respectueux'),
+    ]
+    
+    board = models.CharField(max_length=10, choices=BOARD_CHOICES, verbose_name="Classement")
+    rank = models.PositiveIntegerField(verbose_name="Rang")
+    domain = models.CharField(max_length=255, verbose_name="Domaine")
+    risk_level = models.CharField(max_length=10, choices=WebsiteAnalysis.RISK_CHOICES, verbose_name="Niveau de risque")
+    readability_score = models.IntegerField(verbose_name="Score de lisibilité")
+    analysed_at = models.DateTimeField(verbose_name="Date de l'analyse")
+    
+    class Meta:
+        verbose_name = "Entrée de classement"
+        verbose_name_plural = "Classements"
+        ordering = ['board', 'rank']
+        indexes = [models.Index(fields=['board', 'rank'], name='leaderboard_board_rank_idx')]
+    
+    def __str__(self):
+        return f"{self.get_board_display()} #{self.rank}: {self.domain}"
+
+
+class AnalysisSnapshot(models.Model):
+    """
+    Analyse sérialisée une fois pour toutes à l'écriture (voir analyzer.snapshots)
+    
+    Lue par /api/snapshot/ et /api/badge/ sans passer par les serializers :
+    les octets stockés sont renvoyés tels quels, avec leur ETag.
+    """
+    
+    analysis = models.OneToOneField(
+        WebsiteAnalysis,
+        on_delete=models.CASCADE,
+        related_name='snapshot',
+        verbose_name="Analyse"
+    )
+    domain = models.CharField(max_length=255, unique=True, verbose_name="Domaine")
+    
+    # Réponse JSON complète (analyse et documents) et variante « badge »
+    payload = models.BinaryField(verbose_name="Analyse (JSON)")
+    payload_etag = models.CharField(max_length=66, verbose_name="ETag de l'analyse")
+    badge = models.BinaryField(verbose_name="Badge (JSON)")
+    badge_etag = models.CharField(max_length=66, verbose_name="ETag du badge")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+    
+    class Meta:
+        verbose_name = "Analyse publiée"
+        verbose_name_plural = "Analyses publiées"
+        ordering = ['domain']
+    
+    def __str__(self):
+        return f"Analyse publiée de {self.domain}"
+
+
+class WebhookDelivery(models.Model):
+    """
+    Notification de fin d'analyse à une URL de rappel (voir analyzer.webhooks)
+    
+    waiting → pending à la fin de l'analyse du domaine, puis delivered, ou
+    failed après WEBHOOK_MAX_ATTEMPTS tentatives (expired si l'analyse ne
+    se termine pas).
+    """
+    
+    STATUS_CHOICES = [
+        ('waiting', "En attente de l'analyse"),
+        ('pending', 'À envoyer'),
+        ('sending', 'En cours d\'envoi'),
+        ('delivered', 'Envoyée'),
+        ('failed', 'En échec'),
+        ('expired', 'Expirée'),
+    ]
+    
+    domain = models.CharField(max_length=255, verbose_name="Domaine")
+    callback_url = models.URLField(max_length=1000, verbose_name="URL de rappel")
+    secret = models.CharField(max_length=128, blank=True, verbose_name="Clé de signature")
+    analysis = models.ForeignKey(
+        WebsiteAnalysis,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='webhook_deliveries',
+        verbose_name="Analyse"
+    )
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting', verbose_name="Statut")
+    attempts = models.IntegerField(default=0, verbose_name="Tentatives")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Prochaine tentative")
+    claim = models.CharField(max_length=32, blank=True, verbose_name="Envoi en cours")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date de création")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Date d'envoi")
+    
+    class Meta:
+        verbose_name = "Notification de fin d'analyse"
+        verbose_name_plural = "Notifications de fin d'analyse"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['domain', 'status'], name='webhook_domain_status_idx'),
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_status_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Notification {self.domain} → {self.callback_url} ({self.get_status_display()})"
@@ -0,0 +1,106 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .document_formats import extract_document, extract_legal_links
+
+logger = logging.getLogger(__name__)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    """
+    Démarrage des processus du pool sans fork du worker : le pool est créé
+    depuis un thread de téléchargement d'un worker multithread, un enfant
+    forké hériterait de verrous tenus par d'autres threads (logging,
+    connexion à la base, ordonnanceur). Le serveur forkserver, démarré une
+    fois, précharge document_formats (sans dépendance à Django).
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['analyzer.document_formats'])
+    return context
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Pool de processus d'analyse des documents, créé une fois par worker
+
+    Recréé après un fork, pour ne pas hériter des processus du parent.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ProcessPoolExecutor(max_workers=settings.PARSER_PROCESSES, mp_context=_pool_context())
+            _pool_pid = pid
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            _pool_pid = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(function, *args, timeout: Optional[float] = None):
+    """
+    Exécute `function` dans le pool de processus, ou dans le thread si le pool est désactivé
+
+    `timeout` (par défaut PARSER_TIMEOUT) borne l'attente du résultat.
+    """
+    if settings.PARSER_PROCESSES <= 0:
+        return function(*args)
+
+    pool = get_parse_pool()
+    try:
+        future = pool.submit(function, *args)
+        return future.result(timeout=settings.PARSER_TIMEOUT if timeout is None else timeout)
+    except BrokenProcessPool:
+        logger.error("Pool d'analyse interrompu, il sera recréé")
+        _reset_pool(pool)
+        raise
+
+
+def parse_document(content: bytes, content_type: str = '', url: str = '',
+                   timeout: Optional[float] = None) -> Dict:
+    """
+    Extrait le texte d'un document téléchargé
+
+    La construction de l'arbre HTML, l'extraction du texte et le décodage
+    des PDF/DOCX sont coûteux en CPU et retiennent le GIL : ils sont
+    exécutés dans le pool de processus pour ne pas bloquer les autres
+    threads du worker. Seuls le titre et les blocs de texte reviennent.
+
+    Returns:
+        Dict: {'title': str, 'blocks': List[str], 'format': str}
+    """
+    return _run(extract_document, content, content_type, url, timeout=timeout)
+
+
+def parse_links(content: bytes, base_url: str, timeout: Optional[float] = None,
+                language: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Trouve les liens vers les documents juridiques d'une page HTML
+
+    Returns:
+        List[Dict]: Documents trouvés avec type, URL et texte du lien
+    """
+    return _run(extract_legal_links, content, base_url, language, timeout=timeout)
@@ -0,0 +1,205 @@
+import cProfile
+import functools
+import io
+import logging
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+PROFILERS = ('cprofile', 'sampling')
+
+# Déclenchement explicite : en-tête `X-Profile: cprofile` ou `?profile=sampling`
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+
+# Profondeur maximale des piles échantillonnées
+MAX_STACK_DEPTH = 64
+
+
+class CProfileProfiler:
+    """Profil déterministe (cProfile) du thread de la requête"""
+
+    name = 'cprofile'
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def dump(self) -> bytes:
+        """Statistiques au format de `pstats` (lisibles par snakeviz, pstats.Stats)"""
+        self._profiler.create_stats()
+        return marshal.dumps(self._profiler.stats)
+
+    def summary(self, limit: int = 30) -> str:
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+
+class SamplingProfiler:
+    """
+    Profil par échantillonnage de la pile du thread de la requête
+
+    Un thread relève la pile toutes les `interval` secondes : le coût ne
+    dépend pas du nombre d'appels de fonctions, ce qui permet de profiler
+    une fraction du trafic de production. La résolution effective est
+    bornée par l'intervalle de bascule du GIL (`sys.getswitchinterval()`).
+    Le résultat est au format « collapsed stacks » (flamegraph.pl, speedscope).
+    """
+
+    name = 'sampling'
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            # Le thread de l'échantillonneur n'apparaît pas : la pile est celle de la requête
+            self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self) -> bytes:
+        return '\n'.join(f'{stack} {count}' for stack, count in self._stacks.most_common()).encode()
+
+    def summary(self, limit: int = 30) -> str:
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+
+        total = max(1, self.samples)
+        lines = [f"{self.samples} échantillons ({self.interval * 1000:.1f} ms)", '', "Temps propre :"]
+        lines += [f"{count / total:7.1%}  {name}" for name, count in own.most_common(limit)]
+        lines += ['', "Temps cumulé :"]
+        lines += [f"{count / total:7.1%}  {name}" for name, count in inclusive.most_common(limit)]
+        return '\n'.join(lines)
+
+
+def requested_profiler(request) -> Optional[str]:
+    """
+    Profileur demandé pour la requête
+
+    Explicite (en-tête ou paramètre) pour les administrateurs uniquement,
+    sinon échantillonnage aléatoire d'une fraction du trafic.
+    """
+    if not settings.PROFILING_ENABLED:
+        return None
+
+    requested = (request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM) or '').lower()
+    if requested:
+        user = getattr(request, 'user', None)
+        if requested in PROFILERS and user is not None and user.is_staff:
+            return requested
+        return None
+
+    if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sampling'
+    return None
+
+
+def _build(name: str):
+    if name == 'cprofile':
+        return CProfileProfiler()
+    return SamplingProfiler(settings.PROFILING_SAMPLE_INTERVAL)
+
+
+def profiled(view):
+    """
+    Profile la vue si la requête le demande et enregistre le profil,
+    rattaché à l'analyse retournée dans `data.id`
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        name = requested_profiler(request)
+        if name is None:
+            return view(request, *args, **kwargs)
+
+        explicit = bool(request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM))
+        profiler = _build(name)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - start
+
+        try:
+            profile = _store(request, response, profiler, duration, 'request' if explicit else 'sample')
+            if profile is not None and explicit:
+                response['X-Profile-Id'] = str(profile.pk)
+        except Exception as e:
+            logger.error(f"Enregistrement du profil impossible: {str(e)}")
+        return response
+
+    return wrapper
+
+
+def _store(request, response, profiler, duration: float, trigger: str):
+    from .models import AnalysisProfile, WebsiteAnalysis
+
+    data = getattr(response, 'data', None) or {}
+    analysis_data = data.get('data') if isinstance(data, dict) else None
+    analysis_id = analysis_data.get('id') if isinstance(analysis_data, dict) else None
+    analysis = WebsiteAnalysis.objects.filter(pk=analysis_id).first() if analysis_id else None
+
+    content = profiler.dump()
+    if len(content) > settings.PROFILING_MAX_BYTES:
+        logger.warning(f"Profil de {len(content)} octets ignoré (limite {settings.PROFILING_MAX_BYTES})")
+        return None
+
+    profile = AnalysisProfile.objects.create(
+        analysis=analysis,
+        domain=analysis.domain if analysis else '',
+        path=request.path,
+        profiler=profiler.name,
+        trigger=trigger,
+        duration=duration,
+        status_code=response.status_code,
+        summary=profiler.summary(),
+        data=content,
+    )
+    AnalysisProfile.prune(settings.PROFILING_MAX_STORED)
+    logger.info(f"Profil {profiler.name} enregistré ({duration:.2f}s, {len(content)} octets)")
+    return profile
@@ -0,0 +1,217 @@
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Priorité des types de documents dans le budget (poids relatifs)
+DOCUMENT_PRIORITIES = {
+    'terms': 4,
+    'privacy': 4,
+    'cookies': 2,
+    'legal': 1,
+    'other': 1,
+}
+
+# Les lignes répétées plus courtes que ce seuil, en tête ou en fin de
+# document (menus, bandeaux cookies, pieds de page), sont retirées de tous
+# les documents ; ailleurs, seule la première occurrence est conservée
+SHORT_LINE_LENGTH = 120
+
+# Estimation utilisée sans tokenizer local : ~4 caractères par token
+CHARS_PER_TOKEN = 4
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def get_tokenizer():
+    """
+    Charge une seule fois le tokenizer local (fichier tokenizer.json)
+
+    Retourne None si aucun fichier n'est configuré ou si la bibliothèque
+    `tokenizers` est absente : le comptage passe alors par une estimation.
+    """
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+
+    _tokenizer_loaded = True
+    path = getattr(settings, 'LLM_TOKENIZER_PATH', '')
+    if not path:
+        return None
+
+    try:
+        from tokenizers import Tokenizer
+        _tokenizer = Tokenizer.from_file(str(path))
+    except Exception as e:
+        logger.warning(f"Tokenizer indisponible ({path}), estimation utilisée: {str(e)}")
+        _tokenizer = None
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Compte les tokens d'un texte"""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize_line(line: str) -> str:
+    return _WHITESPACE_RE.sub(' ', line).strip().lower()
+
+
+def remove_shared_boilerplate(documents: List[Dict]) -> List[str]:
+    """
+    Supprime les lignes répétées d'un document à l'autre
+
+    En-têtes, pieds de page et bandeaux cookies communs au site apparaissent
+    à l'identique au début ou à la fin de chaque document : ces lignes
+    courtes répétées sont retirées partout. Les autres lignes répétées
+    (titres, clauses communes) ne sont gardées qu'une fois.
+
+    Returns:
+        List[str]: Contenus nettoyés, dans l'ordre des documents
+    """
+    occurrences = Counter()
+    for doc in documents:
+        lines = {_normalize_line(line) for line in doc.get('content', '').split('\n')}
+        occurrences.update(line for line in lines if line)
+
+    def is_chrome(key: str) -> bool:
+        return not key or (occurrences[key] > 1 and len(key) < SHORT_LINE_LENGTH)
+
+    seen = set()
+    cleaned = []
+    for doc in documents:
+        lines = doc.get('content', '').split('\n')
+        keys = [_normalize_line(line) for line in lines]
+
+        # Lignes courtes répétées en tête et en fin de document
+        start = 0
+        while start < len(keys) and is_chrome(keys[start]):
+            start += 1
+        end = len(keys)
+        while end > start and is_chrome(keys[end - 1]):
+            end -= 1
+
+        kept = []
+        for index, (line, key) in enumerate(zip(lines, keys)):
+            if key and occurrences[key] > 1:
+                if index < start or index >= end or key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        cleaned.append('\n'.join(kept))
+    return cleaned
+
+
+def allocate_budget(token_counts: List[int], priorities: List[int], budget: int) -> List[int]:
+    """
+    Répartit le budget de tokens entre les documents selon leur priorité
+
+    Un document plus court que sa part rend le reste, redistribué aux
+    documents qui dépassent encore.
+    """
+    allocation = [0] * len(token_counts)
+    remaining = budget
+    pending = [i for i, count in enumerate(token_counts) if count > 0]
+
+    while pending and remaining > 0:
+        total_weight = sum(priorities[i] for i in pending)
+        satisfied = [
+            i for i in pending
+            if token_counts[i] <= remaining * priorities[i] // total_weight
+        ]
+        if not satisfied:
+            for i in pending:
+                allocation[i] = remaining * priorities[i] // total_weight
+            break
+        for i in satisfied:
+            allocation[i] = token_counts[i]
+            remaining -= token_counts[i]
+        pending = [i for i in pending if i not in satisfied]
+
+    return allocation
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Tronque un texte à un nombre de tokens, à la frontière d'un paragraphe si possible"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        cut = offsets[max_tokens - 1][1]
+    else:
+        cut = max_tokens * CHARS_PER_TOKEN
+
+    truncated = text[:cut]
+    paragraph_end = truncated.rfind('\n\n')
+    if paragraph_end > cut // 2:
+        truncated = truncated[:paragraph_end]
+    return truncated + "\n... [contenu tronqué]"
+
+
+def build_prompt_content(documents: List[Dict], budget: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Assemble le contenu des documents pour le prompt dans un budget de tokens
+
+    Returns:
+        Tuple: (contenu combiné, rapport de tokens)
+    """
+    if budget is None:
+        budget = getattr(settings, 'LLM_PROMPT_TOKEN_BUDGET', 12000)
+
+    original_tokens = [count_tokens(doc.get('content', '')) for doc in documents]
+    contents = remove_shared_boilerplate(documents)
+    token_counts = [count_tokens(content) for content in contents]
+
+    # Les titres des sections sont décomptés du budget avant répartition
+    headers = [f"=== {doc.get('title', 'Document')} ===\n" for doc in documents]
+    available = max(0, budget - sum(count_tokens(header) for header in headers))
+
+    priorities = [DOCUMENT_PRIORITIES.get(doc.get('type'), 1) for doc in documents]
+    allocation = allocate_budget(token_counts, priorities, available)
+
+    sections = []
+    report_documents = []
+    for doc, header, content, before, count, allowed in zip(
+        documents, headers, contents, original_tokens, token_counts, allocation
+    ):
+        if count > allowed:
+            content = truncate_to_tokens(content, allowed)
+        sections.append(header + content)
+        report_documents.append({
+            'type': doc.get('type'),
+            'url': doc.get('url'),
+            'tokens_before': before,
+            'tokens_after_dedup': count,
+            'tokens_allocated': allowed,
+            'truncated': count > allowed,
+        })
+
+    combined = "\n\n".join(sections)
+    tokens_before = sum(original_tokens)
+    tokens_after = count_tokens(combined)
+    report = {
+        'budget': budget,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': max(0, tokens_before - tokens_after),
+        'tokens_deduplicated': tokens_before - sum(token_counts),
+        'documents': report_documents,
+    }
+    return combined, report
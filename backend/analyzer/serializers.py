@@ -1,4 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
+from urllib.parse import urlparse
+
 from .models import WebsiteAnalysis, LegalDocument
 
 
@@ -59,6 +62,19 @@ class AnalyzeRequestSerializer(serializers.Serializer):
         help_text="URL du site web à analyser (ex: https://example.com)"
     )
     
+    callback_url = serializers.URLField(
+        required=False,
+        max_length=1000,
+        help_text="URL notifiée (POST signé) à la fin de l'analyse"
+    )
+    
+    callback_secret = serializers.CharField(
+        required=False,
+        write_only=True,
+        max_length=255,
+        help_text="Clé HMAC de la signature (WEBHOOK_SECRET par défaut)"
+    )
+    
     def validate_url(self, value):
         """Validation de l'URL"""
         if not value.startswith(('http://', 'https://')):
@@ -66,6 +82,77 @@ class AnalyzeRequestSerializer(serializers.Serializer):
                 "L'URL doit commencer par http:// ou https://"
             )
         return value
+    
+    def validate_callback_url(self, value):
+        """Validation de l'URL de rappel"""
+        if not value.startswith(('http://', 'https://')):
+            raise serializers.ValidationError(
+                "L'URL de rappel doit commencer par http:// ou https://"
+            )
+        return value
+    
+    def validate(self, data):
+        """Une URL de rappel exige une clé de signature"""
+        if data.get('callback_url') and not (data.get('callback_secret') or settings.WEBHOOK_SECRET):
+            raise serializers.ValidationError({
+                'callback_secret': "Clé requise pour signer les notifications"
+            })
+        return data
+
+
+class CompareRequestSerializer(serializers.Serializer):
+    """Serializer pour les requêtes de comparaison"""
+    
+    urls = serializers.ListField(
+        child=serializers.URLField(),
+        min_length=2,
+        help_text="URLs des sites à comparer (ex: [\"https://a.com\", \"https://b.com\"])"
+    )
+    
+    def validate_urls(self, value):
+        """Validation des URLs (un site par domaine)"""
+        for url in value:
+            if not url.startswith(('http://', 'https://')):
+                raise serializers.ValidationError(
+                    "Les URLs doivent commencer par http:// ou https://"
+                )
+        
+        # Une seule URL par domaine, dans l'ordre de la requête
+        domains = set()
+        urls = []
+        for url in value:
+            domain = urlparse(url).netloc.lower()
+            if domain not in domains:
+                domains.add(domain)
+                urls.append(url)
+        
+        if len(urls) < 2:
+            raise serializers.ValidationError("Au moins deux sites différents sont nécessaires")
+        if len(urls) > settings.COMPARE_MAX_SITES:
+            raise serializers.ValidationError(
+                f"Au plus {settings.COMPARE_MAX_SITES} sites peuvent être comparés"
+            )
+        return urls
+
+
+class ComparisonSerializer(serializers.ModelSerializer):
+    """Champs alignés d'une analyse dans une comparaison"""
+    
+    risk_level_display = serializers.CharField(source='get_risk_level_display', read_only=True)
+    
+    class Meta:
+        model = WebsiteAnalysis
+        fields = [
+            'id',
+            'domain',
+            'url',
+            'risk_level',
+            'risk_level_display',
+            'readability_score',
+            'data_sharing',
+            'retention_period',
+            'created_at'
+        ]
 
 
 class AnalyzeResponseSerializer(serializers.Serializer):
@@ -0,0 +1,227 @@
+import logging
+import re
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+# Limites de lecture pour borner le coût d'un site au sitemap démesuré
+MAX_ROBOTS_BYTES = 512 * 1024
+MAX_SITEMAP_BYTES = 10 * 1024 * 1024
+MAX_SITEMAPS = 5
+MAX_URLS = 50000
+
+CHUNK_SIZE = 64 * 1024
+
+# Sous-sitemaps d'un index à explorer en priorité (pages statiques plutôt que
+# produits/articles), et répertoires éditoriaux exclus de la classification
+PREFERRED_SITEMAP_RE = re.compile(r'page|static|legal|misc|general|main|site', re.IGNORECASE)
+AVOIDED_SITEMAP_RE = re.compile(r'product|post|article|blog|news|image|video|categor|tag|author', re.IGNORECASE)
+
+# Profondeur maximale d'un chemin de document juridique (/fr/legal/privacy)
+MAX_PATH_DEPTH = 3
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+class SitemapDiscovery:
+    """
+    Découverte des documents juridiques via robots.txt et sitemap.xml
+
+    Les fichiers sont lus en streaming (décompression gzip et analyse XML au
+    fil de l'eau), ce qui borne la mémoire même pour de gros sitemaps. Le
+    résultat est mis en cache par domaine.
+    """
+
+    def __init__(self, session, classify: Callable[[str, str], Optional[str]], deadline=None):
+        self.session = session
+        self.classify = classify
+        self.deadline = deadline
+        self.crawl_delay: Optional[float] = None
+
+    def discover(self, base_url: str) -> List[Dict[str, str]]:
+        """
+        Trouve les documents juridiques listés dans les sitemaps du site
+
+        Returns:
+            List[Dict]: Documents trouvés avec type et URL (un par type)
+        """
+        domain = urlparse(base_url).netloc.lower()
+        cache_key = f"sitemap_discovery:{domain}"
+        cached = cache.get(cache_key)
+        CACHE_REQUESTS.inc(cache='sitemap', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+
+        try:
+            documents = self._discover(base_url)
+        except Exception as e:
+            logger.warning(f"Découverte par sitemap impossible pour {domain}: {str(e)}")
+            return []
+
+        # Exploration interrompue par le budget de l'analyse : résultat partiel, non mis en cache
+        if self.deadline is not None and self.deadline.expired:
+            return documents
+
+        cache.set(cache_key, documents, getattr(settings, 'SITEMAP_DISCOVERY_TTL', 86400))
+        return documents
+
+    def _discover(self, base_url: str) -> List[Dict[str, str]]:
+        root = f"{urlparse(base_url).scheme}://{urlparse(base_url).netloc}/"
+        queue = self._robots_sitemaps(root) or [urljoin(root, 'sitemap.xml')]
+
+        best: Dict[str, str] = {}
+        fetched = 0
+        scanned = 0
+        seen = set()
+
+        while queue and fetched < MAX_SITEMAPS and scanned < MAX_URLS:
+            if self.deadline is not None and self.deadline.expired:
+                break
+            sitemap_url = queue.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            fetched += 1
+
+            children = []
+            for kind, loc in self._iter_locs(sitemap_url):
+                if kind == 'sitemap':
+                    children.append(loc)
+                    continue
+                scanned += 1
+                self._consider(loc, root, best)
+                if scanned >= MAX_URLS:
+                    break
+
+            queue.extend(self._prioritize(children))
+
+        return [
+            {'type': doc_type, 'url': url, 'text': 'sitemap'}
+            for doc_type, url in best.items()
+        ]
+
+    def _consider(self, loc: str, root: str, best: Dict[str, str]):
+        """Retient l'URL la plus courte de chaque type de document"""
+        parsed = urlparse(loc)
+        host = urlparse(root).hostname or ''
+        if host.startswith('www.'):
+            host = host[4:]
+        # Le site ou l'un de ses sous-domaines (pas example.com.evil.net)
+        if parsed.netloc:
+            hostname = parsed.hostname or ''
+            if hostname != host and not hostname.endswith('.' + host):
+                return
+
+        segments = [segment for segment in parsed.path.split('/') if segment]
+        if not segments or len(segments) > MAX_PATH_DEPTH:
+            return
+
+        # Les pages éditoriales (/blog/cookies-maison) ne sont pas des
+        # documents juridiques, même si leur titre en a l'air
+        if any(AVOIDED_SITEMAP_RE.search(segment) for segment in segments[:-1]):
+            return
+
+        doc_type = self.classify(segments[-1], '')
+        if doc_type and (doc_type not in best or len(loc) < len(best[doc_type])):
+            best[doc_type] = loc
+
+    def _prioritize(self, sitemaps: List[str]) -> List[str]:
+        def rank(url: str) -> int:
+            if PREFERRED_SITEMAP_RE.search(url):
+                return 0
+            if AVOIDED_SITEMAP_RE.search(url):
+                return 2
+            return 1
+        return sorted(sitemaps, key=rank)
+
+    def _robots_sitemaps(self, root: str) -> List[str]:
+        """Lit robots.txt en streaming et retourne les sitemaps déclarés"""
+        sitemaps = []
+        try:
+            response = self.session.get(urljoin(root, 'robots.txt'), timeout=5, stream=True)
+            with response:
+                if response.status_code != 200:
+                    return []
+                read = 0
+                for raw_line in response.iter_lines(chunk_size=CHUNK_SIZE):
+                    read += len(raw_line) + 1
+                    if read > MAX_ROBOTS_BYTES:
+                        break
+                    line = raw_line.decode('utf-8', errors='ignore').split('#', 1)[0].strip()
+                    key, _, value = line.partition(':')
+                    key = key.strip().lower()
+                    value = value.strip()
+                    if key == 'sitemap' and value:
+                        sitemaps.append(urljoin(root, value))
+                    elif key == 'crawl-delay' and self.crawl_delay is None:
+                        try:
+                            self.crawl_delay = float(value)
+                        except ValueError:
+                            pass
+        except Exception as e:
+            logger.debug(f"robots.txt indisponible pour {root}: {str(e)}")
+        return sitemaps
+
+    def _iter_chunks(self, url: str) -> Iterator[bytes]:
+        """Télécharge un sitemap par morceaux, en décompressant le gzip à la volée"""
+        response = self.session.get(url, timeout=10, stream=True)
+        with response:
+            if response.status_code != 200:
+                return
+            decompressor = None
+            read = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if self.deadline is not None and self.deadline.expired:
+                    return
+                if read == 0 and chunk.startswith(_GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk, MAX_SITEMAP_BYTES - read)
+                read += len(chunk)
+                yield chunk
+                if read >= MAX_SITEMAP_BYTES:
+                    logger.info(f"Sitemap tronqué à {MAX_SITEMAP_BYTES} octets: {url}")
+                    return
+
+    def _iter_locs(self, url: str) -> Iterator[Tuple[str, str]]:
+        """
+        Analyse un sitemap au fil de l'eau
+
+        Yields:
+            Tuple: ('sitemap' | 'url', URL) pour chaque <loc>
+        """
+        parser = XMLPullParser(events=('start', 'end'))
+        kind = 'url'
+        try:
+            for chunk in self._iter_chunks(url):
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    name = _local_name(element.tag)
+                    if event == 'start':
+                        if name == 'sitemapindex':
+                            kind = 'sitemap'
+                        continue
+                    if name == 'loc' and element.text:
+                        yield kind, element.text.strip()
+                    elif name in ('url', 'sitemap'):
+                        # Libérer les éléments déjà traités
+                        element.clear()
+        except ParseError as e:
+            logger.debug(f"Sitemap invalide {url}: {str(e)}")
+        except Exception as e:
+            logger.debug(f"Sitemap indisponible {url}: {str(e)}")
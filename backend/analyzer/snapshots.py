@@ -0,0 +1,97 @@
+import hashlib
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import AnalysisSnapshot, WebsiteAnalysis
+from .serializers import WebsiteAnalysisSerializer
+
+logger = logging.getLogger(__name__)
+
+
+# Champs de la variante « badge » (widget intégré aux sites)
+BADGE_FIELDS = ('domain', 'risk_level', 'readability_score')
+
+_renderer = JSONRenderer()
+
+
+def etag(payload: bytes) -> str:
+    """ETag fort : empreinte des octets servis"""
+    return f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
+def render_snapshot(analysis: WebsiteAnalysis) -> AnalysisSnapshot:
+    """
+    Sérialise une analyse (documents compris) et sa variante badge
+
+    Même contenu que la clé `data` de GET /api/analysis/<domain>/.
+    """
+    payload = _renderer.render(WebsiteAnalysisSerializer(analysis).data)
+    badge = _renderer.render({field: getattr(analysis, field) for field in BADGE_FIELDS})
+    return AnalysisSnapshot(
+        analysis_id=analysis.pk,
+        domain=analysis.domain,
+        payload=payload,
+        payload_etag=etag(payload),
+        badge=badge,
+        badge_etag=etag(badge),
+    )
+
+
+def store_snapshots(analyses: Iterable[WebsiteAnalysis]):
+    """
+    Publie les analyses réussies et retire celles en échec (introuvables
+    par GET /api/analysis/<domain>/, elles le sont aussi par le badge)
+
+    Les documents de chaque analyse sont lus à nouveau : à appeler une
+    fois qu'ils sont enregistrés.
+    """
+    analyses = list(analyses)
+    if not analyses:
+        return
+    snapshots = [
+        render_snapshot(analysis)
+        for analysis in WebsiteAnalysis.objects.filter(
+            pk__in=[analysis.pk for analysis in analyses], is_successful=True
+        ).prefetch_related('documents')
+    ]
+    with transaction.atomic():
+        AnalysisSnapshot.objects.filter(analysis_id__in=[analysis.pk for analysis in analyses]).delete()
+        AnalysisSnapshot.objects.bulk_create(snapshots)
+
+
+def rebuild_snapshots(batch_size: int = 500) -> int:
+    """
+    Republie toutes les analyses (déploiement, modification du serializer)
+
+    Returns:
+        int: Nombre d'analyses publiées
+    """
+    AnalysisSnapshot.objects.exclude(analysis__is_successful=True).delete()
+    pks = list(WebsiteAnalysis.objects.filter(is_successful=True).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), batch_size):
+        store_snapshots(WebsiteAnalysis(pk=pk) for pk in pks[start:start + batch_size])
+    logger.info(f"{len(pks)} analyse(s) publiée(s)")
+    return len(pks)
+
+
+def get_snapshot(domain: str, variant: str = 'payload') -> Optional[Tuple[bytes, str]]:
+    """
+    Octets et ETag publiés pour un domaine (`payload` ou `badge`), en une
+    requête sur l'index du domaine, sans instancier de modèle
+
+    Returns:
+        Optional[Tuple]: (octets JSON, ETag), None si le domaine n'est pas publié
+    """
+    row = AnalysisSnapshot.objects.filter(domain=domain.lower()).values_list(variant, f'{variant}_etag').first()
+    if row is None:
+        return None
+    return bytes(row[0]), row[1]
+
+
+def etag_matches(if_none_match: str, current: str) -> bool:
+    """En-tête If-None-Match : la version du client est-elle à jour ?"""
+    candidates: List[str] = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or current in candidates or f'W/{current}' in candidates
@@ -0,0 +1,145 @@
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+# Dépendances importées à la demande (premier appel) : chargées d'avance par
+# le préchauffage du serveur, jamais par les commandes manage.py
+LAZY_MODULES = ('openai', 'pypdf')
+
+# Document minimal : charge BeautifulSoup, soupsieve et les expressions
+# compilées à la première analyse
+_WARM_UP_PAGE = (
+    b'<html lang="fr"><body><main><h1>Mentions l\xc3\xa9gales</h1><p>Article 1 : conditions.</p></main>'
+    b'<footer><a href="/cgu">CGU</a><a href="/confidentialite">Confidentialit\xc3\xa9</a></footer></body></html>'
+)
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], step: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.warning(f"Préchauffage ({step}) ignoré: {str(e)}")
+    finally:
+        timings[step] = time.perf_counter() - start
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Charge une fois l'état partagé du processus : modules de l'application
+    (URLconf, chargée sinon à la première requête), dépendances importées à
+    la demande, expressions compilées, parseur HTML et clients LLM
+
+    Appelé au chargement de l'application (WARM_UP_ON_LOAD) : avec
+    `preload_app` (gunicorn.conf.py), une seule fois dans le processus maître,
+    les workers en héritent par fork. Les pools et sessions propres à chaque
+    processus (vérification du pid) ne sont pas créés ici : ils seraient
+    recréés dans chaque worker.
+
+    Returns:
+        Dict: Durée de chaque étape (secondes)
+    """
+    timings: Dict[str, float] = {}
+
+    with _timed(timings, 'urls'):
+        from django.urls import get_resolver
+
+        get_resolver().url_patterns  # chargement des vues
+
+    with _timed(timings, 'modules'):
+        for module in LAZY_MODULES:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                logger.debug(f"Module optionnel absent: {module}")
+
+    with _timed(timings, 'parser'):
+        from .document_formats import extract_document, extract_legal_links
+        from .languages import detect_page_language
+
+        language = detect_page_language(_WARM_UP_PAGE)
+        extract_legal_links(_WARM_UP_PAGE, 'https://warm-up.invalid/', language)
+        extract_document(_WARM_UP_PAGE, 'text/html', 'https://warm-up.invalid/mentions-legales')
+
+    with _timed(timings, 'llm'):
+        from .llm_router import get_router
+
+        # Clients sans connexion ouverte : partageables par fork
+        for provider in get_router().providers:
+            provider.client
+
+    # Aucune connexion à la base transmise aux workers
+    connections.close_all()
+
+    logger.info(f"Préchauffage terminé en {sum(timings.values()):.2f}s (pid {os.getpid()})")
+    return timings
+
+
+def parse_import_times(output: str) -> List[Dict]:
+    """
+    Lit la sortie de `python -X importtime`
+
+    Returns:
+        List[Dict]: Un élément par module importé (module, self et
+        cumulative en microsecondes, depth), dans l'ordre de la sortie
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            entries.append({
+                'module': name.strip(),
+                'self': int(self_us),
+                'cumulative': int(cumulative_us),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            })
+        except ValueError:
+            # En-tête (self [us] | cumulative | imported package)
+            continue
+    return entries
+
+
+def profile_imports(module: str = 'legal_analyzer.wsgi', warm_up: bool = True) -> List[Dict]:
+    """
+    Temps d'import de l'application, mesuré dans un nouveau processus
+    (`-X importtime`) : configuration de Django, puis import de `module`
+
+    Args:
+        module: Point d'entrée importé (wsgi, vues, commande...)
+        warm_up: Préchauffage (WARM_UP_ON_LOAD) au chargement de wsgi/asgi, comme un worker
+    """
+    code = (
+        "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings'); "
+        f"import django; django.setup(); import {module}"
+    )
+    env = {**os.environ, 'WARM_UP_ON_LOAD': 'True' if warm_up else 'False'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else module)
+    return parse_import_times(result.stderr)
+
+
+def summarize_import_times(entries: List[Dict]) -> Dict[str, int]:
+    """Temps d'import propre (microsecondes) par paquet de premier niveau, du plus lent au plus rapide"""
+    packages = defaultdict(int)
+    for entry in entries:
+        packages[entry['module'].split('.')[0]] += entry['self']
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,195 @@
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import LeaderboardEntry, StatsCounter, WebsiteAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+# Gravité des niveaux de risque, pour les classements
+RISK_SEVERITY = {'low': 0, 'moderate': 1, 'high': 2}
+
+# Marqueur des compteurs initialisés par un recalcul complet (date du recalcul)
+REFRESH_KEY = 'refreshed'
+
+# Ordre des classements : du plus au moins risqué, puis du moins au plus lisible
+BOARD_ORDER = {
+    'worst': lambda entry: (-RISK_SEVERITY.get(entry.risk_level, 1), entry.readability_score,
+                            -entry.analysed_at.timestamp()),
+    'best': lambda entry: (RISK_SEVERITY.get(entry.risk_level, 1), -entry.readability_score,
+                           -entry.analysed_at.timestamp()),
+}
+
+
+def _counter_keys(is_successful: bool, risk_level: str, readability_score: int) -> List[str]:
+    if not is_successful:
+        return ['failed']
+    return ['successful', f'risk:{risk_level}', f'readability:{readability_score}']
+
+
+def record_analysis(previous: Optional[Dict], analysis: WebsiteAnalysis):
+    """
+    Met à jour les agrégats après l'enregistrement d'une analyse
+
+    À appeler dans la transaction d'écriture : le coût ne dépend que de la
+    taille des classements, pas du nombre d'analyses.
+
+    Args:
+        previous: Valeurs de l'analyse remplacée (is_successful, risk_level,
+            readability_score), ou None pour un nouveau domaine
+        analysis: Analyse enregistrée
+    """
+    if not StatsCounter.objects.filter(key=REFRESH_KEY).exists():
+        # Pas encore de recalcul complet : les compteurs seront initialisés par get_stats()
+        return
+
+    changes = Counter()
+    if previous is not None:
+        for key in _counter_keys(**previous):
+            changes[key] -= 1
+    for key in _counter_keys(analysis.is_successful, analysis.risk_level, analysis.readability_score):
+        changes[key] += 1
+
+    for key, delta in changes.items():
+        if not delta:
+            continue
+        if not StatsCounter.objects.filter(key=key).update(value=F('value') + delta):
+            StatsCounter.objects.get_or_create(key=key)
+            StatsCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+    for board in BOARD_ORDER:
+        _merge_into_board(board, analysis)
+
+
+def _merge_into_board(board: str, analysis: WebsiteAnalysis):
+    """
+    Place l'analyse dans le classement (ou l'en retire si elle a échoué)
+
+    Un domaine qui quitte le classement laisse une place vide jusqu'au
+    prochain recalcul complet (refresh_stats).
+    """
+    entries = list(LeaderboardEntry.objects.select_for_update().filter(board=board))
+    merged = [entry for entry in entries if entry.domain != analysis.domain]
+    if analysis.is_successful:
+        merged.append(LeaderboardEntry(
+            board=board,
+            domain=analysis.domain,
+            risk_level=analysis.risk_level,
+            readability_score=analysis.readability_score,
+            analysed_at=analysis.created_at,
+        ))
+    merged = sorted(merged, key=BOARD_ORDER[board])[:settings.STATS_LEADERBOARD_SIZE]
+
+    def signature(rows):
+        return [(row.domain, row.risk_level, row.readability_score, row.analysed_at) for row in rows]
+
+    if signature(merged) == signature(entries):
+        return
+
+    LeaderboardEntry.objects.filter(board=board).delete()
+    for rank, entry in enumerate(merged, start=1):
+        entry.pk = None
+        entry.rank = rank
+    LeaderboardEntry.objects.bulk_create(merged)
+
+
+def refresh_stats():
+    """
+    Recalcule tous les agrégats et classements à partir des analyses
+
+    À planifier (manage.py refresh_stats) : corrige aussi les écarts dus aux
+    suppressions d'analyses, qui ne passent pas par record_analysis.
+    """
+    successful = WebsiteAnalysis.objects.filter(is_successful=True)
+    counts = {
+        REFRESH_KEY: 1,
+        'failed': WebsiteAnalysis.objects.filter(is_successful=False).count(),
+    }
+    for row in successful.values('risk_level').annotate(count=Count('id')):
+        counts[f"risk:{row['risk_level']}"] = row['count']
+    for row in successful.values('readability_score').annotate(count=Count('id')):
+        counts[f"readability:{row['readability_score']}"] = row['count']
+    counts['successful'] = sum(value for key, value in counts.items() if key.startswith('risk:'))
+
+    severity = Case(
+        *[When(risk_level=level, then=Value(value)) for level, value in RISK_SEVERITY.items()],
+        default=Value(1),
+        output_field=IntegerField()
+    )
+    ranked = successful.annotate(severity=severity).only('domain', 'risk_level', 'readability_score', 'created_at')
+    orderings = {
+        'worst': ('-severity', 'readability_score', '-created_at'),
+        'best': ('severity', '-readability_score', '-created_at'),
+    }
+    entries = [
+        LeaderboardEntry(
+            board=board,
+            rank=rank,
+            domain=analysis.domain,
+            risk_level=analysis.risk_level,
+            readability_score=analysis.readability_score,
+            analysed_at=analysis.created_at,
+        )
+        for board, ordering in orderings.items()
+        for rank, analysis in enumerate(ranked.order_by(*ordering)[:settings.STATS_LEADERBOARD_SIZE], start=1)
+    ]
+
+    with transaction.atomic():
+        StatsCounter.objects.all().delete()
+        StatsCounter.objects.bulk_create([StatsCounter(key=key, value=value) for key, value in counts.items()])
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries)
+
+    logger.info(f"Statistiques recalculées: {counts['successful']} analyses réussies, {counts['failed']} en échec")
+
+
+def get_stats() -> Dict:
+    """
+    Agrégats et classements précalculés (deux petites requêtes, quel que
+    soit le nombre d'analyses)
+    """
+    counters = {counter.key: counter for counter in StatsCounter.objects.all()}
+    if REFRESH_KEY not in counters:
+        refresh_stats()
+        counters = {counter.key: counter for counter in StatsCounter.objects.all()}
+
+    values = {key: counter.value for key, counter in counters.items()}
+    successful = values.get('successful', 0)
+
+    readability = {}
+    for key, count in values.items():
+        if key.startswith('readability:') and count > 0:
+            readability[int(key.split(':', 1)[1])] = count
+    total_score = sum(score * count for score, count in readability.items())
+
+    leaderboards = {board: [] for board, _ in LeaderboardEntry.BOARD_CHOICES}
+    for entry in LeaderboardEntry.objects.all():
+        leaderboards[entry.board].append({
+            'rank': entry.rank,
+            'domain': entry.domain,
+            'risk_level': entry.risk_level,
+            'readability_score': entry.readability_score,
+            'analysed_at': entry.analysed_at,
+        })
+
+    return {
+        'analyses': {
+            'successful': successful,
+            'failed': values.get('failed', 0),
+        },
+        'risk_distribution': {
+            level: values.get(f'risk:{level}', 0) for level, _ in WebsiteAnalysis.RISK_CHOICES
+        },
+        'readability': {
+            'average': round(total_score / successful, 2) if successful else None,
+            'distribution': {str(score): readability[score] for score in sorted(readability)},
+        },
+        'leaderboards': leaderboards,
+        'refreshed_at': counters[REFRESH_KEY].updated_at,
+        'updated_at': max(counter.updated_at for counter in counters.values()),
+    }
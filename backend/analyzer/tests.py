@@ -1,3 +1,1763 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import marshal
+import importlib.util
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from unittest import mock, skipUnless
+from urllib.parse import urlparse
 
-# Create your tests here.
+import requests
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from benchmarks.fixtures import MockLLMServer
+
+from . import headless_render
+from .analysis_pipeline import save_analysis
+from .imports import import_analyses
+from .stats import get_stats, refresh_stats
+from .typed_analysis import analyze_by_document_type, merge_sections, section_fields
+from .content_extraction import DomainBoilerplate, extract_main_content
+from .deadline import ClientDisconnectMiddleware, Deadline, DeadlineExceeded
+from .document_extractor import DocumentExtractor
+from .document_formats import detect_format, extract_document, extract_legal_links
+from .fetch_scheduler import FetchScheduler, ScheduledSession
+from .headless_render import needs_render
+from .http_transport import DNSCache, HttpxSession, dns_cache, get_session, reset_session
+from .metrics import FETCH_ERRORS, STAGE_SECONDS, MetricsRegistry, registry, span, trace_analysis
+from .llm_router import LLMRouter, LLMRouterError, Provider, get_router
+from .languages import detect_language, detect_page_language
+from .llm_utils import LLMAnalysisError, analyze_legal_documents
+from .models import (
+    AnalysisCheckpoint, AnalysisProfile, AnalysisSnapshot, DiscoveredDocument, SectionAnalysis, WebhookDelivery,
+    WebsiteAnalysis,
+)
+from .parsing_service import get_parse_pool, parse_links
+from .json_extractor import (
+    ANALYSIS_SCHEMA,
+    JSONStreamExtractor,
+    extract_json,
+    validate_analysis,
+)
+from .prompt_budget import (
+    allocate_budget,
+    build_prompt_content,
+    count_tokens,
+    remove_shared_boilerplate,
+)
+from .sitemap_discovery import SitemapDiscovery
+from .startup import parse_import_times, summarize_import_times, warm_up
+from .webhooks import SIGNATURE_HEADER, deliver_due, notify_completion, register_callback, sign
+
+
+VALID_ANALYSIS = {
+    "summary": "Le service collecte vos données {notamment l'email}.",
+    "what_you_accept": "Les conditions \"telles quelles\"",
+    "data_collected": "Email, adresse IP",
+    "data_usage": "Publicité ciblée",
+    "data_sharing": "Partenaires commerciaux",
+    "retention_period": "3 ans",
+    "critical_points": "Arbitrage obligatoire",
+    "key_points": ["Point 1", "Point 2 ]", "Point 3 }"],
+    "readability_score": 6,
+    "risk_level": "high",
+    "risk_explanation": "Partage étendu des données",
+}
+
+VALID_JSON = json.dumps(VALID_ANALYSIS, ensure_ascii=False, indent=2)
+
+# Corpus de sorties de modèle mal formées observées en pratique
+MALFORMED_OUTPUTS = [
+    # Bloc de code markdown
+    f"```json\n{VALID_JSON}\n```",
+    # Texte d'accompagnement avant et après, avec accolades parasites
+    f"Voici l'analyse {{demandée}} :\n{VALID_JSON}\nN'hésitez pas si besoin }} !",
+    # Deux blocs JSON : un exemple puis la vraie réponse
+    '{"exemple": true}\n' + VALID_JSON,
+    # Virgules finales
+    VALID_JSON.replace('données"', 'données",').replace('"Point 3 }"', '"Point 3 }",'),
+    # Retours à la ligne bruts dans les chaînes
+    VALID_JSON.replace('Email, adresse IP', 'Email,\nadresse IP'),
+    # Accolade ouvrante isolée dans le texte avant le JSON
+    "Résultat { partiel :\n" + VALID_JSON,
+]
+
+
+class JSONExtractionTests(SimpleTestCase):
+    """Tests de l'extraction JSON des réponses du modèle"""
+
+    def test_malformed_corpus(self):
+        for output in MALFORMED_OUTPUTS:
+            with self.subTest(output=output[:40]):
+                data = extract_json(output)
+                self.assertEqual(data['risk_level'], 'high')
+                self.assertEqual(data['retention_period'], '3 ans')
+
+    def test_truncated_output_is_repaired(self):
+        truncated = VALID_JSON[:VALID_JSON.index('"critical_points"') + 25]
+        data = validate_analysis(extract_json(truncated))
+        self.assertEqual(data['data_sharing'], 'Partenaires commerciaux')
+        self.assertEqual(data['key_points'], ANALYSIS_SCHEMA['key_points'])
+
+    def test_streamed_chunks(self):
+        extractor = JSONStreamExtractor()
+        text = "Bien sûr !\n" + VALID_JSON + "\nFin."
+        completed = []
+        for i in range(0, len(text), 7):
+            completed.extend(extractor.feed(text[i:i + 7]))
+        self.assertEqual(len(completed), 1)
+        self.assertEqual(json.loads(completed[0]), VALID_ANALYSIS)
+
+    def test_no_json(self):
+        with self.assertRaises(ValueError):
+            extract_json("Je ne peux pas analyser ces documents.")
+
+    def test_validate_analysis_coerces_fields(self):
+        data = validate_analysis({
+            'readability_score': '14',
+            'risk_level': 'HIGH ',
+            'key_points': 'Un seul point',
+            'data_sharing': ['A', 'B'],
+        })
+        self.assertEqual(data['readability_score'], 10)
+        self.assertEqual(data['risk_level'], 'high')
+        self.assertEqual(data['key_points'], ['Un seul point'])
+        self.assertEqual(data['data_sharing'], '["A", "B"]')
+        self.assertEqual(data['summary'], ANALYSIS_SCHEMA['summary'])
+
+    def test_non_finite_scores_fall_back_to_default(self):
+        for score in (1e999, '1e999', 'inf', '-inf', 'nan'):
+            data = validate_analysis({'readability_score': score})
+            self.assertEqual(data['readability_score'], ANALYSIS_SCHEMA['readability_score'])
+
+    def test_fuzz_never_raises_unexpected(self):
+        rng = random.Random(26)
+        alphabet = '{}[]",:\\\n ab1'
+        for _ in range(500):
+            noise = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            cut = rng.randint(0, len(VALID_JSON))
+            text = noise + VALID_JSON[:cut] + noise
+            try:
+                self.assertIsInstance(extract_json(text), dict)
+            except ValueError:
+                pass
+
+
+class PromptBudgetTests(SimpleTestCase):
+    """Tests de l'assemblage du prompt dans un budget de tokens"""
+
+    def test_shared_boilerplate_is_removed(self):
+        banner = "Nous utilisons des cookies. Tout accepter"
+        clause = "Vos données sont conservées trois ans après la clôture du compte. " * 3
+        documents = [
+            {'type': 'terms', 'content': f"{banner}\nAccueil\nArticle 1 : objet du service\n{clause}"},
+            {'type': 'privacy', 'content': f"{banner}\nAccueil\nArticle 2 : vos droits\n{clause}"},
+        ]
+        cleaned = remove_shared_boilerplate(documents)
+        self.assertNotIn(banner, cleaned[0] + cleaned[1])
+        self.assertNotIn("Accueil", cleaned[0])
+        self.assertIn("Article 1", cleaned[0])
+        self.assertEqual((cleaned[0] + cleaned[1]).count(clause.strip()), 1)
+
+    def test_shared_clauses_are_kept_once(self):
+        footer = "© Exemple 2025 - Mentions légales"
+        documents = [
+            {'type': 'terms', 'content': f"Conditions\nVos données\nWe do not sell your data.\nArticle 1\n{footer}"},
+            {'type': 'privacy', 'content': f"Confidentialité\nVos données\nWe do not sell your data.\nArticle 2\n{footer}"},
+        ]
+        combined = '\n'.join(remove_shared_boilerplate(documents))
+        self.assertEqual(combined.count("We do not sell your data."), 1)
+        self.assertEqual(combined.count("Vos données"), 1)
+        self.assertNotIn(footer, combined)
+
+    def test_allocation_redistributes_unused_share(self):
+        allocation = allocate_budget([100, 5000, 5000], [1, 4, 1], 1000)
+        self.assertEqual(allocation[0], 100)
+        self.assertEqual(allocation[1], 4 * allocation[2])
+        self.assertLessEqual(sum(allocation), 1000)
+
+    def test_build_prompt_respects_budget(self):
+        documents = [
+            {'type': 'terms', 'title': 'CGU', 'content': "Clause importante.\n\n" * 2000},
+            {'type': 'cookies', 'title': 'Cookies', 'content': "Traceur publicitaire.\n\n" * 2000},
+        ]
+        combined, report = build_prompt_content(documents, budget=500)
+        self.assertLessEqual(count_tokens(combined), 520)
+        self.assertGreater(report['tokens_saved'], 0)
+        self.assertTrue(all(doc['truncated'] for doc in report['documents']))
+
+
+def _legal_page(site, title, clauses, with_sidebar=True):
+    """Page de test : contenu juridique entouré de navigation et de bandeaux"""
+    menu = ''.join(f'<li><a href="/{item}">{item.title()}</a></li>' for item in ('accueil', 'produits', 'blog', 'contact'))
+    sidebar = (
+        '<div class="col"><ul>'
+        + ''.join(f'<li><a href="/doc{i}">Document {i} du centre d\'aide</a></li>' for i in range(8))
+        + '</ul></div>'
+    ) if with_sidebar else ''
+    body = ''.join(f'<p>{clause}</p>' for clause in clauses)
+    return f"""<html><head><title>{title} - {site}</title></head><body>
+        <div class="top"><ul>{menu}</ul></div>
+        <div id="cookie-consent"><p>Nous utilisons des cookies pour améliorer votre expérience. Tout accepter.</p></div>
+        <div class="wrapper">{sidebar}
+          <div class="col"><h1>{title}</h1>{body}
+            <p>Une question ? Contactez le service client de {site} au 01 23 45 67 89.</p></div>
+        </div>
+        <div class="bottom"><p>© {site} 2025 - Tous droits réservés - Siège social : Paris.</p></div>
+    </body></html>"""
+
+
+def _extraction_corpus():
+    corpus = []
+    for site in ('exemple.fr', 'boutique.com', 'reseau.io'):
+        for doc in ('Conditions', 'Confidentialité', 'Cookies'):
+            clauses = [
+                f"Article {i} des {doc.lower()} de {site} : l'utilisateur accepte la clause numéro {i} et ses effets."
+                for i in range(1, 9)
+            ]
+            corpus.append((site, f'https://{site}/{doc.lower()}', _legal_page(site, doc, clauses), clauses))
+    return corpus
+
+
+class ContentExtractionTests(SimpleTestCase):
+    """Évaluation de l'extraction du contenu principal sur un corpus de pages"""
+
+    def setUp(self):
+        self.boilerplate = DomainBoilerplate()
+
+    def test_precision_recall_on_fixture_corpus(self):
+        corpus = _extraction_corpus()
+        extracted = []
+        for site, url, html, clauses in corpus:
+            blocks = extract_main_content(html)['blocks']
+            self.boilerplate.observe(site, url, blocks)
+            extracted.append((site, blocks, clauses))
+
+        relevant = retrieved = hits = 0
+        for site, blocks, clauses in extracted:
+            kept = [block for block in self.boilerplate.filter(site, blocks) if not block.startswith(('Conditions', 'Confidentialité', 'Cookies'))]
+            relevant += len(clauses)
+            retrieved += len(kept)
+            hits += len(set(kept) & set(clauses))
+
+        precision = hits / retrieved
+        recall = hits / relevant
+        self.assertGreaterEqual(precision, 0.95)
+        self.assertGreaterEqual(recall, 0.95)
+
+    def test_repeated_blocks_are_learned_per_domain(self):
+        shared = "Inscrivez-vous à notre lettre d'information hebdomadaire."
+        self.boilerplate.observe('a.fr', 'https://a.fr/cgu', [shared, 'Clause A'])
+        self.assertFalse(self.boilerplate.is_boilerplate('a.fr', shared))
+        self.boilerplate.observe('a.fr', 'https://a.fr/privacy', [shared, 'Clause B'])
+        self.assertTrue(self.boilerplate.is_boilerplate('a.fr', shared))
+        self.assertFalse(self.boilerplate.is_boilerplate('b.fr', shared))
+        self.assertEqual(self.boilerplate.filter('a.fr', [shared, 'Clause A']), ['Clause A'])
+
+    def test_shared_legal_clause_survives(self):
+        clause = ("Le responsable du traitement est Exemple SAS ; son délégué à la protection "
+                  "des données est joignable à dpo@exemple.fr.")
+        footer = "Une question ? Contactez le service client au 01 23 45 67 89."
+        terms = ['Conditions', "Article 1 : l'utilisateur accepte les présentes conditions.", clause, 'Article 2 : durée.', footer]
+        privacy = ['Confidentialité', 'Vos droits : accès, rectification, effacement.', clause,
+                   'Conservation : trois ans après la clôture du compte.', footer]
+        self.boilerplate.observe('a.fr', 'https://a.fr/cgu', terms)
+        self.boilerplate.observe('a.fr', 'https://a.fr/privacy', privacy)
+
+        # Même extraction : clause gardée une fois, pied de page retiré partout
+        kept = set()
+        self.assertEqual(self.boilerplate.filter('a.fr', terms, kept), terms[:-1])
+        self.assertEqual(self.boilerplate.filter('a.fr', privacy, kept), [*privacy[:2], privacy[3]])
+        # Analyse suivante d'un seul document : la clause reste
+        self.assertEqual(self.boilerplate.filter('a.fr', privacy), privacy[:-1])
+
+    def test_page_wrappers_with_negative_classes_are_kept(self):
+        clauses = [f"Article {i} : l'utilisateur accepte la clause numéro {i} et ses effets juridiques." for i in range(1, 9)]
+        body = ''.join(f'<p>{clause}</p>' for clause in clauses)
+        links = ''.join(f'<a href="/doc{i}">Document {i} du centre d\'aide</a>' for i in range(8))
+        for wrapper in ('layout with-sidebar', 'header-offset'):
+            html = (f'<html><body><div class="{wrapper}"><div class="sidebar">{links}</div>'
+                    f'<h1>Conditions</h1>{body}</div></body></html>')
+            blocks = extract_main_content(html)['blocks']
+            self.assertEqual(blocks[1:], clauses, wrapper)
+            self.assertFalse(any('centre d' in block for block in blocks))
+
+    def test_fingerprints_per_domain_are_bounded(self):
+        boilerplate = DomainBoilerplate(max_blocks=10)
+        boilerplate.observe('a.fr', 'https://a.fr/cgu', [f'Bloc {i}' for i in range(50)])
+        boilerplate.observe('a.fr', 'https://a.fr/privacy', ['Bloc 49'])
+        self.assertEqual(len(boilerplate._domains['a.fr']), 10)
+        self.assertTrue(boilerplate.is_boilerplate('a.fr', 'Bloc 49'))
+
+    def test_throughput(self):
+        _, _, html, _ = _extraction_corpus()[0]
+        pages = 50
+        start = time.perf_counter()
+        for _ in range(pages):
+            extract_main_content(html)
+        elapsed = time.perf_counter() - start
+        self.assertGreater(pages / elapsed, 20)
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """Serveur local servant des réponses fixes : {chemin: (statut, en-têtes, corps)}"""
+
+    routes: Dict[str, tuple] = {}
+    delays: Dict[str, float] = {}
+    hits: List[str] = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        if self.path in self.delays:
+            time.sleep(self.delays[self.path])
+        status_code, headers, body = self.routes.get(self.path, (404, {}, b'not found'))
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.hits.append(self.path)
+        status_code = self.routes.get(self.path, (404,))[0]
+        self.send_response(status_code)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client parti avant la réponse (délai dépassé)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_fixture_server(routes, delays=None):
+    handler = type('Handler', (_FixtureHandler,), {'routes': routes, 'delays': delays or {}, 'hits': []})
+    server = _FixtureServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler, f"http://127.0.0.1:{server.server_port}"
+
+
+class SitemapDiscoveryTests(TestCase):
+    """Découverte des documents juridiques via robots.txt et sitemaps"""
+
+    def setUp(self):
+        cache.clear()
+        urlset = (
+            '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f'<url><loc>{{base}}/blog/cookies-recette-{i}</loc></url>' for i in range(200))
+            + '<url><loc>{base}/fr/legal/privacy-policy</loc></url>'
+            + '<url><loc>{base}/conditions-generales-d-utilisation-cgu</loc></url>'
+            + '<url><loc>{base}/cgu</loc></url>'
+            + '</urlset>'
+        )
+        index = (
+            '<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            '<sitemap><loc>{base}/sitemap-pages.xml.gz</loc></sitemap></sitemapindex>'
+        )
+        self.routes = {}
+        self.server, self.handler, self.base = start_fixture_server(self.routes)
+        self.routes.update({
+            '/robots.txt': (200, {}, f"User-agent: *\nCrawl-delay: 2\nSitemap: {self.base}/sitemap_index.xml\n".encode()),
+            '/sitemap_index.xml': (200, {'Content-Type': 'application/xml'}, index.replace('{base}', self.base).encode()),
+            '/sitemap-pages.xml.gz': (200, {'Content-Type': 'application/x-gzip'}, gzip.compress(urlset.replace('{base}', self.base).encode())),
+        })
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_robots_index_and_gzip_sitemap(self):
+        extractor = DocumentExtractor()
+        discovery = SitemapDiscovery(extractor.session, extractor._identify_document_type)
+        documents = {doc['type']: doc['url'] for doc in discovery.discover(self.base)}
+
+        self.assertEqual(documents, {
+            'privacy': f'{self.base}/fr/legal/privacy-policy',
+            'terms': f'{self.base}/cgu',
+        })
+        self.assertEqual(discovery.crawl_delay, 2.0)
+
+        # Second appel servi par le cache
+        hits = len(self.handler.hits)
+        SitemapDiscovery(extractor.session, extractor._identify_document_type).discover(self.base)
+        self.assertEqual(len(self.handler.hits), hits)
+
+    def test_only_urls_of_the_site_are_considered(self):
+        extractor = DocumentExtractor()
+        discovery = SitemapDiscovery(extractor.session, extractor._identify_document_type)
+        best = {}
+        for loc in ('https://example.com.evil.net/cgu', 'https://notexample.com/cgu',
+                    'https://example.com@evil.net/privacy', 'https://legal.example.com/privacy-policy'):
+            discovery._consider(loc, 'https://www.example.com/', best)
+        self.assertEqual(best, {'privacy': 'https://legal.example.com/privacy-policy'})
+
+    def test_sitemap_complements_homepage_without_probes(self):
+        self.routes['/'] = (200, {}, b'<html><body><a href="/cgu">CGU</a></body></html>')
+        documents = DocumentExtractor().find_legal_document_urls(self.base + '/')
+
+        self.assertEqual({doc['type'] for doc in documents}, {'terms', 'privacy'})
+        self.assertFalse([hit for hit in self.handler.hits if hit in ('/terms', '/privacy-policy')])
+
+
+class DiscoveryCacheTests(TestCase):
+    """Cache des URLs de documents juridiques par domaine"""
+
+    def setUp(self):
+        cache.clear()
+        self.routes = {}
+        self.server, self.handler, self.base = start_fixture_server(self.routes)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_second_discovery_is_served_from_cache(self):
+        self.routes['/'] = (200, {}, b'<html><body><a href="/privacy">Privacy policy</a></body></html>')
+        first = DocumentExtractor().find_legal_document_urls(self.base)
+        hits = len(self.handler.hits)
+
+        extractor = DocumentExtractor()
+        self.assertEqual(extractor.find_legal_document_urls(self.base), first)
+        self.assertTrue(extractor.discovery_cached)
+        self.assertEqual(len(self.handler.hits), hits)
+
+    def test_negative_result_is_cached_with_short_ttl(self):
+        with self.settings(DISCOVERY_NEGATIVE_TTL=60, DISCOVERY_CACHE_TTL=3600):
+            self.assertEqual(DocumentExtractor().find_legal_document_urls(self.base), [])
+
+        entry = DiscoveredDocument.objects.get(domain=self.base.split('//')[1])
+        self.assertTrue(entry.is_negative)
+        self.assertLessEqual((entry.expires_at - entry.discovered_at).total_seconds(), 60)
+
+        hits = len(self.handler.hits)
+        self.assertEqual(DocumentExtractor().find_legal_document_urls(self.base), [])
+        self.assertEqual(len(self.handler.hits), hits)
+
+    def test_outages_are_not_cached(self):
+        self.routes['/'] = (503, {}, b'maintenance')
+        self.assertEqual(DocumentExtractor().find_legal_document_urls(self.base), [])
+
+        # Serveur injoignable : aucune réponse
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertEqual(DocumentExtractor().find_legal_document_urls(self.base), [])
+        self.assertFalse(DiscoveredDocument.objects.exists())
+
+
+class HttpTransportTests(SimpleTestCase):
+    """Transport HTTP partagé du scraper"""
+
+    def test_dns_cache_reuses_answers_until_expiry(self):
+        calls = []
+        dns = DNSCache(ttl=60, resolver=lambda *args: calls.append(args) or [('addr', args[0])])
+
+        self.assertEqual(dns.getaddrinfo('cdn.example.com', 443), [('addr', 'cdn.example.com')])
+        dns.getaddrinfo('cdn.example.com', 443)
+        self.assertEqual(len(calls), 1)
+
+        dns.ttl = -1
+        dns.clear()
+        dns.getaddrinfo('cdn.example.com', 443)
+        dns.getaddrinfo('cdn.example.com', 443)
+        self.assertEqual(len(calls), 3)
+
+    def test_session_is_shared_and_pools_connections(self):
+        reset_session()
+        self.addCleanup(reset_session)
+        self.assertIs(DocumentExtractor().session.session, DocumentExtractor().session.session)
+
+        with self.settings(SCRAPER_HOST_LIMITS={'legal.example.net': 2}):
+            reset_session()
+            adapter = get_session().get_adapter('https://legal.example.net/cgu')
+        self.assertEqual(adapter._pool_maxsize, 2)
+
+    def test_cookies_do_not_persist_between_requests(self):
+        server, _, base = start_fixture_server({
+            '/': (200, {'Set-Cookie': 'session=analyse-1; Path=/'}, b'ok'),
+            '/cgu': (200, {'Set-Cookie': 'tracking=1; Path=/'}, b'ok'),
+        })
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        reset_session()
+        self.addCleanup(reset_session)
+
+        for path in ('/', '/cgu'):
+            response = get_session().get(base + path, timeout=5)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(get_session().cookies), 0)
+
+    def test_dns_cache_is_scoped_to_the_scraper(self):
+        server, _, base = start_fixture_server({'/': (200, {}, b'ok')})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        reset_session()
+        self.addCleanup(reset_session)
+        host = f"localhost:{server.server_port}"
+
+        with self.settings(SCRAPER_DNS_CACHE_TTL=60):
+            dns_cache.clear()
+            misses = dns_cache.misses
+            self.assertEqual(get_session().get(f"http://{host}/", timeout=5).content, b'ok')
+            self.assertEqual(dns_cache.misses, misses + 1)
+
+            # Les autres clients HTTP du processus n'utilisent pas le cache
+            hits = dns_cache.hits
+            requests.get(f"http://{host}/", timeout=5)
+            self.assertEqual((dns_cache.misses, dns_cache.hits), (misses + 1, hits))
+            self.assertEqual(socket.getaddrinfo.__module__, 'socket')
+
+
+class _RateLimitedHandler(BaseHTTPRequestHandler):
+    """Serveur qui répond 429 si deux requêtes arrivent à moins de `min_interval`"""
+
+    min_interval = 0.1
+    lock = threading.Lock()
+    last = 0.0
+    active = 0
+    max_active = 0
+    statuses: List[int] = []
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            now = time.monotonic()
+            too_fast = now - cls.last < cls.min_interval
+            cls.last = now
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.02)
+        with cls.lock:
+            cls.active -= 1
+            cls.statuses.append(429 if too_fast else 200)
+        self.send_response(429 if too_fast else 200)
+        if too_fast:
+            self.send_header('Retry-After', '0.2')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchSchedulerTests(SimpleTestCase):
+    """Ordonnanceur de politesse face à un serveur qui limite le débit"""
+
+    def setUp(self):
+        self.handler = type('Handler', (_RateLimitedHandler,), {
+            'lock': threading.Lock(), 'statuses': [], 'last': 0.0, 'active': 0, 'max_active': 0
+        })
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.session.close()
+
+    def _fetch_in_parallel(self, scheduler, count):
+        session = ScheduledSession(self.session, scheduler)
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return list(pool.map(lambda _: session.get(self.url, timeout=5).status_code, range(count)))
+
+    def test_token_bucket_avoids_rate_limit(self):
+        scheduler = FetchScheduler(host_concurrency=4, host_rate=8, host_burst=1)
+        self.assertEqual(self._fetch_in_parallel(scheduler, 6), [200] * 6)
+        self.assertNotIn(429, self.handler.statuses)
+
+    def test_backoff_and_retry_on_429(self):
+        scheduler = FetchScheduler(host_concurrency=4, host_rate=1000, host_burst=1000, max_retries=5)
+        self.assertEqual(self._fetch_in_parallel(scheduler, 4), [200] * 4)
+        self.assertIn(429, self.handler.statuses)
+
+    def test_per_host_concurrency_and_crawl_delay(self):
+        scheduler = FetchScheduler(host_concurrency=1, host_rate=1000, host_burst=1000)
+        scheduler.set_crawl_delay(f"127.0.0.1:{self.server.server_port}", 0.12)
+        start = time.monotonic()
+        self.assertEqual(self._fetch_in_parallel(scheduler, 4), [200] * 4)
+        self.assertEqual(self.handler.max_active, 1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.36)
+
+    def test_hosts_are_served_in_turn(self):
+        scheduler = FetchScheduler(max_concurrency=1, host_rate=1000, host_burst=1000)
+        order = []
+        gate = threading.Event()
+
+        class FakeSession:
+            def request(self, method, url, **kwargs):
+                gate.wait(1)
+                order.append(urlparse(url).netloc)
+                return type('Response', (), {'status_code': 200})()
+
+        urls = [f'http://busy.example/{i}' for i in range(4)] + ['http://small.example/']
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            futures = [pool.submit(scheduler.request, FakeSession(), 'GET', url) for url in urls]
+            time.sleep(0.1)
+            gate.set()
+            for future in futures:
+                future.result()
+        self.assertLess(order.index('small.example'), 3)
+
+    def test_streamed_body_download_keeps_the_host_slot(self):
+        scheduler = FetchScheduler(host_concurrency=1, host_rate=1000, host_burst=1000)
+        session = ScheduledSession(self.session, scheduler)
+        first = session.get(self.url, timeout=5, stream=True)
+
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        second = pool.submit(session.get, self.url, timeout=5)
+        time.sleep(0.2)
+        self.assertFalse(second.done())
+
+        with first:
+            self.assertEqual(first.content, b'ok')
+        self.assertEqual(second.result(timeout=5).status_code, 200)
+
+
+JS_ONLY_PAGE = b"""<html><head><title>CGU</title>
+<script>""" + b"var bundle = 1;" * 2000 + b"""</script></head>
+<body><div id="root"></div><script>
+document.getElementById('root').innerHTML = '<main>' +
+  Array.from({length: 20}, (_, i) => '<p>Article ' + i + ' : les conditions rendues en JavaScript s\\'appliquent.</p>').join('') +
+  '</main>';
+</script></body></html>"""
+
+
+class HeadlessRenderTests(SimpleTestCase):
+    """Rendu headless des pages construites côté client"""
+
+    def test_render_triggered_only_for_sparse_pages(self):
+        self.assertTrue(needs_render(len(JS_ONLY_PAGE), 0))
+        # Page statique courte mais dense (mentions légales)
+        self.assertFalse(needs_render(600, 400))
+        # Page longue : jamais de rendu
+        self.assertFalse(needs_render(500000, 20000))
+
+    def test_fast_path_without_renderer(self):
+        routes = {'/cgu': (200, {}, JS_ONLY_PAGE)}
+        server, handler, base = start_fixture_server(routes)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with self.settings(RENDER_FALLBACK_ENABLED=False):
+            document = DocumentExtractor().extract_document_content(f'{base}/cgu')
+        self.assertNotIn('Article 3', document['content'])
+
+    def test_render_fails_fast_when_the_browser_cannot_start(self):
+        pool = headless_render.RenderPool(size=2, timeout=10)
+        self.addCleanup(pool.close)
+        with mock.patch.dict(sys.modules, {'playwright.sync_api': None}):
+            start = time.monotonic()
+            self.assertIsNone(pool.render('https://site.example/cgu'))
+            self.assertLess(time.monotonic() - start, 2)
+            self.assertIsNotNone(pool.error)
+            self.assertIsNone(pool.render('https://site.example/privacy'))
+
+    @skipUnless(headless_render.is_available(), "Playwright n'est pas installé")
+    def test_js_page_is_rendered(self):
+        routes = {'/cgu': (200, {'Content-Type': 'text/html'}, JS_ONLY_PAGE)}
+        server, handler, base = start_fixture_server(routes)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with self.settings(RENDER_FALLBACK_ENABLED=True, RENDER_POOL_SIZE=1, RENDER_TIMEOUT=10):
+            headless_render._pool_pid = None
+            document = DocumentExtractor().extract_document_content(f'{base}/cgu')
+            pool = headless_render.get_render_pool()
+            self.addCleanup(pool.close)
+        self.assertIn('Article 3', document['content'])
+
+
+def _make_pdf(pages: List[str]) -> bytes:
+    """PDF minimal d'une ligne de texte par page"""
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(f"{4 + 2 * i} 0 R".encode() for i in range(count)) + f"] /Count {count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
+
+
+def _make_docx(paragraphs: List[str]) -> bytes:
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', document)
+    return buffer.getvalue()
+
+
+class DocumentFormatTests(SimpleTestCase):
+    """Extraction des documents juridiques non HTML"""
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format(b'%PDF-1.7', '', 'https://a.fr/cgu'), 'pdf')
+        self.assertEqual(detect_format(b'', 'application/pdf; qs=1', ''), 'pdf')
+        self.assertEqual(detect_format(b'', '', 'https://a.fr/cgv.docx'), 'docx')
+        self.assertEqual(detect_format(b'Article 1', 'text/plain; charset=utf-8', ''), 'text')
+        self.assertEqual(detect_format(b'<html>', 'text/html', 'https://a.fr/cgu'), 'html')
+
+    @skipUnless(importlib.util.find_spec('pypdf'), "pypdf n'est pas installé")
+    def test_pdf_pages_stop_at_content_cap(self):
+        pdf = _make_pdf([f"Article {i} des conditions generales de vente" for i in range(50)])
+        full = extract_document(pdf, 'application/pdf')
+        self.assertEqual(full['format'], 'pdf')
+        self.assertEqual(len(full['blocks']), 50)
+        self.assertIn('Article 7', full['blocks'][7])
+
+        capped = extract_document(pdf, 'application/pdf', max_length=100)
+        self.assertEqual(len(capped['blocks']), 3)
+
+    def test_docx_and_text(self):
+        docx = _make_docx(['Article 1 : objet', 'Article 2 : durée'])
+        self.assertEqual(extract_document(docx, '', 'https://a.fr/cgv.docx')['blocks'], ['Article 1 : objet', 'Article 2 : durée'])
+
+        text = "Mentions légales\n\nÉditeur : Exemple SAS".encode('latin-1')
+        self.assertEqual(extract_document(text, 'text/plain; charset=latin-1')['blocks'], ['Mentions légales', 'Éditeur : Exemple SAS'])
+
+    @skipUnless(importlib.util.find_spec('pypdf'), "pypdf n'est pas installé")
+    def test_extractor_dispatches_pdf_to_process_pool(self):
+        routes = {'/docs/cgv.pdf': (200, {'Content-Type': 'application/pdf'}, _make_pdf(['Article 1 les prix sont TTC']))}
+        server, handler, base = start_fixture_server(routes)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with self.settings(PARSER_PROCESSES=1):
+            document = DocumentExtractor().extract_document_content(f'{base}/docs/cgv.pdf')
+        self.assertEqual(document['title'], 'cgv')
+        self.assertIn('Article 1 les prix sont TTC', document['content'])
+
+    def test_legal_links_are_parsed_in_process_pool(self):
+        page = (
+            b'<html><body><nav><a href="/produits">Produits</a></nav>'
+            b'<footer><a href="/cgu">Conditions d\'utilisation</a>'
+            b'<a href="/privacy-policy">Confidentialit\xc3\xa9</a><a href="/cgu">CGU</a></footer></body></html>'
+        )
+        expected = extract_legal_links(page, 'https://exemple.fr/')
+        self.assertEqual([link['url'] for link in expected], ['https://exemple.fr/cgu', 'https://exemple.fr/privacy-policy'])
+
+        with self.settings(PARSER_PROCESSES=1):
+            self.assertEqual(parse_links(page, 'https://exemple.fr/'), expected)
+            # Pas de fork du worker multithread
+            self.assertIn(get_parse_pool()._mp_context.get_start_method(), ('forkserver', 'spawn'))
+
+
+class MetricsTests(TestCase):
+    """Instrumentation du pipeline et export Prometheus"""
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_prometheus_text_format(self):
+        local = MetricsRegistry()
+        counter = local.counter('test_errors_total', 'Erreurs', ['error'])
+        histogram = local.histogram('test_seconds', 'Durées', ['stage'], buckets=(0.1, 1.0))
+        counter.inc(error='http_404')
+        counter.inc(2, error='Timeout "lent"')
+        for value in (0.05, 0.5, 3.0):
+            histogram.observe(value, stage='fetch')
+
+        text = local.render()
+        self.assertIn('# TYPE test_errors_total counter', text)
+        self.assertIn('test_errors_total{error="Timeout \\"lent\\""} 2', text)
+        self.assertIn('test_seconds_bucket{stage="fetch",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="fetch",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{stage="fetch",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{stage="fetch"} 3', text)
+
+    def test_span_overhead_is_negligible(self):
+        iterations = 20000
+        start = time.perf_counter()
+        with trace_analysis('exemple.fr'):
+            for _ in range(iterations):
+                with span('bench'):
+                    pass
+        per_span = (time.perf_counter() - start) / iterations
+        self.assertLess(per_span, 50e-6)
+        self.assertEqual(STAGE_SECONDS.count(stage='bench'), iterations)
+
+    def test_analysis_stages_tokens_and_errors_are_exported(self):
+        page = b'<html><body><main><p>Article 1 : le service collecte vos donn\xc3\xa9es.</p></main></body></html>'
+        routes = {
+            '/': (200, {'Content-Type': 'text/html'}, b'<a href="/cgu">CGU</a><a href="/privacy">Confidentialit\xc3\xa9</a>'),
+            '/cgu': (200, {'Content-Type': 'text/html'}, page),
+        }
+        server, handler, base = start_fixture_server(routes)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        def fake_llm(documents, domain, deadline=None, raise_errors=False):
+            from .metrics import record_tokens
+            with span('llm'):
+                record_tokens('prompt', 1200)
+            return {'summary': 'Résumé', 'risk_level': 'low'}
+
+        with self.settings(PARSER_PROCESSES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', side_effect=fake_llm), \
+                self.assertLogs('analyzer.metrics', 'INFO') as logs:
+            response = self.client.post('/api/analyze/', {'url': base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("'prompt': 1200", logs.output[0])
+
+        text = self.client.get('/api/metrics/').content.decode()
+        for stage in ('discovery', 'fetch', 'parse', 'clean', 'llm', 'db_write'):
+            self.assertIn(f'guardclause_stage_duration_seconds_count{{stage="{stage}"}}', text)
+        self.assertIn('guardclause_analyses_total{outcome="success"} 1', text)
+        self.assertIn('guardclause_analysis_tokens_count{kind="prompt"} 1', text)
+        self.assertIn('guardclause_cache_requests_total{cache="discovery",result="miss"} 1', text)
+        self.assertEqual(FETCH_ERRORS.value(error='http_404'), 1)
+
+
+class ProfilingTests(TestCase):
+    """Profilage à la demande et échantillonné des analyses"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.analysis = WebsiteAnalysis.objects.create(domain='exemple.fr', url='https://exemple.fr/', summary='Résumé')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.user = User.objects.create_user('visiteur', password='x')
+
+    def analyze(self, **extra):
+        return self.client.post('/api/analyze/', {'url': 'https://exemple.fr/'}, content_type='application/json', **extra)
+
+    def test_admin_profile_is_stored_with_analysis(self):
+        self.client.force_login(self.admin)
+        response = self.analyze(HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response.status_code, 200)
+
+        profile = AnalysisProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.analysis, self.analysis)
+        self.assertEqual((profile.profiler, profile.trigger), ('cprofile', 'request'))
+        self.assertIn('analyze_website', profile.summary)
+        self.assertTrue(any(key[2] == 'analyze_website' for key in marshal.loads(bytes(profile.data))))
+
+    def test_profile_switch_is_restricted_to_admins(self):
+        self.client.force_login(self.user)
+        response = self.analyze(HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(AnalysisProfile.objects.exists())
+
+    def test_sampled_traffic_has_bounded_storage(self):
+        with self.settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_STORED=2, PROFILING_SAMPLE_INTERVAL=0.001):
+            for _ in range(3):
+                self.analyze()
+        profiles = AnalysisProfile.objects.all()
+        self.assertEqual(profiles.count(), 2)
+        self.assertTrue(all(p.profiler == 'sampling' and p.trigger == 'sample' for p in profiles))
+
+
+class DeadlineTests(TestCase):
+    """Budget de temps et annulation coopérative de l'analyse"""
+
+    def setUp(self):
+        cache.clear()
+        page = b'<html><body><main><p>Article 1 : le service collecte vos donn\xc3\xa9es personnelles.</p></main></body></html>'
+        routes = {
+            '/': (200, {'Content-Type': 'text/html'}, b'<a href="/cgu">CGU</a><a href="/privacy">Confidentialit\xc3\xa9</a>'),
+            '/cgu': (200, {'Content-Type': 'text/html'}, page),
+            '/privacy': (200, {'Content-Type': 'text/html'}, page),
+        }
+        self.server, self.handler, self.base = start_fixture_server(routes, delays={'/privacy': 3.0})
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_stages_share_the_remaining_budget(self):
+        deadline = Deadline(10)
+        self.assertEqual(deadline.timeout(5), 5)
+        self.assertLessEqual(deadline.reserve(8).timeout(5), 2)
+
+        deadline.cancel()
+        self.assertTrue(deadline.reserve(1).expired)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout(5)
+
+    def test_extraction_returns_partial_documents_on_expiry(self):
+        extractor = DocumentExtractor(deadline=Deadline(1.0))
+        start = time.monotonic()
+        with self.settings(PARSER_PROCESSES=0):
+            documents, _ = extractor.extract_all_documents(self.base + '/')
+
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertTrue(extractor.timed_out)
+        self.assertEqual([doc['type'] for doc in documents], ['terms'])
+
+    def test_expired_analysis_keeps_extracted_documents(self):
+        def slow_llm(documents, domain, deadline=None, raise_errors=False):
+            raise DeadlineExceeded("délai dépassé pendant llm")
+
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_DEADLINE=1.5, ANALYSIS_LLM_RESERVE=0.5), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', side_effect=slow_llm):
+            response = self.client.post('/api/analyze/', {'url': self.base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 504)
+
+        analysis = WebsiteAnalysis.objects.get(domain=urlparse(self.base).netloc)
+        self.assertFalse(analysis.is_successful)
+        self.assertEqual([doc.document_type for doc in analysis.documents.all()], ['terms'])
+
+        # Une nouvelle analyse remplace l'analyse interrompue (domaine unique)
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_DEADLINE=10), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', return_value={'summary': 'Résumé'}):
+            response = self.client.post('/api/analyze/', {'url': self.base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebsiteAnalysis.objects.get(domain=urlparse(self.base).netloc).summary, 'Résumé')
+
+    def test_client_disconnect_cancels_the_deadline(self):
+        request = mock.Mock(path='/api/analyze/')
+        started = asyncio.Event()
+
+        async def get_response(request):
+            started.set()
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.ensure_future(ClientDisconnectMiddleware(get_response)(request))
+            await started.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertTrue(Deadline(60, cancelled=request.disconnected).expired)
+
+
+class ResumableAnalysisTests(TestCase):
+    """Reprise d'une analyse à sa dernière étape terminée"""
+
+    def setUp(self):
+        cache.clear()
+        page = b'<html><body><main><p>Article 1 : le service collecte vos donn\xc3\xa9es personnelles.</p></main></body></html>'
+        routes = {
+            '/': (200, {'Content-Type': 'text/html'}, b'<a href="/cgu">CGU</a><a href="/privacy">Confidentialit\xc3\xa9</a>'),
+            '/cgu': (200, {'Content-Type': 'text/html'}, page),
+            '/privacy': (200, {'Content-Type': 'text/html'}, page),
+        }
+        self.server, self.handler, self.base = start_fixture_server(routes)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.domain = urlparse(self.base).netloc
+
+    def analyze(self, **llm):
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_LLM_RETRIES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', **llm):
+            return self.client.post('/api/analyze/', {'url': self.base + '/'}, content_type='application/json')
+
+    def test_retry_resumes_after_llm_failure_without_refetching(self):
+        response = self.analyze(side_effect=LLMAnalysisError("service indisponible"))
+        self.assertEqual(response.status_code, 500)
+
+        checkpoint = AnalysisCheckpoint.objects.get(domain=self.domain)
+        self.assertEqual(checkpoint.stage, 'fetched')
+        self.assertEqual(checkpoint.attempts, 1)
+        self.assertEqual(len(checkpoint.documents), 2)
+        # Les documents extraits sont conservés avec l'analyse en échec
+        self.assertEqual(WebsiteAnalysis.objects.get(domain=self.domain).documents.count(), 2)
+
+        self.handler.hits.clear()
+        response = self.analyze(return_value={'summary': 'Résumé', 'risk_level': 'low'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.handler.hits, [])
+        self.assertEqual(response.json()['data']['summary'], 'Résumé')
+        self.assertEqual(AnalysisCheckpoint.objects.get(domain=self.domain).stage, 'persisted')
+
+    def test_llm_errors_are_retried_within_the_request(self):
+        llm = mock.Mock(side_effect=[LLMAnalysisError("réponse inexploitable"), {'summary': 'Résumé'}])
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_LLM_RETRIES=1), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', llm), \
+                mock.patch('analyzer.analysis_pipeline.time.sleep'):
+            response = self.client.post('/api/analyze/', {'url': self.base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(llm.call_count, 2)
+
+    def test_failed_reanalysis_keeps_the_last_successful_one(self):
+        self.analyze(return_value={'summary': 'Résumé', 'risk_level': 'low'})
+        WebsiteAnalysis.objects.update(created_at=timezone.now() - timezone.timedelta(days=2))
+
+        response = self.analyze(side_effect=LLMAnalysisError("service indisponible"))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['data']['summary'], 'Résumé')
+
+        analysis = WebsiteAnalysis.objects.get(domain=self.domain)
+        self.assertTrue(analysis.is_successful)
+        self.assertEqual(analysis.documents.count(), 2)
+        self.assertEqual(self.client.get(f'/api/badge/{self.domain}/').status_code, 200)
+        self.assertEqual(AnalysisCheckpoint.objects.get(domain=self.domain).last_error, 'service indisponible')
+
+    def test_discarded_failure_is_neither_notified_nor_persisted(self):
+        self.analyze(return_value={'summary': 'Résumé', 'risk_level': 'low'})
+        WebsiteAnalysis.objects.update(created_at=timezone.now() - timezone.timedelta(days=2))
+        delivery = register_callback(self.domain, 'https://client.example/hooks', 'clé')
+
+        with mock.patch('analyzer.analysis_pipeline.DocumentExtractor.find_legal_document_urls', return_value=[]):
+            response = self.analyze(return_value={'summary': 'Autre résumé'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['data']['summary'], 'Résumé')
+
+        # Rien d'enregistré : pas de notification, reprise depuis la découverte
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'waiting')
+        checkpoint = AnalysisCheckpoint.objects.get(domain=self.domain)
+        self.assertEqual((checkpoint.stage, checkpoint.last_error), ('pending', 'Aucun document juridique détecté'))
+
+    def test_interrupted_analysis_survives_a_database_error(self):
+        with mock.patch('analyzer.views.AnalysisPipeline.run', side_effect=DeadlineExceeded("délai dépassé")), \
+                mock.patch('analyzer.views.save_analysis', side_effect=RuntimeError("base indisponible")):
+            response = self.client.post('/api/analyze/', {'url': self.base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.json()['error'], 'base indisponible')
+
+    def test_resume_command_completes_interrupted_analyses(self):
+        self.analyze(side_effect=LLMAnalysisError("service indisponible"))
+
+        output = io.StringIO()
+        with self.settings(PARSER_PROCESSES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', return_value={'summary': 'Résumé'}):
+            call_command('resume_analyses', idle=0, stdout=output)
+
+        self.assertIn("repris à l'étape fetched", output.getvalue())
+        analysis = WebsiteAnalysis.objects.get(domain=self.domain)
+        self.assertTrue(analysis.is_successful)
+        self.assertEqual(analysis.summary, 'Résumé')
+
+
+class ComparisonTests(TransactionTestCase):
+    """Comparaison de plusieurs sites (analyses manquantes en parallèle)"""
+
+    def setUp(self):
+        cache.clear()
+        page = b'<html><body><main><p>Article 1 : le service collecte vos donn\xc3\xa9es personnelles.</p></main></body></html>'
+        routes = {
+            '/': (200, {'Content-Type': 'text/html'}, b'<a href="/cgu">CGU</a>'),
+            '/cgu': (200, {'Content-Type': 'text/html'}, page),
+        }
+        self.server, self.handler, self.base = start_fixture_server(routes)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        save_analysis('cached.example', 'https://cached.example/', [], summary='Résumé', risk_level='low',
+                      readability_score=8, data_sharing='Aucun partage', retention_period='1 an')
+
+    def compare(self, urls):
+        return self.client.post('/api/compare/', {'urls': urls}, content_type='application/json')
+
+    def test_cached_analyses_are_compared_with_one_query(self):
+        save_analysis('other.example', 'https://other.example/', [], risk_level='high', readability_score=3)
+
+        with self.assertNumQueries(1):
+            response = self.compare(['https://other.example/', 'https://cached.example/', 'https://other.example/cgu'])
+        self.assertEqual(response.status_code, 200)
+
+        sites = response.json()['data']['sites']
+        self.assertEqual([site['domain'] for site in sites], ['other.example', 'cached.example'])
+        self.assertEqual([site['risk_level'] for site in sites], ['high', 'low'])
+        self.assertEqual(sites[1]['retention_period'], '1 an')
+        self.assertEqual({site['status'] for site in sites}, {'cached'})
+
+    def test_missing_analyses_run_concurrently(self):
+        # Les deux analyses manquantes doivent être en cours en même temps
+        barrier = threading.Barrier(2, timeout=5)
+
+        class ConcurrentPipeline:
+            no_documents = False
+
+            def __init__(self, url, deadline):
+                self.url = url
+
+            def run(self):
+                barrier.wait()
+                return WebsiteAnalysis(domain=urlparse(self.url).netloc, url=self.url, risk_level='moderate')
+
+        with self.settings(COMPARE_WORKERS=4), mock.patch('analyzer.views.AnalysisPipeline', ConcurrentPipeline):
+            response = self.compare(['https://cached.example/', 'https://a.example/', 'https://b.example/'])
+
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual([site['status'] for site in data['data']['sites']], ['cached', 'analysed', 'analysed'])
+        self.assertEqual([site['risk_level'] for site in data['data']['sites']], ['low', 'moderate', 'moderate'])
+
+    def test_failed_sites_keep_their_place_in_the_comparison(self):
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_LLM_RETRIES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents',
+                           side_effect=LLMAnalysisError("service indisponible")):
+            response = self.compare([self.base + '/', 'https://cached.example/'])
+
+        data = response.json()
+        self.assertFalse(data['success'])
+        failed, cached = data['data']['sites']
+        self.assertEqual((failed['status'], failed['error'], failed['risk_level']), ('error', 'service indisponible', None))
+        self.assertEqual(set(failed), set(cached))
+        self.assertEqual(cached['status'], 'cached')
+
+    def test_at_least_two_sites_are_required(self):
+        response = self.compare(['https://cached.example/', 'https://cached.example/cgu'])
+        self.assertEqual(response.status_code, 400)
+
+
+class StatsTests(TestCase):
+    """Agrégats précalculés et classements de /api/stats/"""
+
+    def setUp(self):
+        for domain, risk_level, readability_score in [('a.example', 'high', 2), ('b.example', 'low', 9)]:
+            WebsiteAnalysis.objects.create(domain=domain, url=f'https://{domain}/', summary='Résumé',
+                                           risk_level=risk_level, readability_score=readability_score)
+
+    def test_stats_are_bootstrapped_from_existing_analyses(self):
+        stats = get_stats()
+        self.assertEqual(stats['analyses'], {'successful': 2, 'failed': 0})
+        self.assertEqual(stats['risk_distribution'], {'low': 1, 'moderate': 0, 'high': 1})
+        self.assertEqual(stats['readability']['average'], 5.5)
+        self.assertEqual([entry['domain'] for entry in stats['leaderboards']['worst']], ['a.example', 'b.example'])
+
+    def test_incremental_updates_match_a_full_refresh(self):
+        get_stats()
+        save_analysis('c.example', 'https://c.example/', [], risk_level='high', readability_score=1)
+        save_analysis('b.example', 'https://b.example/', [], risk_level='moderate', readability_score=6)
+        save_analysis('d.example', 'https://d.example/', [], is_successful=False, error_message='Erreur')
+        # Échec d'une nouvelle analyse : la précédente, réussie, reste comptée
+        save_analysis('a.example', 'https://a.example/', [], is_successful=False, error_message='Erreur')
+
+        incremental = get_stats()
+        self.assertEqual(incremental['analyses'], {'successful': 3, 'failed': 1})
+        self.assertEqual(incremental['readability']['distribution'], {'1': 1, '2': 1, '6': 1})
+        self.assertEqual([entry['domain'] for entry in incremental['leaderboards']['worst']],
+                         ['c.example', 'a.example', 'b.example'])
+
+        refresh_stats()
+        refreshed = get_stats()
+        for section in ('analyses', 'risk_distribution', 'readability', 'leaderboards'):
+            self.assertEqual(incremental[section], refreshed[section])
+
+    def test_endpoint_cost_does_not_depend_on_stored_analyses(self):
+        get_stats()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stats/')
+        self.assertEqual(response.json()['data']['risk_distribution']['high'], 1)
+
+
+class ExportTests(TestCase):
+    """Export en flux des analyses et de leurs documents"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        for n in range(3):
+            save_analysis(f'site-{n}.example', f'https://site-{n}.example/', [{
+                'type': 'terms', 'url': f'https://site-{n}.example/cgu', 'title': 'CGU', 'content': 'Article 1 ' * 50,
+            }], summary=f'Résumé {n}', key_points=['Collecte limitée'], risk_level='low')
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+
+    def test_ndjson_export_is_streamed_with_documents(self):
+        response = self.client.get('/api/export/', {'gzip': '1', 'fields': 'domain,key_points,documents.url'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+
+        records = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([record['domain'] for record in records], ['site-0.example', 'site-1.example', 'site-2.example'])
+        self.assertEqual(records[0], {
+            'domain': 'site-0.example',
+            'key_points': ['Collecte limitée'],
+            'documents': [{'url': 'https://site-0.example/cgu'}],
+        })
+
+    def test_csv_export_with_field_selection(self):
+        response = self.client.get('/api/export/', {'format': 'csv', 'fields': 'domain,risk_level,summary'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['domain', 'risk_level', 'summary'])
+        self.assertEqual(rows[1], ['site-0.example', 'low', 'Résumé 0'])
+        self.assertEqual(len(rows), 4)
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get('/api/export/', {'fields': 'domain,password'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/export/', {'format': 'xml'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/export/').status_code, 403)
+
+    def test_export_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'analyses.ndjson')
+            call_command('export_analyses', output=path, chunk_size=2, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2]['documents'][0]['content_length'], 500)
+
+
+class ImportTests(TestCase):
+    """Import d'un export NDJSON (démarrage d'un environnement)"""
+
+    def setUp(self):
+        self.documents = [{'type': 'privacy', 'url': 'https://site.example/privacy', 'title': 'Confidentialité',
+                           'content': 'Vos données sont conservées un an.'}]
+        save_analysis('site.example', 'https://site.example/', self.documents, summary='Résumé', risk_level='low')
+
+    def record(self, content, created_at, summary='Nouveau résumé'):
+        return json.dumps({
+            'domain': 'site.example', 'summary': summary, 'risk_level': 'high', 'created_at': created_at,
+            'documents': [{'document_type': 'privacy', 'url': 'https://site.example/privacy', 'content': content}],
+        })
+
+    def test_export_can_be_imported_into_an_empty_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'analyses.ndjson.gz')
+            call_command('export_analyses', output=path, gzip=True, stdout=io.StringIO())
+            WebsiteAnalysis.objects.all().delete()
+
+            output = io.StringIO()
+            call_command('import_analyses', path, stdout=output)
+
+        self.assertIn('1 créée(s)', output.getvalue())
+        self.assertIn('lignes/s', output.getvalue())
+        analysis = WebsiteAnalysis.objects.get(domain='site.example')
+        self.assertEqual((analysis.summary, analysis.risk_level), ('Résumé', 'low'))
+        self.assertEqual(analysis.content_hash, WebsiteAnalysis.hash_documents(self.documents))
+        document = analysis.documents.get()
+        self.assertEqual(document.content_length, len(self.documents[0]['content']))
+        self.assertEqual(get_stats()['risk_distribution']['low'], 1)
+
+    def test_conflicts_are_resolved_by_content_hash_and_date(self):
+        same = self.record(self.documents[0]['content'], '2999-01-01T00:00:00+00:00')
+        older = self.record('Nouveau contenu', '2000-01-01T00:00:00+00:00')
+        self.assertEqual(import_analyses([same])['unchanged'], 1)
+        self.assertEqual(import_analyses([older])['skipped'], 1)
+        self.assertEqual(WebsiteAnalysis.objects.get(domain='site.example').summary, 'Résumé')
+
+        report = import_analyses([older, 'pas du json'], on_conflict='replace')
+        self.assertEqual((report['updated'], report['invalid']), (1, 1))
+        analysis = WebsiteAnalysis.objects.get(domain='site.example')
+        self.assertEqual((analysis.summary, analysis.risk_level), ('Nouveau résumé', 'high'))
+        self.assertEqual(list(analysis.documents.values_list('content', flat=True)), ['Nouveau contenu'])
+
+
+    def test_malformed_records_are_counted_as_invalid(self):
+        valid = json.dumps({'domain': 'other.example', 'summary': 'Résumé'})
+        malformed = [json.dumps({'domain': 42}), json.dumps({'domain': ['a.example']}),
+                     json.dumps({'domain': 'b.example', 'documents': ['https://b.example/cgu']})]
+
+        report = import_analyses([*malformed, valid])
+        self.assertEqual((report['created'], report['invalid']), (1, 3))
+        self.assertTrue(WebsiteAnalysis.objects.filter(domain='other.example').exists())
+
+class LLMRouterTests(SimpleTestCase):
+    """Choix du fournisseur LLM selon la latence, requêtes dupliquées et bascule"""
+
+    def setUp(self):
+        self.fast = MockLLMServer(ttft=0.05, completion_tokens=10).start()
+        self.slow = MockLLMServer(ttft=1.5, completion_tokens=10).start()
+        self.addCleanup(self.fast.stop)
+        self.addCleanup(self.slow.stop)
+
+    def provider(self, name, base_url):
+        return Provider(name, base_url, 'test', 'mock')
+
+    def complete(self, router):
+        return router.complete(timeout=5, messages=[{'role': 'user', 'content': 'Analyse'}])
+
+    def test_fastest_provider_is_preferred_once_measured(self):
+        slow, fast = self.provider('slow', self.slow.base_url), self.provider('fast', self.fast.base_url)
+        slow.record_success(1.5)
+        router = LLMRouter([slow, fast], hedge=False)
+
+        self.assertEqual([provider.name for provider in router.ranked()], ['fast', 'slow'])
+        self.complete(router)
+        self.complete(router)
+        self.assertEqual((self.fast.requests, self.slow.requests), (2, 0))
+        self.assertEqual(router.ranked()[0].name, 'fast')
+        self.assertLess(fast.latency, slow.latency)
+
+    def test_slow_primary_is_hedged_to_the_next_provider(self):
+        slow, fast = self.provider('slow', self.slow.base_url), self.provider('fast', self.fast.base_url)
+        fast.record_success(3.0)  # classé second malgré sa rapidité réelle
+        router = LLMRouter([slow, fast], hedge_delay=0.2)
+
+        start = time.monotonic()
+        response, provider = self.complete(router)
+
+        self.assertEqual(provider.name, 'fast')
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual((self.slow.requests, self.fast.requests), (1, 1))
+        self.assertIn('```json', response.choices[0].message.content)
+
+    def test_failing_provider_fails_over_and_is_put_aside(self):
+        unreachable = self.provider('down', 'http://127.0.0.1:9/v1')
+        fast = self.provider('fast', self.fast.base_url)
+        router = LLMRouter([unreachable, fast], hedge=False, failure_threshold=1, cooldown=60)
+
+        _, provider = self.complete(router)
+        self.assertEqual(provider.name, 'fast')
+        self.assertFalse(unreachable.healthy)
+        self.assertEqual([provider.name for provider in router.ranked()], ['fast'])
+
+        with self.settings(LLM_PROVIDERS=[], LLM_API_BASE='http://127.0.0.1:9/v1'):
+            with self.assertRaises(LLMRouterError):
+                get_router().complete(timeout=2, messages=[{'role': 'user', 'content': 'Analyse'}])
+
+
+    def test_rotated_api_key_gets_a_new_client_and_keeps_the_stats(self):
+        def providers(api_key):
+            return [{'name': 'fast', 'base_url': self.fast.base_url, 'api_key': api_key, 'model': 'test'}]
+
+        with self.settings(LLM_PROVIDERS=providers('ancienne-clé')):
+            previous = get_router().providers[0]
+            previous.record_success(0.5)
+            self.assertIs(get_router().providers[0], previous)
+
+        with self.settings(LLM_PROVIDERS=providers('nouvelle-clé')):
+            provider = get_router().providers[0]
+            self.assertIsNot(provider, previous)
+            self.assertEqual(provider.api_key, 'nouvelle-clé')
+            self.assertEqual(provider.client.api_key, 'nouvelle-clé')
+            self.assertEqual(provider.latency, 0.5)
+
+class TypedAnalysisTests(TestCase):
+    """Analyse parallèle par type de document, fusion et cache par type"""
+
+    SECTIONS = {
+        "Conditions d'utilisation": {
+            'summary': 'Conditions.', 'what_you_accept': 'Arbitrage obligatoire',
+            'critical_points': 'Résiliation sans préavis', 'key_points': ['Arbitrage', 'Résiliation'],
+            'readability_score': 4, 'risk_level': 'high', 'risk_explanation': 'Arbitrage imposé',
+        },
+        'Politique de confidentialité': {
+            'summary': 'Données.', 'data_collected': 'Email', 'data_usage': 'Publicité',
+            'data_sharing': 'Partenaires', 'retention_period': 'Un an', 'critical_points': 'Revente',
+            'key_points': ['Publicité', 'Arbitrage'], 'readability_score': 8, 'risk_level': 'moderate',
+            'risk_explanation': 'Partage',
+        },
+        'Politique de cookies': {
+            'summary': 'Traceurs.', 'data_collected': 'Identifiants de traceurs', 'retention_period': '13 mois',
+            'critical_points': 'Information non disponible', 'key_points': ['Traceurs'],
+            'readability_score': 6, 'risk_level': 'low', 'risk_explanation': 'Standard',
+        },
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.documents = [
+            {'type': 'terms', 'url': 'https://site.example/terms', 'title': 'CGU', 'content': 'Conditions générales.'},
+            {'type': 'privacy', 'url': 'https://site.example/privacy', 'title': 'Confidentialité',
+             'content': 'Nous collectons votre email.'},
+            {'type': 'cookies', 'url': 'https://site.example/cookies', 'title': 'Cookies',
+             'content': 'Nous déposons des traceurs.'},
+        ]
+        self.prompts = []
+
+    def fake_completion(self, prompt, domain, deadline=None, prompt_tokens=0):
+        self.prompts.append(prompt)
+        time.sleep(0.3)
+        label = next(label for label in self.SECTIONS if f'({label})' in prompt)
+        return json.dumps(self.SECTIONS[label])
+
+    def analyse(self, **kwargs):
+        with mock.patch('analyzer.typed_analysis.request_completion', side_effect=self.fake_completion):
+            return analyze_by_document_type(self.documents, 'site.example', **kwargs)
+
+    def test_types_are_analysed_in_parallel_and_merged(self):
+        start = time.monotonic()
+        result = self.analyse()
+
+        self.assertEqual(len(self.prompts), 3)
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(set(result), set(ANALYSIS_SCHEMA))
+        self.assertEqual(result['what_you_accept'], 'Arbitrage obligatoire')
+        self.assertEqual((result['data_collected'], result['retention_period']), ('Email', 'Un an'))
+        self.assertEqual(result['key_points'], ['Arbitrage', 'Publicité', 'Traceurs', 'Résiliation'])
+        self.assertEqual((result['risk_level'], result['risk_explanation']), ('high', 'Arbitrage imposé'))
+        self.assertEqual(result['readability_score'], 6)
+        self.assertTrue(result['critical_points'].startswith("Conditions d'utilisation : Résiliation"))
+        self.assertNotIn('Information non disponible', result['critical_points'])
+
+    def test_merge_does_not_depend_on_completion_order(self):
+        sections = {
+            document_type: validate_analysis(self.SECTIONS[label], section_fields(document_type))
+            for document_type, label in (('cookies', 'Politique de cookies'), ('terms', "Conditions d'utilisation"))
+        }
+        self.assertEqual(merge_sections(sections), merge_sections(dict(reversed(list(sections.items())))))
+        self.assertEqual(merge_sections(sections)['what_you_accept'], 'Arbitrage obligatoire')
+        self.assertEqual(merge_sections(sections)['data_usage'], ANALYSIS_SCHEMA['data_usage'])
+
+    def test_only_changed_types_are_analysed_again(self):
+        first = self.analyse()
+        self.documents[2]['content'] = 'Nous déposons davantage de traceurs.'
+        self.prompts.clear()
+
+        self.assertEqual(self.analyse(), first)
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn('(Politique de cookies)', self.prompts[0])
+
+    def test_section_results_are_shared_through_the_database(self):
+        first = self.analyse()
+        self.assertEqual(SectionAnalysis.objects.count(), 3)
+        # Autre worker, ou redémarrage : cache du processus vide
+        cache.clear()
+        self.prompts.clear()
+
+        self.assertEqual(self.analyse(), first)
+        self.assertEqual(self.prompts, [])
+
+        SectionAnalysis.objects.filter(document_type='terms').update(expires_at=timezone.now())
+        self.analyse()
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn("(Conditions d'utilisation)", self.prompts[0])
+
+    def test_failed_type_is_retried_without_the_cached_ones(self):
+        def flaky(prompt, *args, **kwargs):
+            if '(Politique de cookies)' in prompt:
+                raise ConnectionError('fournisseur indisponible')
+            return self.fake_completion(prompt, *args, **kwargs)
+
+        with mock.patch('analyzer.typed_analysis.request_completion', side_effect=flaky):
+            with self.assertRaises(LLMAnalysisError):
+                analyze_by_document_type(self.documents, 'site.example', raise_errors=True)
+            partial = analyze_by_document_type(self.documents, 'site.example')
+        self.assertEqual(partial['data_collected'], 'Email')
+
+        self.prompts.clear()
+        self.analyse(raise_errors=True)
+        self.assertEqual(len(self.prompts), 1)
+
+
+class LanguageTests(TestCase):
+    """Détection de la langue : patterns, URLs communes et prompt de chaque langue"""
+
+    GERMAN = "Wir verarbeiten Ihre Daten nur für die Zwecke, die in dieser Erklärung beschrieben sind, und geben sie nicht an Dritte weiter."
+
+    def setUp(self):
+        cache.clear()
+        self.routes = {}
+        self.server, self.handler, self.base = start_fixture_server(self.routes)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_text_is_preferred_to_the_declared_language(self):
+        self.assertEqual(detect_language(self.GERMAN, 'en'), 'de')
+        self.assertEqual(detect_language("Utilizamos sus datos para mejorar el servicio y no los compartimos con terceros."), 'es')
+        self.assertEqual(detect_language("Utilizziamo i tuoi dati per migliorare il servizio e non li condividiamo con terzi."), 'it')
+        self.assertEqual(detect_language('Accueil Boutique Contact', 'de'), 'de')
+        self.assertIsNone(detect_language('Accueil Boutique Contact'))
+        self.assertEqual(detect_page_language(b'<html lang="it-IT"><body><a href="/">Home</a></body></html>'), 'it')
+
+    def test_german_links_are_found_on_the_first_pass(self):
+        self.routes['/'] = (200, {}, (
+            f'<html lang="de"><body><p>{self.GERMAN}</p>'
+            '<a href="/rechtliches/agb">AGB</a><a href="/datenschutzerklaerung">Datenschutz</a>'
+            '<a href="/impressum">Impressum</a></body></html>'
+        ).encode())
+        extractor = DocumentExtractor()
+        documents = {doc['type']: doc['url'] for doc in extractor.find_legal_document_urls(self.base + '/')}
+
+        self.assertEqual(extractor.language, 'de')
+        self.assertEqual(documents, {
+            'terms': f'{self.base}/rechtliches/agb',
+            'privacy': f'{self.base}/datenschutzerklaerung',
+            'legal': f'{self.base}/impressum',
+        })
+        self.assertFalse([hit for hit in self.handler.hits if hit in ('/terms', '/privacy', '/cgu')])
+
+    def test_common_urls_of_the_site_language_are_probed_first(self):
+        self.routes['/'] = (200, {}, f'<html lang="de"><body><p>{self.GERMAN}</p></body></html>'.encode())
+        self.routes['/agb'] = (200, {}, b'AGB')
+        self.routes['/datenschutz'] = (200, {}, b'Datenschutz')
+        extractor = DocumentExtractor()
+        documents = {doc['type']: doc['url'] for doc in extractor.find_legal_document_urls(self.base + '/')}
+
+        self.assertEqual(documents, {'terms': f'{self.base}/agb', 'privacy': f'{self.base}/datenschutz'})
+        probes = [hit for hit in self.handler.hits if hit not in ('/', '/robots.txt', '/sitemap.xml')]
+        self.assertEqual(probes[:3], ['/agb', '/datenschutz', '/impressum'])
+        for path in ('/terms', '/nutzungsbedingungen', '/privacy-policy', '/cgu'):
+            self.assertNotIn(path, probes)
+
+    def test_prompt_describes_the_documents_language(self):
+        prompts = []
+
+        def completion(prompt, *args, **kwargs):
+            prompts.append(prompt)
+            return json.dumps(VALID_ANALYSIS)
+
+        documents = [{'type': 'privacy', 'title': 'Datenschutz', 'url': 'https://site.example/datenschutz',
+                      'content': self.GERMAN}]
+        with mock.patch('analyzer.llm_utils.request_completion', side_effect=completion):
+            analyze_legal_documents(documents, 'site.example')
+        self.assertIn('rédigés en allemand', prompts[0])
+        self.assertIn('Impressum', prompts[0])
+
+
+class SnapshotTests(TestCase):
+    """Analyses et badges sérialisés à l'écriture, servis avec ETag"""
+
+    def setUp(self):
+        self.documents = [{'type': 'terms', 'url': 'https://site.example/cgu', 'title': 'CGU', 'content': 'Conditions.'}]
+        save_analysis('site.example', 'https://site.example/', self.documents,
+                      summary='Résumé', risk_level='high', readability_score=3)
+
+    def test_badge_is_served_from_precomputed_bytes(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/badge/Site.Example/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content),
+                         {'domain': 'site.example', 'risk_level': 'high', 'readability_score': 3})
+
+        cached = self.client.get('/api/badge/site.example/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+    def test_snapshot_matches_the_analysis_endpoint_and_follows_writes(self):
+        response = self.client.get('/api/snapshot/site.example/')
+        self.assertEqual(json.loads(response.content), self.client.get('/api/analysis/site.example/').json()['data'])
+        etag = response['ETag']
+
+        save_analysis('site.example', 'https://site.example/', self.documents, summary='Nouveau résumé')
+        updated = self.client.get('/api/snapshot/site.example/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(json.loads(updated.content)['summary'], 'Nouveau résumé')
+
+        # Une analyse en échec ne retire pas la dernière analyse réussie
+        save_analysis('site.example', 'https://site.example/', [], is_successful=False)
+        self.assertEqual(json.loads(self.client.get('/api/snapshot/site.example/').content)['summary'], 'Nouveau résumé')
+
+    def test_imported_and_existing_analyses_are_published(self):
+        import_analyses([json.dumps({'domain': 'import.example', 'risk_level': 'low', 'readability_score': 8})])
+        self.assertEqual(json.loads(self.client.get('/api/badge/import.example/').content)['risk_level'], 'low')
+
+        AnalysisSnapshot.objects.all().delete()
+        call_command('rebuild_snapshots', stdout=io.StringIO())
+        self.assertEqual(AnalysisSnapshot.objects.count(), 2)
+
+
+class _ReceiverHandler(BaseHTTPRequestHandler):
+    """Destinataire des notifications : enregistre chaque POST, répond selon `statuses`"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((dict(self.headers), body))
+        status_code = self.statuses.pop(0) if self.statuses else 200
+        self.send_response(status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(WEBHOOK_ALLOW_PRIVATE=True, WEBHOOK_SECRET='', WEBHOOK_RETRY_DELAY=30, WEBHOOK_MAX_ATTEMPTS=3)
+class WebhookTests(TestCase):
+    """Notifications signées de fin d'analyse, regroupées et renvoyées"""
+
+    def setUp(self):
+        self.handler = type('Receiver', (_ReceiverHandler,), {'received': [], 'statuses': []})
+        self.server = _FixtureServer(('127.0.0.1', 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.callback_url = f"http://127.0.0.1:{self.server.server_port}/hooks"
+        self.documents = [{'type': 'terms', 'url': 'https://site.example/cgu', 'title': 'CGU', 'content': 'Conditions.'}]
+
+    def complete(self, domain):
+        analysis, _ = save_analysis(domain, f'https://{domain}/', self.documents, summary='Résumé', risk_level='low')
+        notify_completion(analysis)
+        return analysis
+
+    def test_completions_are_batched_into_one_signed_request(self):
+        register_callback('a.example', self.callback_url, 'clé')
+        register_callback('b.example', self.callback_url, 'clé')
+        register_callback('c.example', self.callback_url, 'clé')
+        self.complete('a.example')
+        self.complete('b.example')
+
+        report = deliver_due()
+        self.assertEqual(report['delivered'], 2)
+        self.assertEqual(len(self.handler.received), 1)
+
+        headers, body = self.handler.received[0]
+        timestamp = int(headers[SIGNATURE_HEADER].split(',')[0][2:])
+        self.assertEqual(headers[SIGNATURE_HEADER], sign('clé', timestamp, body))
+        payload = json.loads(body)
+        self.assertEqual(payload['event'], 'analysis.completed')
+        self.assertEqual([analysis['domain'] for analysis in payload['analyses']], ['a.example', 'b.example'])
+        self.assertEqual(payload['analyses'][0], self.client.get('/api/analysis/a.example/').json()['data'])
+        # Analyse pas encore terminée : rien à envoyer
+        self.assertEqual(WebhookDelivery.objects.get(domain='c.example').status, 'waiting')
+
+    def test_failed_deliveries_are_retried_with_backoff(self):
+        self.handler.statuses[:] = [503, 500, 503]
+        delivery = register_callback('site.example', self.callback_url, 'clé')
+        self.complete('site.example')
+
+        self.assertEqual(deliver_due()['retried'], 1)
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_error), ('pending', 1, 'HTTP 503'))
+        # Pas de nouvelle tentative avant le délai
+        self.assertEqual(sum(deliver_due().values()), 0)
+
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        deliver_due()
+        delivery.refresh_from_db()
+        self.assertAlmostEqual((delivery.next_attempt_at - delivery.updated_at).total_seconds(), 60, delta=1)
+
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_due()['failed'], 1)
+        self.assertEqual(WebhookDelivery.objects.get().status, 'failed')
+        self.assertEqual(len(self.handler.received), 3)
+
+    def test_callback_registered_on_analyze_survives_an_interrupted_analysis(self):
+        page = b'<html><body><main><p>Article 1 : le service collecte vos donn\xc3\xa9es personnelles.</p></main></body></html>'
+        site, _, base = start_fixture_server({
+            '/': (200, {'Content-Type': 'text/html'}, b'<a href="/cgu">CGU</a>'),
+            '/cgu': (200, {'Content-Type': 'text/html'}, page),
+        })
+        self.addCleanup(site.server_close)
+        self.addCleanup(site.shutdown)
+        cache.clear()
+        request = {'url': base + '/', 'callback_url': self.callback_url, 'callback_secret': 'clé'}
+
+        with self.settings(PARSER_PROCESSES=0, ANALYSIS_LLM_RETRIES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents',
+                           side_effect=LLMAnalysisError("service indisponible")):
+            response = self.client.post('/api/analyze/', request, content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(WebhookDelivery.objects.get().status, 'waiting')
+
+        with self.settings(PARSER_PROCESSES=0), \
+                mock.patch('analyzer.analysis_pipeline.analyze_legal_documents', return_value={'summary': 'Résumé'}):
+            response = self.client.post('/api/analyze/', {'url': base + '/'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('callback', response.json())
+
+        deliver_due()
+        self.assertEqual(json.loads(self.handler.received[0][1])['analyses'][0]['summary'], 'Résumé')
+        self.assertEqual(WebhookDelivery.objects.get().status, 'delivered')
+
+    def test_callback_requires_a_secret_and_a_public_address(self):
+        response = self.client.post('/api/analyze/', {'url': 'https://site.example/', 'callback_url': self.callback_url},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('callback_secret', response.json()['errors'])
+
+        with self.settings(WEBHOOK_ALLOW_PRIVATE=False):
+            response = self.client.post('/api/analyze/', {
+                'url': 'https://site.example/', 'callback_url': self.callback_url, 'callback_secret': 'clé',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('callback_url', response.json()['errors'])
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+
+    def test_delivery_does_not_depend_on_the_scraper_session(self):
+        import httpx
+
+        register_callback('site.example', self.callback_url, 'clé')
+        self.complete('site.example')
+        # Session HTTP/2 du scraper (httpx) : sans post(), ignorée par les notifications
+        self.addCleanup(reset_session)
+        reset_session()
+        with self.settings(SCRAPER_HTTP2=True), \
+                mock.patch('analyzer.http_transport.build_session', return_value=HttpxSession(httpx.Client())):
+            self.assertIsInstance(get_session(), HttpxSession)
+            self.assertEqual(deliver_due()['delivered'], 1)
+        self.assertEqual(len(self.handler.received), 1)
+
+    def test_redirects_and_private_addresses_are_refused_when_sending(self):
+        self.handler.statuses[:] = [307]
+        delivery = register_callback('site.example', self.callback_url, 'clé')
+        self.complete('site.example')
+
+        self.assertEqual(deliver_due()['retried'], 1)
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.last_error, 'HTTP 307')
+
+        # Adresse vérifiée à la connexion, pas seulement à l'enregistrement
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        with self.settings(WEBHOOK_ALLOW_PRIVATE=False):
+            self.assertEqual(deliver_due()['retried'], 1)
+        delivery.refresh_from_db()
+        self.assertIn('non autorisée', delivery.last_error)
+        self.assertEqual(len(self.handler.received), 1)
+
+class StartupTests(SimpleTestCase):
+    """Démarrage des workers : imports à la demande, préchauffage, profil d'import"""
+
+    IMPORTTIME = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   pydantic.version\n"
+        "import time:       900 |       1020 | pydantic\n"
+        "import time:       300 |       1320 | openai\n"
+        "Traceback sans rapport\n"
+    )
+
+    def test_import_time_output_is_grouped_by_package(self):
+        entries = parse_import_times(self.IMPORTTIME)
+        self.assertEqual([entry['module'] for entry in entries], ['pydantic.version', 'pydantic', 'openai'])
+        self.assertEqual((entries[0]['depth'], entries[1]['depth']), (1, 0))
+        self.assertEqual(list(summarize_import_times(entries).items()), [('pydantic', 1020), ('openai', 300)])
+
+    def test_application_modules_do_not_import_optional_dependencies(self):
+        code = (
+            "import os, sys; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings'); "
+            "import django; django.setup(); import analyzer.views; "
+            "print(','.join(module for module in ('openai', 'pypdf', 'tensorflow') if module in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, env={**os.environ, 'SECRET_KEY': 'test'})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_warm_up_loads_lazy_modules_and_llm_clients(self):
+        with self.settings(LLM_PROVIDERS=[], LLM_API_BASE='http://127.0.0.1:9/v1', LLM_API_KEY='clé'):
+            timings = warm_up()
+            self.assertEqual(set(timings), {'urls', 'modules', 'parser', 'llm'})
+            self.assertIsNotNone(get_router().providers[0]._client)
+        self.assertIn('openai', sys.modules)
+
+    def test_startup_profile_command_reports_packages(self):
+        output = io.StringIO()
+        call_command('startup_profile', module='analyzer.views', top=3, no_warm_up=True, stdout=output)
+        self.assertIn('module(s) importé(s)', output.getvalue())
+        self.assertIn('django', output.getvalue())
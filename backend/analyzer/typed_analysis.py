@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .deadline import Deadline, DeadlineExceeded
+from .json_extractor import ANALYSIS_SCHEMA, RISK_LEVELS, extract_json, validate_analysis
+from .languages import documents_language, prompt_language_note
+from .llm_utils import LLMAnalysisError, error_analysis, request_completion
+from .metrics import CACHE_REQUESTS, FALLBACKS, bind_trace, span
+from .models import LegalDocument, SectionAnalysis
+from .prompt_budget import DOCUMENT_PRIORITIES, build_prompt_content
+
+logger = logging.getLogger(__name__)
+
+
+# Ordre de fusion des types de documents (ordre de LegalDocument.DOCUMENT_TYPES)
+TYPE_ORDER = [document_type for document_type, _ in LegalDocument.DOCUMENT_TYPES]
+TYPE_LABELS = dict(LegalDocument.DOCUMENT_TYPES)
+
+# Champs demandés à tous les types, fusionnés entre eux
+COMMON_FIELDS = ('summary', 'key_points', 'readability_score', 'risk_level', 'risk_explanation')
+
+# Types de documents sources de chaque champ, par ordre de préférence :
+# le premier type qui renseigne le champ l'emporte
+FIELD_SOURCES = {
+    'what_you_accept': ('terms', 'legal', 'other'),
+    'data_collected': ('privacy', 'cookies'),
+    'data_usage': ('privacy', 'cookies'),
+    'data_sharing': ('privacy', 'cookies'),
+    'retention_period': ('privacy', 'cookies'),
+}
+
+# Consigne de chaque champ dans le prompt
+FIELD_INSTRUCTIONS = {
+    'summary': "Résumé du document en langage clair et accessible (80-150 mots)",
+    'what_you_accept': "Explication claire de ce que l'utilisateur accepte en utilisant le service",
+    'data_collected': "Types de données collectées par le service",
+    'data_usage': "Comment les données sont utilisées",
+    'data_sharing': "Avec qui les données sont partagées",
+    'retention_period': "Durée de conservation des données",
+    'critical_points': "Points critiques et préoccupants pour l'utilisateur",
+    'key_points': ["Point important 1", "Point important 2", "Point important 3"],
+    'readability_score': 7,
+    'risk_level': "moderate",
+    'risk_explanation': "Explication du niveau de risque attribué",
+}
+
+MAX_KEY_POINTS = 8
+
+
+def section_fields(document_type: str) -> List[str]:
+    """Champs demandés pour un type de document"""
+    fields = [field for field, sources in FIELD_SOURCES.items() if document_type in sources]
+    return ['summary'] + fields + ['critical_points'] + [field for field in COMMON_FIELDS if field != 'summary']
+
+
+def _section_prompt(document_type: str, domain: str, content: str, fields: List[str],
+                    language: Optional[str] = None) -> str:
+    structure = json.dumps({field: FIELD_INSTRUCTIONS[field] for field in fields}, ensure_ascii=False, indent=4)
+    return f"""
+Analysez le document suivant ({TYPE_LABELS.get(document_type, 'Autre')}) du site web "{domain}" et fournissez une analyse structurée en français.
+{prompt_language_note(language)}
+DOCUMENT À ANALYSER:
+{content}
+
+Veuillez fournir votre réponse au format JSON avec la structure suivante:
+
+{structure}
+
+INSTRUCTIONS:
+- Utilisez un langage simple et accessible
+- Le score de lisibilité va de 1 (très difficile) à 10 (très facile)
+- Le niveau de risque peut être: "low", "moderate", ou "high"
+- Identifiez les clauses problématiques ou inhabituelles
+- Tenez-vous-en au contenu de ce document
+- Fournissez directement la réponse en JSON sans explication supplémentaire
+"""
+
+
+def _prompt_hash(prompt: str) -> str:
+    # Le prompt contient le domaine, le contenu (après budget) et les consignes :
+    # toute modification de l'un d'eux change l'empreinte
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _section_request(document_type: str, documents: List[Dict], domain: str) -> Dict:
+    """Champs, prompt et nombre de tokens de l'analyse des documents d'un type"""
+    fields = section_fields(document_type)
+    content, budget_report = build_prompt_content(documents)
+    prompt = _section_prompt(document_type, domain, content, fields, documents_language(documents))
+    return {'fields': fields, 'prompt': prompt, 'tokens': budget_report['tokens_after']}
+
+
+def _analyse_section(document_type: str, request: Dict, domain: str, deadline: Optional[Deadline]) -> Dict:
+    """
+    Analyse des documents d'un type (thread du pool, sans accès à la base)
+
+    Raises:
+        DeadlineExceeded: Budget épuisé
+        LLMAnalysisError: Erreur du fournisseur ou réponse inexploitable
+    """
+    try:
+        raw_content = request_completion(request['prompt'], domain, deadline, request['tokens'])
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"délai dépassé pendant l'analyse LLM: {str(e)}") from e
+        raise LLMAnalysisError(f"{document_type}: {str(e)}") from e
+
+    try:
+        return validate_analysis(extract_json(raw_content), request['fields'])
+    except ValueError as e:
+        FALLBACKS.inc(kind='json_parse')
+        logger.error(f"Erreur de parsing JSON ({document_type}): {raw_content}")
+        raise LLMAnalysisError(f"{document_type}: réponse LLM inexploitable: {str(e)}") from e
+
+
+def _is_set(field: str, value) -> bool:
+    return value != ANALYSIS_SCHEMA[field]
+
+
+def merge_sections(sections: Dict[str, Dict]) -> Dict:
+    """
+    Fusionne les analyses par type de document en une analyse complète
+
+    Déterministe : ne dépend que des résultats, jamais de l'ordre dans
+    lequel ils sont arrivés.
+    - champs spécifiques : premier type source qui les renseigne (FIELD_SOURCES)
+    - résumé et points critiques : ceux de chaque type, dans l'ordre des types
+    - points clés : un point de chaque type à tour de rôle, sans doublon
+    - lisibilité : moyenne pondérée par la priorité des types
+    - risque : le plus élevé (et son explication)
+    """
+    ordered = [(document_type, sections[document_type]) for document_type in TYPE_ORDER
+               if document_type in sections]
+    result = {}
+
+    for field, sources in FIELD_SOURCES.items():
+        result[field] = next(
+            (sections[source][field] for source in sources
+             if source in sections and _is_set(field, sections[source].get(field, ANALYSIS_SCHEMA[field]))),
+            ANALYSIS_SCHEMA[field]
+        )
+
+    for field in ('summary', 'critical_points'):
+        parts = [(document_type, section[field]) for document_type, section in ordered
+                 if _is_set(field, section[field])]
+        if len(parts) == 1:
+            result[field] = parts[0][1]
+        elif parts:
+            result[field] = '\n\n'.join(f"{TYPE_LABELS[document_type]} : {text}" for document_type, text in parts)
+        else:
+            result[field] = ANALYSIS_SCHEMA[field]
+
+    key_points = []
+    for rank in range(max(len(section['key_points']) for _, section in ordered)):
+        for _, section in ordered:
+            if rank < len(section['key_points']) and section['key_points'][rank] not in key_points:
+                key_points.append(section['key_points'][rank])
+    result['key_points'] = key_points[:MAX_KEY_POINTS]
+
+    weights = [DOCUMENT_PRIORITIES.get(document_type, 1) for document_type, _ in ordered]
+    score = sum(weight * section['readability_score'] for weight, (_, section) in zip(weights, ordered))
+    result['readability_score'] = int(score / sum(weights) + 0.5)
+
+    riskiest = max(ordered, key=lambda item: RISK_LEVELS.index(item[1]['risk_level']))[1]
+    result['risk_level'] = riskiest['risk_level']
+    result['risk_explanation'] = riskiest['risk_explanation']
+
+    return {field: result[field] for field in ANALYSIS_SCHEMA}
+
+
+def analyze_by_document_type(documents_content, domain, deadline=None, raise_errors=False):
+    """
+    Analyse chaque type de document en parallèle avec un prompt dédié
+
+    Prompts plus courts, durée de l'analyse égale à celle du type le plus
+    lent, et chaque type est mis en cache séparément : une modification
+    de la seule politique de cookies ne relance pas l'analyse des
+    conditions d'utilisation. Mêmes arguments et même résultat
+    qu'analyze_legal_documents.
+
+    Raises:
+        DeadlineExceeded: Budget épuisé avant les réponses du modèle
+        LLMAnalysisError: Échec d'un des types, si `raise_errors` (les
+            types réussis restent en cache pour la tentative suivante)
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for document in documents_content:
+        document_type = document.get('type') if document.get('type') in TYPE_LABELS else 'other'
+        groups.setdefault(document_type, []).append(document)
+    if not groups:
+        return _failed(LLMAnalysisError("aucun document à analyser"), raise_errors)
+
+    # Résultats en base (SectionAnalysis), partagés par les workers : seuls
+    # les types dont le prompt a changé sont analysés à nouveau
+    section_requests = {
+        document_type: _section_request(document_type, documents, domain)
+        for document_type, documents in groups.items()
+    }
+    hashes = {
+        document_type: _prompt_hash(request['prompt']) for document_type, request in section_requests.items()
+    }
+    cached = SectionAnalysis.lookup(hashes.values())
+    sections = {}
+    for document_type, prompt_hash in hashes.items():
+        hit = prompt_hash in cached
+        CACHE_REQUESTS.inc(cache='llm_section', result='hit' if hit else 'miss')
+        if hit:
+            sections[document_type] = cached[prompt_hash]
+
+    futures = {}
+    missing = [document_type for document_type in section_requests if document_type not in sections]
+    if missing:
+        with span('llm'):
+            executor = ThreadPoolExecutor(max_workers=len(missing), thread_name_prefix='llm-section')
+            futures = {
+                document_type: executor.submit(
+                    bind_trace(_analyse_section), document_type, section_requests[document_type], domain, deadline)
+                for document_type in missing
+            }
+            executor.shutdown(wait=True)
+
+    errors, timeout = [], None
+    for document_type, future in futures.items():
+        try:
+            sections[document_type] = future.result()
+        except DeadlineExceeded as e:
+            timeout = e
+            continue
+        except LLMAnalysisError as e:
+            errors.append(e)
+            continue
+        SectionAnalysis.store(hashes[document_type], domain, document_type, sections[document_type],
+                              settings.LLM_SECTION_CACHE_TTL)
+    if timeout is not None:
+        # Types déjà analysés conservés pour la reprise
+        raise timeout
+
+    if errors:
+        FALLBACKS.inc(kind='llm_error')
+        logger.error(f"Erreur lors de l'analyse LLM de {domain}: {'; '.join(str(e) for e in errors)}")
+        if raise_errors or not sections:
+            return _failed(errors[0], raise_errors)
+
+    logger.info(f"Analyse LLM de {domain}: {len(sections)} type(s) de document ({', '.join(sorted(sections))})")
+    return merge_sections(sections)
+
+
+def _failed(error: Exception, raise_errors: bool) -> Dict:
+    if raise_errors:
+        raise error
+    return error_analysis(error)
@@ -7,12 +7,28 @@ urlpatterns = [
     # Endpoint principal d'analyse
     path('analyze/', views.analyze_website, name='analyze_website'),
     
+    # Comparer plusieurs sites
+    path('compare/', views.compare_websites, name='compare_websites'),
+    
     # Récupérer une analyse existante
     path('analysis/<str:domain>/', views.get_analysis, name='get_analysis'),
     
+    # Analyse publiée et badge (réponses précalculées)
+    path('snapshot/<str:domain>/', views.snapshot, name='snapshot'),
+    path('badge/<str:domain>/', views.badge, name='badge'),
+    
     # Lister toutes les analyses
     path('analyses/', views.list_analyses, name='list_analyses'),
     
+    # Export des analyses (NDJSON/CSV)
+    path('export/', views.export_analyses, name='export_analyses'),
+    
+    # Statistiques agrégées
+    path('stats/', views.stats, name='stats'),
+    
+    # Métriques (format Prometheus)
+    path('metrics/', views.metrics, name='metrics'),
+    
     # Health check
     path('health/', views.health_check, name='health_check'),
 ]
@@ -1,32 +1,54 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 import logging
 
-from .models import WebsiteAnalysis, LegalDocument
+from .models import WebsiteAnalysis
 from .serializers import (
     AnalyzeRequestSerializer, 
     AnalyzeResponseSerializer,
+    CompareRequestSerializer,
+    ComparisonSerializer,
     WebsiteAnalysisSerializer
 )
-from .document_extractor import DocumentExtractor
-from .llm_utils import analyze_legal_documents
+from .analysis_pipeline import AnalysisPipeline, save_analysis
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import CACHE_REQUESTS, registry, trace_analysis
+from .exports import FORMATS, export_stream, parse_fields
+from .profiling import profiled
+from .snapshots import etag_matches, get_snapshot
+from .stats import get_stats
+from .webhooks import register_callback, validate_callback_url
 
 logger = logging.getLogger(__name__)
 
 
 @api_view(['POST'])
+@profiled
 def analyze_website(request):
     """
     API endpoint pour analyser un site web
     
     POST /api/analyze/
     {
-        "url": "https://example.com"
+        "url": "https://example.com",
+        "callback_url": "https://client.example/hooks/guardclause",   (optionnel)
+        "callback_secret": "..."                                     (optionnel)
     }
+    
+    Avec `callback_url`, la fin de l'analyse est notifiée par un POST signé
+    (X-GuardClause-Signature), y compris si elle est reprise par une demande
+    ultérieure après une interruption.
+    
+    Profilage (administrateurs) : en-tête `X-Profile: cprofile|sampling`
     """
     
     # Validation des données d'entrée
@@ -39,120 +61,255 @@ def analyze_website(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     url = serializer.validated_data['url']
+    callback_url = serializer.validated_data.get('callback_url')
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': 'Données invalides',
+                'errors': {'callback_url': [str(e)]}
+            }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Extraire le domaine
-        parsed_url = urlparse(url)
-        domain = parsed_url.netloc.lower()
+    # Budget de temps de l'analyse, annulé si le client se déconnecte (ASGI)
+    deadline = Deadline(settings.ANALYSIS_DEADLINE, cancelled=getattr(request, 'disconnected', None))
+    pipeline = None
+    delivery = None
+    
+    with trace_analysis(urlparse(url).netloc.lower()) as trace:
+        try:
+            # Extraire le domaine
+            parsed_url = urlparse(url)
+            domain = parsed_url.netloc.lower()
         
-        # Vérifier si l'analyse existe déjà (moins de 24h)
-        existing_analysis = WebsiteAnalysis.objects.filter(
-            domain=domain,
-            created_at__gte=timezone.now() - timezone.timedelta(hours=24),
-            is_successful=True
-        ).first()
+            # Vérifier si l'analyse existe déjà (moins de 24h)
+            existing_analysis = WebsiteAnalysis.objects.filter(
+                domain=domain,
+                created_at__gte=timezone.now() - timezone.timedelta(hours=24),
+                is_successful=True
+            ).first()
         
-        if existing_analysis:
-            logger.info(f"Analyse existante trouvée pour {domain}")
-            return Response({
-                'success': True,
-                'message': 'Analyse récupérée depuis le cache',
-                'data': WebsiteAnalysisSerializer(existing_analysis).data
-            })
+            CACHE_REQUESTS.inc(cache='analysis', result='hit' if existing_analysis else 'miss')
+            if existing_analysis:
+                trace.outcome = 'cached'
+                logger.info(f"Analyse existante trouvée pour {domain}")
+                return Response({
+                    'success': True,
+                    'message': 'Analyse récupérée depuis le cache',
+                    'data': WebsiteAnalysisSerializer(existing_analysis).data
+                })
         
-        # Nouvelle analyse
-        logger.info(f"Début de l'analyse pour {domain}")
+            # Notification à la fin de l'analyse (celle-ci ou sa reprise)
+            if callback_url:
+                delivery = register_callback(
+                    domain, callback_url, serializer.validated_data.get('callback_secret', ''))
         
-        # Extraire les documents juridiques
-        extractor = DocumentExtractor()
-        documents, extracted_domain = extractor.extract_all_documents(url)
+            # Nouvelle analyse, ou reprise de la précédente à sa dernière étape terminée
+            logger.info(f"Début de l'analyse pour {domain}")
+            pipeline = AnalysisPipeline(url, deadline)
+            analysis = pipeline.run()
         
-        if not documents:
-            # Créer une entrée d'échec
-            analysis = WebsiteAnalysis.objects.create(
-                domain=domain,
-                url=url,
-                summary="Aucun document juridique trouvé sur ce site.",
-                is_successful=False,
-                error_message="Aucun document juridique détecté"
-            )
+            if pipeline.no_documents:
+                trace.outcome = 'no_documents'
+                return Response(_with_callback({
+                    'success': False,
+                    'message': 'Aucun document juridique trouvé sur ce site',
+                    'data': WebsiteAnalysisSerializer(analysis).data
+                }, delivery), status=status.HTTP_404_NOT_FOUND)
             
-            return Response({
-                'success': False,
-                'message': 'Aucun document juridique trouvé sur ce site',
+            trace.outcome = 'success'
+            logger.info(f"Analyse terminée avec succès pour {domain}")
+        
+            return Response(_with_callback({
+                'success': True,
+                'message': 'Analyse terminée avec succès',
                 'data': WebsiteAnalysisSerializer(analysis).data
-            }, status=status.HTTP_404_NOT_FOUND)
+            }, delivery))
         
-        logger.info(f"Documents trouvés: {len(documents)}")
+        except DeadlineExceeded as e:
+            trace.outcome = 'cancelled' if deadline.is_cancelled else 'timeout'
+            documents = pipeline.documents if pipeline else []
+            logger.warning(f"Analyse de {url} interrompue ({str(e)}), {len(documents)} document(s) conservé(s)")
+            
+            # Conserver les documents déjà extraits ; la prochaine demande reprendra l'analyse
+            try:
+                analysis, _ = save_analysis(
+                    domain, url, documents,
+                    summary="Analyse interrompue avant son terme.",
+                    is_successful=False,
+                    error_message=f"Analyse interrompue: {str(e)}"
+                )
+                
+                return Response(_with_callback({
+                    'success': False,
+                    'message': f'Analyse interrompue: {str(e)}',
+                    'data': WebsiteAnalysisSerializer(analysis).data
+                }, delivery), status=status.HTTP_504_GATEWAY_TIMEOUT)
+            
+            except Exception as save_error:
+                logger.error(f"Enregistrement de l'analyse interrompue de {url} impossible: {str(save_error)}")
+                return Response({
+                    'success': False,
+                    'message': f'Analyse interrompue: {str(e)}',
+                    'error': str(save_error)
+                }, status=status.HTTP_504_GATEWAY_TIMEOUT)
         
-        # Analyser avec l'IA
-        ai_analysis = analyze_legal_documents(documents, domain)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse de {url}: {str(e)}")
         
-        # Créer l'analyse en base
-        analysis = WebsiteAnalysis.objects.create(
-            domain=domain,
-            url=url,
-            summary=ai_analysis.get('summary', ''),
-            key_points=ai_analysis.get('key_points', []),
-            what_you_accept=ai_analysis.get('what_you_accept', ''),
-            data_collected=ai_analysis.get('data_collected', ''),
-            data_usage=ai_analysis.get('data_usage', ''),
-            data_sharing=ai_analysis.get('data_sharing', ''),
-            retention_period=ai_analysis.get('retention_period', ''),
-            critical_points=ai_analysis.get('critical_points', ''),
-            readability_score=ai_analysis.get('readability_score', 5),
-            risk_level=ai_analysis.get('risk_level', 'moderate'),
-            documents_found=[{
-                'type': doc['type'],
-                'url': doc['url'],
-                'title': doc['title']
-            } for doc in documents],
+            # Créer une entrée d'erreur
+            try:
+                analysis, _ = save_analysis(
+                    domain, url, pipeline.documents if pipeline else [],
+                    summary=f"Erreur lors de l'analyse: {str(e)}",
+                    is_successful=False,
+                    error_message=str(e)
+                )
+            
+                return Response({
+                    'success': False,
+                    'message': f'Erreur lors de l\'analyse: {str(e)}',
+                    'data': WebsiteAnalysisSerializer(analysis).data
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            except:
+                return Response({
+                    'success': False,
+                    'message': f'Erreur critique lors de l\'analyse: {str(e)}',
+                    'error': str(e)
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _with_callback(payload, delivery):
+    """Ajoute l'état de la notification demandée (callback_url) à la réponse"""
+    if delivery is not None:
+        delivery.refresh_from_db(fields=['status'])
+        payload['callback'] = {'id': delivery.pk, 'status': delivery.status}
+    return payload
+
+
+@api_view(['POST'])
+def compare_websites(request):
+    """
+    API endpoint pour comparer plusieurs sites web
+    
+    POST /api/compare/
+    {
+        "urls": ["https://example.com", "https://example.org"]
+    }
+    
+    Les analyses de moins de 24h sont reprises telles quelles ; les autres
+    sont lancées en parallèle, dans un budget de temps commun.
+    """
+    
+    serializer = CompareRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'message': 'Données invalides',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    urls = serializer.validated_data['urls']
+    domains = {url: urlparse(url).netloc.lower() for url in urls}
+    
+    # Analyses récentes de tous les sites, en une seule requête
+    analyses = {
+        analysis.domain: analysis
+        for analysis in WebsiteAnalysis.objects.filter(
+            domain__in=domains.values(),
+            created_at__gte=timezone.now() - timezone.timedelta(hours=24),
             is_successful=True
+        ).only(*COMPARISON_FIELDS)
+    }
+    cached = set(analyses)
+    for domain in domains.values():
+        CACHE_REQUESTS.inc(cache='analysis', result='hit' if domain in cached else 'miss')
+    
+    # Analyser les sites manquants en parallèle
+    errors = {}
+    missing = [url for url in urls if domains[url] not in analyses]
+    if missing:
+        logger.info(f"Comparaison: {len(missing)} site(s) à analyser sur {len(urls)}")
+        deadline = Deadline(settings.ANALYSIS_DEADLINE, cancelled=getattr(request, 'disconnected', None))
+        executor = ThreadPoolExecutor(
+            max_workers=min(settings.COMPARE_WORKERS, len(missing)),
+            thread_name_prefix='compare'
         )
+        futures = {executor.submit(_compare_analysis, url, deadline): domains[url] for url in missing}
+        done, _ = wait(futures, timeout=deadline.remaining())
+        # Les analyses en retard s'arrêtent d'elles-mêmes à l'expiration du budget
+        executor.shutdown(wait=False, cancel_futures=True)
         
-        # Sauvegarder les documents individuels
-        for doc in documents:
-            LegalDocument.objects.create(
-                analysis=analysis,
-                document_type=doc['type'],
-                url=doc['url'],
-                title=doc['title'],
-                content=doc['content']
-            )
-        
-        logger.info(f"Analyse terminée avec succès pour {domain}")
-        
-        return Response({
-            'success': True,
-            'message': 'Analyse terminée avec succès',
-            'data': WebsiteAnalysisSerializer(analysis).data
-        })
-        
-    except Exception as e:
-        logger.error(f"Erreur lors de l'analyse de {url}: {str(e)}")
-        
-        # Créer une entrée d'erreur
+        for future, domain in futures.items():
+            if future not in done:
+                errors[domain] = ('timeout', "Délai dépassé")
+                continue
+            try:
+                analysis = future.result()
+            except DeadlineExceeded as e:
+                errors[domain] = ('timeout', str(e))
+                continue
+            except Exception as e:
+                errors[domain] = ('error', str(e))
+                continue
+            if analysis.is_successful:
+                analyses[domain] = analysis
+            else:
+                errors[domain] = ('error', analysis.error_message)
+    
+    # Comparaison alignée : mêmes champs pour chaque site, dans l'ordre demandé
+    sites = []
+    for url in urls:
+        domain = domains[url]
+        if domain in analyses:
+            entry = dict(ComparisonSerializer(analyses[domain]).data)
+            entry['status'] = 'cached' if domain in cached else 'analysed'
+            entry['error'] = None
+        else:
+            entry = dict.fromkeys(ComparisonSerializer.Meta.fields)
+            entry.update(domain=domain, url=url)
+            entry['status'], entry['error'] = errors[domain]
+        sites.append(entry)
+    
+    compared = len(urls) - len(errors)
+    return Response({
+        'success': not errors,
+        'message': f'{compared}/{len(urls)} sites comparés',
+        'data': {'sites': sites}
+    })
+
+
+# Colonnes chargées pour une comparaison
+COMPARISON_FIELDS = (
+    'domain',
+    'url',
+    'risk_level',
+    'readability_score',
+    'data_sharing',
+    'retention_period',
+    'created_at',
+)
+
+
+def _compare_analysis(url, deadline):
+    """Analyse d'un site manquant d'une comparaison (thread du pool)"""
+    with trace_analysis(urlparse(url).netloc.lower()) as trace:
         try:
-            analysis = WebsiteAnalysis.objects.create(
-                domain=domain,
-                url=url,
-                summary=f"Erreur lors de l'analyse: {str(e)}",
-                is_successful=False,
-                error_message=str(e)
-            )
-            
-            return Response({
-                'success': False,
-                'message': f'Erreur lors de l\'analyse: {str(e)}',
-                'data': WebsiteAnalysisSerializer(analysis).data
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-        except:
-            return Response({
-                'success': False,
-                'message': f'Erreur critique lors de l\'analyse: {str(e)}',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            pipeline = AnalysisPipeline(url, deadline)
+            analysis = pipeline.run()
+            if pipeline.no_documents:
+                trace.outcome = 'no_documents'
+                raise ValueError("Aucun document juridique détecté")
+            trace.outcome = 'success'
+            return analysis
+        except DeadlineExceeded:
+            trace.outcome = 'cancelled' if deadline.is_cancelled else 'timeout'
+            raise
+        finally:
+            # Connexion propre au thread du pool
+            connection.close()
 
 
 @api_view(['GET'])
@@ -202,6 +359,113 @@ def list_analyses(request):
     })
 
 
+@api_view(['GET'])
+def stats(request):
+    """
+    Statistiques agrégées des analyses : répartition des risques, lisibilité
+    moyenne et classements des domaines
+    
+    GET /api/stats/
+    
+    Servies depuis des tables précalculées, mises à jour à chaque analyse et
+    recalculées périodiquement (manage.py refresh_stats).
+    """
+    
+    return Response({
+        'success': True,
+        'message': 'Statistiques des analyses',
+        'data': get_stats()
+    })
+
+
+@require_GET
+def export_analyses(request):
+    """
+    Export de toutes les analyses et de leurs documents (administrateurs)
+    
+    GET /api/export/?format=ndjson|csv&fields=domain,risk_level,documents.url&gzip=1
+    
+    Réponse en flux, lue par lots en base : la mémoire utilisée ne dépend
+    pas du nombre d'analyses. Vue Django simple : le paramètre `format`
+    ne doit pas être interprété par la négociation de contenu DRF.
+    """
+    
+    if not request.user.is_staff:
+        return JsonResponse({
+            'success': False,
+            'message': 'Export réservé aux administrateurs'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    export_format = request.GET.get('format', 'ndjson').lower()
+    if export_format not in FORMATS:
+        return JsonResponse({
+            'success': False,
+            'message': f"Format inconnu: {export_format} (formats: {', '.join(FORMATS)})"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        fields, document_fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"analyses-{timezone.now():%Y%m%d-%H%M%S}.{export_format}{'.gz' if compress else ''}"
+    content_type = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson'
+    
+    response = StreamingHttpResponse(
+        export_stream(export_format, fields, document_fields, compress, settings.EXPORT_CHUNK_SIZE),
+        content_type='application/gzip' if compress else content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _snapshot_response(request, domain, variant):
+    snapshot = get_snapshot(domain, variant)
+    if snapshot is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Aucune analyse trouvée pour ce domaine'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    payload, etag = snapshot
+    if etag_matches(request.headers.get('If-None-Match', ''), etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.SNAPSHOT_MAX_AGE}'
+    return response
+
+
+@require_GET
+def snapshot(request, domain):
+    """
+    Analyse publiée d'un domaine (mêmes champs que la clé `data` de
+    GET /api/analysis/{domain}/), sérialisée à l'écriture
+    
+    GET /api/snapshot/{domain}/
+    
+    Les octets précalculés sont renvoyés tels quels, avec un ETag fort
+    (304 si If-None-Match correspond). Vue Django simple : pas de
+    sérialisation ni de négociation de contenu DRF.
+    """
+    
+    return _snapshot_response(request, domain, 'payload')
+
+
+@require_GET
+def badge(request, domain):
+    """
+    Badge d'un domaine pour le widget intégré : domaine, niveau de risque
+    et score de lisibilité
+    
+    GET /api/badge/{domain}/
+    """
+    
+    return _snapshot_response(request, domain, 'badge')
+
+
 @api_view(['GET'])
 def health_check(request):
     """
@@ -216,3 +480,20 @@ def health_check(request):
         'timestamp': timezone.now().isoformat()
     })
 
+
+@require_GET
+def metrics(request):
+    """
+    Métriques du pipeline d'analyse au format texte Prometheus
+
+    GET /api/metrics/
+
+    Les valeurs sont propres au processus : chaque worker est interrogé
+    séparément (ou agrégé par Prometheus via les étiquettes d'instance).
+    Vue Django simple : pas de négociation de contenu DRF pour le scraper.
+    """
+
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
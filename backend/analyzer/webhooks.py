@@ -0,0 +1,342 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from rest_framework.renderers import JSONRenderer
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+
+from .metrics import WEBHOOK_DELIVERIES
+from .models import AnalysisSnapshot, WebhookDelivery, WebsiteAnalysis
+from .serializers import WebsiteAnalysisSerializer
+
+logger = logging.getLogger(__name__)
+
+
+SIGNATURE_HEADER = 'X-GuardClause-Signature'
+EVENT = 'analysis.completed'
+
+# Envoi resté « en cours » plus longtemps (worker arrêté) : à reprendre
+STALE_CLAIM = timedelta(minutes=5)
+
+# Délai maximal entre deux tentatives
+MAX_RETRY_DELAY = 6 * 3600
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Signature HMAC-SHA256 de `<timestamp>.<corps>`, envoyée dans l'en-tête
+    X-GuardClause-Signature sous la forme `t=<timestamp>,v1=<signature>`
+
+    Le destinataire recalcule la signature avec la même clé et rejette les
+    horodatages trop anciens (rejeu).
+    """
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def _allowed_addresses(host: str, port: Optional[int] = None) -> List[str]:
+    """
+    Adresses IP de l'hôte, dans l'ordre de la résolution
+
+    Raises:
+        socket.gaierror: Hôte introuvable
+        ValueError: Une adresse privée ou locale (sauf WEBHOOK_ALLOW_PRIVATE)
+    """
+    addresses = list(dict.fromkeys(
+        info[4][0] for info in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)))
+    if not settings.WEBHOOK_ALLOW_PRIVATE:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])
+            if not ip.is_global:
+                raise ValueError(f"Adresse non autorisée pour une URL de rappel: {host}")
+    return addresses
+
+
+def validate_callback_url(url: str):
+    """
+    Refuse les URLs de rappel vers le réseau interne (sauf WEBHOOK_ALLOW_PRIVATE)
+
+    Vérifiée à l'enregistrement, puis de nouveau à chaque connexion (voir
+    `_CallbackConnectionMixin`) : un nom d'hôte peut pointer ensuite vers
+    une autre adresse.
+
+    Raises:
+        ValueError: Adresse privée, locale ou hôte introuvable
+    """
+    if settings.WEBHOOK_ALLOW_PRIVATE:
+        return
+    host = urlparse(url).hostname or ''
+    try:
+        _allowed_addresses(host)
+    except socket.gaierror:
+        raise ValueError(f"Hôte introuvable: {host}")
+
+
+class _CallbackConnectionMixin:
+    """
+    Connexion urllib3 ouverte sur une adresse vérifiée au moment même de la
+    connexion (TLS et en-tête Host gardent le nom d'hôte) : pas de seconde
+    résolution DNS entre la vérification et l'envoi
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = _allowed_addresses(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for address in addresses:
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except ConnectTimeoutError as e:
+                # Inclut NewConnectionError : adresse suivante
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+class _CallbackHTTPConnection(_CallbackConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CallbackHTTPSConnection(_CallbackConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CallbackHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CallbackHTTPConnection
+
+
+class _CallbackHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CallbackHTTPSConnection
+
+
+class CallbackAdapter(HTTPAdapter):
+    """Adaptateur requests des notifications : adresses vérifiées à la connexion"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CallbackHTTPConnectionPool,
+            'https': _CallbackHTTPSConnectionPool,
+        }
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_callback_session() -> requests.Session:
+    """
+    Session des notifications, distincte de celle du scraper (HTTP/2, cache
+    DNS) : résolution du système vérifiée à chaque connexion, sans proxy
+    de l'environnement. Recréée après un fork.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            session.trust_env = False
+            session.mount('http://', CallbackAdapter())
+            session.mount('https://', CallbackAdapter())
+            _session = session
+            _session_pid = pid
+    return _session
+
+
+def register_callback(domain: str, callback_url: str, secret: str = '') -> WebhookDelivery:
+    """Notification à envoyer à la fin de la prochaine analyse du domaine"""
+    return WebhookDelivery.objects.create(domain=domain, callback_url=callback_url, secret=secret)
+
+
+def notify_completion(analysis: WebsiteAnalysis) -> int:
+    """
+    Fin de l'analyse d'un domaine : ses notifications en attente passent
+    à l'envoi, effectué en arrière-plan après la transaction
+
+    Returns:
+        int: Nombre de notifications à envoyer
+    """
+    count = WebhookDelivery.objects.filter(domain=analysis.domain, status='waiting').update(
+        status='pending', analysis=analysis, next_attempt_at=timezone.now())
+    if count:
+        transaction.on_commit(schedule_dispatch)
+    return count
+
+
+_executor = None
+_executor_pid = None
+_scheduled = threading.Event()
+_executor_lock = threading.Lock()
+
+
+def schedule_dispatch():
+    """
+    Envoi en arrière-plan des notifications dues, après WEBHOOK_BATCH_WINDOW
+    secondes : les analyses terminées entre-temps (comparaisons, reprises en
+    lot) vers la même URL partent dans une seule requête
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='webhooks')
+            _executor_pid = pid
+            _scheduled.clear()
+        if _scheduled.is_set():
+            return
+        _scheduled.set()
+        _executor.submit(_dispatch)
+
+
+def _dispatch():
+    time.sleep(settings.WEBHOOK_BATCH_WINDOW)
+    _scheduled.clear()
+    try:
+        deliver_due()
+    except Exception as e:
+        logger.error(f"Envoi des notifications interrompu: {str(e)}")
+    finally:
+        # Connexion propre au thread d'envoi
+        connection.close()
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(settings.WEBHOOK_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def _render_analysis(analysis_id: int, snapshots: Dict[int, bytes]) -> bytes:
+    # Analyse réussie : réponse déjà sérialisée (/api/snapshot/)
+    if analysis_id in snapshots:
+        return snapshots[analysis_id]
+    analysis = WebsiteAnalysis.objects.prefetch_related('documents').get(pk=analysis_id)
+    return JSONRenderer().render(WebsiteAnalysisSerializer(analysis).data)
+
+
+def _claim(limit: int) -> List[WebhookDelivery]:
+    """Réserve les notifications dues (un seul worker envoie chacune)"""
+    now = timezone.now()
+    WebhookDelivery.objects.filter(status='sending', updated_at__lt=now - STALE_CLAIM).update(
+        status='pending', claim='')
+    WebhookDelivery.objects.filter(status='waiting', created_at__lt=now - timedelta(
+        seconds=settings.WEBHOOK_WAIT_TTL)).update(status='expired')
+
+    due = list(WebhookDelivery.objects.filter(status='pending', next_attempt_at__lte=now).order_by(
+        'next_attempt_at').values_list('pk', flat=True)[:limit])
+    token = uuid.uuid4().hex
+    WebhookDelivery.objects.filter(pk__in=due, status='pending').update(status='sending', claim=token)
+    return list(WebhookDelivery.objects.filter(claim=token, status='sending').order_by('pk'))
+
+
+def deliver_due(limit: int = 500) -> Counter:
+    """
+    Envoie les notifications dues, regroupées par URL de rappel et clé (au
+    plus WEBHOOK_BATCH_SIZE analyses par requête)
+
+    Chaque requête POST porte un corps JSON
+    `{"event": "analysis.completed", "deliveries": [...], "analyses": [...]}`
+    signé (X-GuardClause-Signature). Une réponse 2xx vaut accusé de
+    réception ; sinon nouvelle tentative avec un délai doublé à chaque fois.
+
+    Returns:
+        Counter: Notifications envoyées (delivered), reportées (retried) et en échec (failed)
+    """
+    deliveries = _claim(limit)
+    report = Counter(delivered=0, retried=0, failed=0)
+    if not deliveries:
+        return report
+
+    snapshots = dict(AnalysisSnapshot.objects.filter(
+        analysis_id__in={delivery.analysis_id for delivery in deliveries}
+    ).values_list('analysis_id', 'payload'))
+    snapshots = {analysis_id: bytes(payload) for analysis_id, payload in snapshots.items()}
+
+    groups = defaultdict(list)
+    for delivery in deliveries:
+        groups[(delivery.callback_url, delivery.secret or settings.WEBHOOK_SECRET)].append(delivery)
+
+    for (callback_url, secret), group in groups.items():
+        for start in range(0, len(group), settings.WEBHOOK_BATCH_SIZE):
+            batch = group[start:start + settings.WEBHOOK_BATCH_SIZE]
+            report.update(_post(callback_url, secret, batch, snapshots))
+    return report
+
+
+def _post(callback_url: str, secret: str, batch: List[WebhookDelivery], snapshots: Dict[int, bytes]) -> Counter:
+    analyses = []
+    for analysis_id in dict.fromkeys(delivery.analysis_id for delivery in batch):
+        analyses.append(_render_analysis(analysis_id, snapshots))
+    body = (
+        b'{"event":' + json.dumps(EVENT).encode()
+        + b',"deliveries":' + json.dumps([delivery.pk for delivery in batch]).encode()
+        + b',"analyses":[' + b','.join(analyses) + b']}'
+    )
+
+    error: Optional[str] = None
+    try:
+        # Redirection non suivie (vers le réseau interne par exemple) : échec
+        response = get_callback_session().post(
+            callback_url, data=body, timeout=settings.WEBHOOK_TIMEOUT, allow_redirects=False, headers={
+                'Content-Type': 'application/json',
+                SIGNATURE_HEADER: sign(secret, int(time.time()), body),
+            })
+        if not 200 <= response.status_code < 300:
+            error = f"HTTP {response.status_code}"
+    except Exception as e:
+        error = str(e)
+
+    pks = [delivery.pk for delivery in batch]
+    now = timezone.now()
+    if error is None:
+        WebhookDelivery.objects.filter(pk__in=pks).update(
+            status='delivered', delivered_at=now, claim='', last_error='')
+        WEBHOOK_DELIVERIES.inc(len(batch), outcome='delivered')
+        return Counter(delivered=len(batch))
+
+    outcomes = Counter()
+    for delivery in batch:
+        delivery.attempts += 1
+        delivery.claim = ''
+        delivery.last_error = error
+        delivery.updated_at = now
+        if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            delivery.status = 'failed'
+            outcomes['failed'] += 1
+        else:
+            delivery.status = 'pending'
+            delivery.next_attempt_at = now + timedelta(seconds=_retry_delay(delivery.attempts))
+            outcomes['retried'] += 1
+    WebhookDelivery.objects.bulk_update(
+        batch, ['attempts', 'claim', 'last_error', 'updated_at', 'status', 'next_attempt_at'])
+    for outcome, count in outcomes.items():
+        WEBHOOK_DELIVERIES.inc(count, outcome=outcome)
+    logger.warning(f"Notification vers {callback_url} en échec ({error}), {len(batch)} analyse(s)")
+    return outcomes
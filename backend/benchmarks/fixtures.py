@@ -0,0 +1,293 @@
+"""
+Fixtures hors ligne des benchmarks : sites juridiques servis en local et
+endpoint LLM compatible OpenAI simulé
+
+Les sites sont joignables sous des noms `site-<n>.bench.test` résolus vers
+la boucle locale : chaque analyse peut ainsi cibler un domaine distinct
+(caches froids) tout en étant servie par un seul serveur.
+"""
+import json
+import mimetypes
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+BENCH_DOMAIN = '.bench.test'
+
+# {chemin: (Content-Type, corps)}
+Site = Dict[str, Tuple[str, bytes]]
+
+_CLAUSES = [
+    "Le prestataire collecte les données personnelles nécessaires à la fourniture du service.",
+    "Les données sont conservées pendant la durée de la relation contractuelle puis archivées.",
+    "L'utilisateur dispose d'un droit d'accès, de rectification et d'effacement de ses données.",
+    "Les informations peuvent être transmises aux sous-traitants techniques du prestataire.",
+    "Le prestataire se réserve le droit de modifier les présentes conditions à tout moment.",
+    "Tout litige relève de la compétence exclusive des tribunaux du siège du prestataire.",
+    "Des cookies de mesure d'audience sont déposés sous réserve du consentement de l'utilisateur.",
+]
+
+_NAV = ''.join(f'<li><a href="/rubrique-{i}">Rubrique {i}</a></li>' for i in range(25))
+
+
+def _document(title: str, size: int, rng: random.Random) -> bytes:
+    paragraphs = []
+    total = 0
+    article = 1
+    while total < size:
+        text = ' '.join(rng.choice(_CLAUSES) for _ in range(4))
+        paragraphs.append(f'<h2>Article {article}</h2><p>{text}</p>')
+        total += len(text) + 30
+        article += 1
+    return (
+        f'<html><head><title>{title}</title></head><body>'
+        f'<nav><ul>{_NAV}</ul></nav><main><h1>{title}</h1>{"".join(paragraphs)}</main>'
+        f'<footer><p>Ce site utilise des cookies. En savoir plus.</p></footer></body></html>'
+    ).encode()
+
+
+def generate_sites(size: int = 30000, seed: int = 42) -> List[Site]:
+    """
+    Sites de référence déterministes, couvrant les trois modes de découverte :
+    liens en pied de page, sitemap seul, et URLs communes (document texte)
+    """
+    rng = random.Random(seed)
+    html = 'text/html; charset=utf-8'
+
+    footer_site: Site = {
+        '/': (html, (
+            f'<html><body><nav><ul>{_NAV}</ul></nav><main><p>Bienvenue</p></main><footer>'
+            '<a href="/cgu">Conditions générales d\'utilisation</a>'
+            '<a href="/politique-de-confidentialite">Politique de confidentialité</a>'
+            '<a href="/cookies">Cookies</a></footer></body></html>'
+        ).encode()),
+        '/cgu': (html, _document("Conditions générales d'utilisation", size, rng)),
+        '/politique-de-confidentialite': (html, _document("Politique de confidentialité", size, rng)),
+        '/cookies': (html, _document("Politique cookies", size // 3, rng)),
+    }
+
+    urls = ''.join(f'<url><loc>{{root}}/blog/article-{i}</loc></url>' for i in range(300))
+    sitemap_site: Site = {
+        '/': (html, f'<html><body><nav><ul>{_NAV}</ul></nav><main><p>Accueil</p></main></body></html>'.encode()),
+        '/robots.txt': ('text/plain', b'User-agent: *\nSitemap: {root}/sitemap.xml\n'),
+        '/sitemap.xml': ('application/xml', (
+            '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'{urls}<url><loc>{{root}}/legal/privacy-policy</loc></url>'
+            '<url><loc>{root}/legal/terms-of-service</loc></url></urlset>'
+        ).encode()),
+        '/legal/privacy-policy': (html, _document("Privacy policy", size, rng)),
+        '/legal/terms-of-service': (html, _document("Terms of service", size, rng)),
+    }
+
+    text = '\n\n'.join(' '.join(rng.choice(_CLAUSES) for _ in range(3)) for _ in range(size // 300))
+    common_site: Site = {
+        '/': (html, b'<html><body><div id="app"></div></body></html>'),
+        '/cgv': ('text/plain; charset=utf-8', text.encode()),
+        '/mentions-legales': (html, _document("Mentions légales", size // 2, rng)),
+    }
+
+    return [footer_site, sitemap_site, common_site]
+
+
+def load_recorded_sites(directory: str) -> List[Site]:
+    """
+    Charge des sites enregistrés : un sous-répertoire par site, un fichier
+    par chemin (`index.html` pour la page d'accueil)
+    """
+    sites = []
+    for name in sorted(os.listdir(directory)):
+        root = os.path.join(directory, name)
+        if not os.path.isdir(root):
+            continue
+        site: Site = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                url_path = '/' + os.path.relpath(path, root).replace(os.sep, '/')
+                if url_path.endswith('/index.html'):
+                    url_path = url_path[:-len('index.html')]
+                content_type = mimetypes.guess_type(filename)[0] or 'text/html'
+                with open(path, 'rb') as f:
+                    site[url_path] = (content_type, f.read())
+        sites.append(site)
+    return sites
+
+
+def install_resolver():
+    """Résout les noms `*.bench.test` vers 127.0.0.1 (à appeler avant la création de la session HTTP)"""
+    original = socket.getaddrinfo
+    if getattr(original, 'bench_resolver', False):
+        return
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if isinstance(host, str) and host.endswith(BENCH_DOMAIN):
+            host = '127.0.0.1'
+        return original(host, port, *args, **kwargs)
+
+    getaddrinfo.bench_resolver = True
+    socket.getaddrinfo = getaddrinfo
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Connexions keep-alive fermées par le client en fin de mesure
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _BaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _send(self, status_code: int, content_type: str, body: bytes, head: bool = False):
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Serveur des sites de référence : `site-<n>.bench.test` sert le site
+    `n % len(sites)`, avec une latence simulée par requête
+    """
+
+    def __init__(self, sites: List[Site], latency: float = 0.0, jitter: float = 0.0):
+        self.sites = sites
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        fixture = self
+
+        class Handler(_BaseHandler):
+            def do_GET(self):
+                fixture._serve(self, head=False)
+
+            def do_HEAD(self):
+                fixture._serve(self, head=True)
+
+        self._server = _Server(('127.0.0.1', 0), Handler)
+        self.port = self._server.server_port
+
+    def url(self, n: int) -> str:
+        return f'http://site-{n}{BENCH_DOMAIN}:{self.port}/'
+
+    def _serve(self, handler: BaseHTTPRequestHandler, head: bool):
+        self.requests += 1
+        host = handler.headers.get('Host', '')
+        name = host.split(':')[0]
+        try:
+            index = int(name.split('.')[0].rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            index = 0
+        site = self.sites[index % len(self.sites)]
+
+        delay = self.latency + (random.random() * self.jitter if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        path = handler.path.split('?')[0]
+        if path not in site:
+            handler._send(404, 'text/plain', b'not found', head)
+            return
+        content_type, body = site[path]
+        if b'{root}' in body:
+            body = body.replace(b'{root}', f'http://{host}'.encode())
+        handler._send(200, content_type, body, head)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+MOCK_ANALYSIS = {
+    'summary': "Le service collecte des données personnelles pour fournir ses prestations.",
+    'what_you_accept': "Les conditions générales d'utilisation du service.",
+    'data_collected': "Identité, coordonnées, données de navigation.",
+    'data_usage': "Fourniture du service et mesure d'audience.",
+    'data_sharing': "Sous-traitants techniques.",
+    'retention_period': "Durée de la relation contractuelle.",
+    'critical_points': "Modification unilatérale des conditions.",
+    'key_points': ["Collecte limitée", "Droit d'effacement", "Cookies soumis au consentement"],
+    'readability_score': 6,
+    'risk_level': 'moderate',
+    'risk_explanation': "Clauses usuelles.",
+}
+
+
+class MockLLMServer:
+    """
+    Endpoint `/v1/chat/completions` compatible OpenAI
+
+    Latence simulée : `ttft` (premier token) + `completion_tokens` × `token_latency`.
+    """
+
+    def __init__(self, ttft: float = 0.2, token_latency: float = 0.0, completion_tokens: int = 400):
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.completion_tokens = completion_tokens
+        self.requests = 0
+        mock = self
+
+        class Handler(_BaseHandler):
+            def do_POST(self):
+                mock._complete(self)
+
+        self._server = _Server(('127.0.0.1', 0), Handler)
+        self.port = self._server.server_port
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}/v1'
+
+    def _complete(self, handler: BaseHTTPRequestHandler):
+        self.requests += 1
+        length = int(handler.headers.get('Content-Length') or 0)
+        payload = json.loads(handler.rfile.read(length) or b'{}')
+        prompt_chars = sum(len(message.get('content') or '') for message in payload.get('messages', []))
+
+        time.sleep(self.ttft + self.completion_tokens * self.token_latency)
+
+        content = '```json\n' + json.dumps(MOCK_ANALYSIS, ensure_ascii=False) + '\n```'
+        body = json.dumps({
+            'id': f'chatcmpl-bench-{self.requests}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'bench'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_chars // 4,
+                'completion_tokens': self.completion_tokens,
+                'total_tokens': prompt_chars // 4 + self.completion_tokens,
+            },
+        }).encode()
+        handler._send(200, 'application/json', body)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,84 @@
+"""
+Benchmark de l'analyse des pages (HTML -> blocs de texte, liens juridiques)
+
+Simule des analyses parallèles dans un worker multi-threads : chaque thread
+analyse des pages juridiques volumineuses, soit directement (GIL partagé),
+soit via le pool de processus d'analyse.
+
+    python benchmarks/parsing_benchmark.py --threads 8 --pages 64 --processes 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+
+from analyzer import parsing_service  # noqa: E402
+
+
+def make_page(size: int) -> bytes:
+    menu = ''.join(f'<li><a href="/rubrique-{i}">Rubrique {i}</a></li>' for i in range(60))
+    footer = '<a href="/cgu">CGU</a><a href="/privacy-policy">Confidentialité</a><a href="/cookies">Cookies</a>'
+    article = '<p>Article {i} : le prestataire collecte les données personnelles nécessaires au service.</p>'
+    body = ''.join(article.format(i=i) for i in range(size // 90))
+    return f'<html><body><ul class="menu">{menu}</ul><main>{body}</main><div>{footer}</div></body></html>'.encode()
+
+
+def run(mode: str, page: bytes, pages: int, threads: int, processes: int) -> dict:
+    parsing_service._reset_pool(parsing_service.get_parse_pool())
+    with override_settings(PARSER_PROCESSES=processes if mode == 'process_pool' else 0):
+        if mode == 'process_pool':
+            # Démarrage des processus hors mesure
+            list(ThreadPoolExecutor(processes).map(lambda _: parsing_service.parse_links(b'<a href="/cgu">x</a>', 'https://a.fr/'), range(processes)))
+
+        def analyse(_):
+            parsing_service.parse_links(page, 'https://exemple.fr/')
+            return len(parsing_service.parse_document(page, 'text/html', 'https://exemple.fr/cgu')['blocks'])
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(analyse, range(pages)))
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+    return {
+        'mode': mode,
+        'pages': pages,
+        'threads': threads,
+        'processes': processes if mode == 'process_pool' else 0,
+        'elapsed_s': round(elapsed, 3),
+        'pages_per_s': round(pages / elapsed, 1),
+        'caller_cpu_s': round(cpu, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--size', type=int, default=200000, help="Taille approximative des pages (octets)")
+    args = parser.parse_args()
+
+    page = make_page(args.size)
+    results = [
+        run(mode, page, args.pages, args.threads, args.processes)
+        for mode in ('in_thread', 'process_pool')
+    ]
+    print(json.dumps({'cpu_count': os.cpu_count(), 'page_bytes': len(page), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
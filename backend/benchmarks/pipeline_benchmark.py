@@ -0,0 +1,239 @@
+"""
+Benchmark hors ligne du pipeline d'analyse de bout en bout
+
+Sites juridiques servis en local (latence et taille configurables) et
+endpoint LLM simulé ; trois cibles mesurées à plusieurs niveaux de
+concurrence :
+
+- extractor : DocumentExtractor.extract_all_documents
+- llm       : analyze_legal_documents (documents déjà extraits)
+- analyze   : POST /api/analyze/ (base de test temporaire)
+
+Le résultat JSON (percentiles, débit, mémoire, temps par étape) est
+comparable d'un commit à l'autre :
+
+    python benchmarks/pipeline_benchmark.py --concurrency 1,4,16 --requests 48 --output bench.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from benchmarks.fixtures import FixtureServer, MockLLMServer, generate_sites, install_resolver, load_recorded_sites  # noqa: E402
+
+TARGETS = ('extractor', 'llm', 'analyze')
+# Numéro de site partagé par les cibles : un domaine n'est jamais réanalysé à froid
+_site_numbers = itertools.count()
+
+STAGES = ('discovery', 'fetch', 'parse', 'render', 'clean', 'prompt_build', 'llm', 'json_parse', 'db_write')
+
+
+def percentile(values, q: float) -> float:
+    """Percentile par rang le plus proche (valeurs triées)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Workload:
+    """Fabrique des opérations à mesurer pour une cible donnée"""
+
+    def __init__(self, target: str, fixture: FixtureServer, warm: bool):
+        self.target = target
+        self.fixture = fixture
+        self.warm = warm
+        self._local = threading.local()
+        self._documents = None
+
+    def _site_url(self) -> str:
+        n = next(_site_numbers)
+        # Caches chauds : toujours les mêmes domaines ; sinon un domaine neuf par analyse
+        return self.fixture.url(n % len(self.fixture.sites) if self.warm else n)
+
+    def prepare(self):
+        if self.target == 'llm':
+            from analyzer.document_extractor import DocumentExtractor
+            self._documents, _ = DocumentExtractor().extract_all_documents(self.fixture.url(0))
+
+    def __call__(self) -> bool:
+        if self.target == 'extractor':
+            from analyzer.document_extractor import DocumentExtractor
+            documents, _ = DocumentExtractor().extract_all_documents(self._site_url())
+            return bool(documents)
+
+        if self.target == 'llm':
+            from analyzer.llm_utils import analyze_legal_documents
+            result = analyze_legal_documents(self._documents, 'site-0.bench.test')
+            return not result['summary'].startswith('Erreur')
+
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+        response = client.post('/api/analyze/', {'url': self._site_url()}, content_type='application/json')
+        return response.status_code == 200
+
+
+def run_level(workload: Workload, concurrency: int, requests: int, trace_memory: bool) -> dict:
+    from analyzer.metrics import STAGE_SECONDS, registry
+
+    cache.clear()
+    registry.clear()
+    if trace_memory:
+        tracemalloc.reset_peak()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def task(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = workload()
+        except Exception:
+            ok = False
+        finally:
+            connections.close_all()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(task, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    stages = {
+        stage: round(STAGE_SECONDS.sum(stage=stage) / STAGE_SECONDS.count(stage=stage) * 1000, 3)
+        for stage in STAGES if STAGE_SECONDS.count(stage=stage)
+    }
+    result = {
+        'target': workload.target,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'stage_mean_ms': stages,
+    }
+    if trace_memory:
+        result['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default=','.join(TARGETS), help="Cibles séparées par des virgules")
+    parser.add_argument('--concurrency', default='1,4,16', help="Niveaux de concurrence")
+    parser.add_argument('--requests', type=int, default=32, help="Opérations par niveau")
+    parser.add_argument('--sites', help="Répertoire de sites enregistrés (un sous-répertoire par site)")
+    parser.add_argument('--size', type=int, default=30000, help="Taille des documents générés (octets)")
+    parser.add_argument('--latency', type=float, default=0.01, help="Latence des sites (secondes)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variation aléatoire de la latence")
+    parser.add_argument('--llm-ttft', type=float, default=0.2, help="Délai avant le premier token (secondes)")
+    parser.add_argument('--llm-token-latency', type=float, default=0.0, help="Délai par token généré")
+    parser.add_argument('--llm-completion-tokens', type=int, default=400)
+    parser.add_argument('--warm', action='store_true', help="Réutiliser les mêmes domaines (caches chauds)")
+    parser.add_argument('--trace-memory', action='store_true', help="Pic d'allocation Python (tracemalloc, plus lent)")
+    parser.add_argument('--output', help="Fichier JSON de sortie (sortie standard sinon)")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    install_resolver()
+    sites = load_recorded_sites(args.sites) if args.sites else generate_sites(args.size)
+    fixture = FixtureServer(sites, args.latency, args.jitter).start()
+    llm = MockLLMServer(args.llm_ttft, args.llm_token_latency, args.llm_completion_tokens).start()
+    settings.LLM_API_BASE = llm.base_url
+    settings.LLM_API_KEY = 'benchmark'
+
+    setup_test_environment()
+    old_database = connection.creation.create_test_db(verbosity=0)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    results = []
+    try:
+        for target in args.targets.split(','):
+            workload = Workload(target.strip(), fixture, args.warm)
+            workload.prepare()
+            for concurrency in (int(level) for level in args.concurrency.split(',')):
+                results.append(run_level(workload, concurrency, args.requests, args.trace_memory))
+    finally:
+        connection.creation.destroy_test_db(old_database, verbosity=0)
+        teardown_test_environment()
+        fixture.stop()
+        llm.stop()
+
+    report = {
+        'commit': git_commit(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'sites': args.sites or f'generated:{len(sites)}',
+            'document_size': args.size,
+            'site_latency_s': args.latency,
+            'llm_ttft_s': args.llm_ttft,
+            'llm_token_latency_s': args.llm_token_latency,
+            'llm_completion_tokens': args.llm_completion_tokens,
+            'warm_caches': args.warm,
+            'parser_processes': settings.PARSER_PROCESSES,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark du transport HTTP du scraper
+
+Compare l'ancien comportement (une session requests par analyse) à la
+session partagée du processus, sur des analyses répétées de sites
+co-hébergés servis par un serveur local (adresses de loopback distinctes).
+
+    python benchmarks/transport_benchmark.py --analyses 200 --latency 0.002
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+
+from analyzer.http_transport import USER_AGENT, dns_cache, get_session, reset_session  # noqa: E402
+
+SITES = ['127.0.0.1', '127.0.0.2', '127.0.0.3', 'localhost']
+DOCUMENT_PATHS = ['/', '/cgu', '/privacy-policy', '/cookies', '/mentions-legales']
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def make_handler(latency: float, body: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def run(mode: str, port: int, analyses: int, server: CountingServer) -> dict:
+    server.connections = 0
+    reset_session()
+    dns_cache.clear()
+    dns_cache.hits = dns_cache.misses = 0
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(analyses):
+        if mode == 'shared':
+            session = get_session()
+        else:
+            session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT})
+        host = SITES[i % len(SITES)]
+        for path in DOCUMENT_PATHS:
+            t0 = time.perf_counter()
+            session.get(f'http://{host}:{port}{path}', timeout=5).content
+            latencies.append(time.perf_counter() - t0)
+        if mode != 'shared':
+            session.close()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'analyses': analyses,
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 4),
+        'analyses_per_s': round(analyses / elapsed, 1),
+        'tcp_connections': server.connections,
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        'dns_lookups': dns_cache.misses if mode == 'shared' else None,
+        'dns_cache_hits': dns_cache.hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--analyses', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence serveur simulée (secondes)")
+    parser.add_argument('--size', type=int, default=20000, help="Taille des pages (octets)")
+    args = parser.parse_args()
+
+    body = (b'<html><body><p>' + b'Clause. ' * (args.size // 8) + b'</p></body></html>')
+    server = CountingServer(('0.0.0.0', 0), make_handler(args.latency, body))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    try:
+        results = [run(mode, port, args.analyses, server) for mode in ('session_per_analysis', 'shared')]
+    finally:
+        server.shutdown()
+        server.server_close()
+        reset_session()
+        dns_cache.uninstall()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Configuration gunicorn : `gunicorn -c gunicorn.conf.py legal_analyzer.wsgi:application`
+
+Avec `preload_app`, l'application est chargée et préchauffée (wsgi.py,
+WARM_UP_ON_LOAD) une seule fois dans le processus maître ; les workers en
+héritent par fork au lieu de tout réimporter, et démarrent aussitôt.
+"""
+import gc
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = config('GUNICORN_WORKERS', default=3, cast=int)
+# Au-delà du budget d'une analyse (ANALYSIS_DEADLINE)
+timeout = config('GUNICORN_TIMEOUT', default=180, cast=int)
+preload_app = config('GUNICORN_PRELOAD', default=True, cast=bool)
+
+
+def when_ready(server):
+    # Objets chargés par le maître écartés du ramasse-miettes : les workers
+    # ne les réécrivent pas, les pages mémoire restent partagées
+    if preload_app:
+        gc.freeze()
+
@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
+import json
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'analyzer.deadline.ClientDisconnectMiddleware',
 ]
 
 ROOT_URLCONF = 'legal_analyzer.urls'
@@ -161,3 +163,127 @@ CORS_ALLOW_CREDENTIALS = True
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 OPENAI_API_BASE = config('OPENAI_API_BASE', default='https://api.openai.com/v1')
 
+# Fournisseur LLM compatible OpenAI utilisé pour l'analyse (HF_TOKEN accepté comme clé)
+LLM_API_BASE = config('LLM_API_BASE', default='https://router.huggingface.co/v1')
+LLM_API_KEY = config('LLM_API_KEY', default=config('HF_TOKEN', default=''))
+LLM_MODEL = config('LLM_MODEL', default='deepseek-ai/DeepSeek-V3.1:fireworks-ai')
+LLM_TIMEOUT = config('LLM_TIMEOUT', default=120.0, cast=float)
+
+# Plusieurs fournisseurs (JSON) : [{"name": "...", "base_url": "...", "model": "...",
+# "api_key": "..." ou "api_key_env": "NOM_DE_VARIABLE"}] ; vide : le fournisseur ci-dessus
+LLM_PROVIDERS = config('LLM_PROVIDERS', default='[]', cast=json.loads)
+# Requête dupliquée vers un second fournisseur si le premier tarde : délai fixe
+# (secondes) ou, à 0, adaptatif (latence moyenne + 3 écarts-types du fournisseur)
+LLM_HEDGE_ENABLED = config('LLM_HEDGE_ENABLED', default=True, cast=bool)
+LLM_HEDGE_DELAY = config('LLM_HEDGE_DELAY', default=0.0, cast=float)
+LLM_HEDGE_MIN_DELAY = config('LLM_HEDGE_MIN_DELAY', default=2.0, cast=float)
+# Moyennes mobiles exponentielles (latence, erreurs) et mise à l'écart
+# temporaire d'un fournisseur après des échecs consécutifs
+LLM_EWMA_ALPHA = config('LLM_EWMA_ALPHA', default=0.2, cast=float)
+LLM_FAILURE_THRESHOLD = config('LLM_FAILURE_THRESHOLD', default=3, cast=int)
+LLM_PROVIDER_COOLDOWN = config('LLM_PROVIDER_COOLDOWN', default=30.0, cast=float)
+
+
+# Budget de tokens du prompt d'analyse
+# LLM_TOKENIZER_PATH : fichier tokenizer.json local (estimation ~4 caractères/token sinon)
+LLM_TOKENIZER_PATH = config('LLM_TOKENIZER_PATH', default='')
+LLM_PROMPT_TOKEN_BUDGET = config('LLM_PROMPT_TOKEN_BUDGET', default=12000, cast=int)
+
+# Mode d'analyse : combined (un prompt pour tous les documents) ou per_type
+# (un prompt par type de document, en parallèle, résultats fusionnés)
+# LLM_SECTION_CACHE_TTL : conservation en base de l'analyse de chaque type (secondes)
+LLM_ANALYSIS_MODE = config('LLM_ANALYSIS_MODE', default='combined')
+LLM_SECTION_CACHE_TTL = config('LLM_SECTION_CACHE_TTL', default=7 * 86400, cast=int)
+
+# Durée de cache (secondes) des documents découverts via robots.txt/sitemap.xml
+SITEMAP_DISCOVERY_TTL = config('SITEMAP_DISCOVERY_TTL', default=86400, cast=int)
+
+# Cache des URLs de documents juridiques par domaine (secondes)
+# DISCOVERY_NEGATIVE_TTL : délai avant de réessayer un site sans document trouvé
+DISCOVERY_CACHE_TTL = config('DISCOVERY_CACHE_TTL', default=7 * 86400, cast=int)
+DISCOVERY_NEGATIVE_TTL = config('DISCOVERY_NEGATIVE_TTL', default=6 * 3600, cast=int)
+
+# Transport HTTP partagé du scraper
+# SCRAPER_HOST_LIMITS : limites de connexions propres à certains hôtes, ex. "cdn.example.com=2,legal.example.net=4"
+SCRAPER_HTTP2 = config('SCRAPER_HTTP2', default=False, cast=bool)
+SCRAPER_POOL_HOSTS = config('SCRAPER_POOL_HOSTS', default=100, cast=int)
+SCRAPER_MAX_CONNECTIONS_PER_HOST = config('SCRAPER_MAX_CONNECTIONS_PER_HOST', default=10, cast=int)
+SCRAPER_HOST_LIMITS = {
+    host.strip(): int(limit)
+    for host, limit in (item.split('=') for item in config('SCRAPER_HOST_LIMITS', default='', cast=Csv()))
+}
+SCRAPER_DNS_CACHE_TTL = config('SCRAPER_DNS_CACHE_TTL', default=300, cast=int)
+
+# Ordonnanceur de politesse du scraper (limites par hôte, ralentissement sur 429/503)
+SCRAPER_MAX_CONCURRENCY = config('SCRAPER_MAX_CONCURRENCY', default=32, cast=int)
+SCRAPER_HOST_CONCURRENCY = config('SCRAPER_HOST_CONCURRENCY', default=2, cast=int)
+SCRAPER_HOST_RATE = config('SCRAPER_HOST_RATE', default=5.0, cast=float)
+SCRAPER_HOST_BURST = config('SCRAPER_HOST_BURST', default=10.0, cast=float)
+SCRAPER_MAX_RETRIES = config('SCRAPER_MAX_RETRIES', default=2, cast=int)
+SCRAPER_BACKOFF_BASE = config('SCRAPER_BACKOFF_BASE', default=1.0, cast=float)
+SCRAPER_MAX_BACKOFF = config('SCRAPER_MAX_BACKOFF', default=30.0, cast=float)
+SCRAPER_MAX_CRAWL_DELAY = config('SCRAPER_MAX_CRAWL_DELAY', default=5.0, cast=float)
+
+# Rendu headless des pages construites en JavaScript (optionnel)
+# Nécessite : pip install playwright && playwright install chromium
+RENDER_FALLBACK_ENABLED = config('RENDER_FALLBACK_ENABLED', default=False, cast=bool)
+RENDER_POOL_SIZE = config('RENDER_POOL_SIZE', default=2, cast=int)
+RENDER_TIMEOUT = config('RENDER_TIMEOUT', default=15.0, cast=float)
+RENDER_MIN_TEXT_LENGTH = config('RENDER_MIN_TEXT_LENGTH', default=1000, cast=int)
+RENDER_MIN_TEXT_DENSITY = config('RENDER_MIN_TEXT_DENSITY', default=0.05, cast=float)
+
+# Pool de processus d'analyse HTML/PDF/DOCX (par worker) ; 0 pour analyser dans le thread
+PARSER_PROCESSES = config('PARSER_PROCESSES', default=2, cast=int)
+PARSER_TIMEOUT = config('PARSER_TIMEOUT', default=60.0, cast=float)
+
+# Profilage des analyses : à la demande (administrateurs, en-tête X-Profile ou
+# ?profile=cprofile|sampling) et échantillonnage d'une fraction du trafic
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SAMPLE_INTERVAL = config('PROFILING_SAMPLE_INTERVAL', default=0.005, cast=float)
+PROFILING_MAX_STORED = config('PROFILING_MAX_STORED', default=200, cast=int)
+PROFILING_MAX_BYTES = config('PROFILING_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+
+# Budget de temps d'une analyse (secondes), à garder sous le timeout du worker
+# (gunicorn --timeout) ; une part est réservée à l'appel LLM
+ANALYSIS_DEADLINE = config('ANALYSIS_DEADLINE', default=150.0, cast=float)
+ANALYSIS_LLM_RESERVE = config('ANALYSIS_LLM_RESERVE', default=60.0, cast=float)
+
+# Reprise des analyses interrompues : durée de validité de l'avancement
+# enregistré (secondes), nouvelles tentatives de l'appel LLM dans la requête
+# et nombre maximal de reprises automatiques (manage.py resume_analyses)
+ANALYSIS_CHECKPOINT_TTL = config('ANALYSIS_CHECKPOINT_TTL', default=24 * 3600, cast=int)
+ANALYSIS_LLM_RETRIES = config('ANALYSIS_LLM_RETRIES', default=1, cast=int)
+ANALYSIS_MAX_ATTEMPTS = config('ANALYSIS_MAX_ATTEMPTS', default=5, cast=int)
+
+# Comparaison de sites : nombre maximal de sites par requête et d'analyses
+# lancées en parallèle
+COMPARE_MAX_SITES = config('COMPARE_MAX_SITES', default=5, cast=int)
+COMPARE_WORKERS = config('COMPARE_WORKERS', default=4, cast=int)
+
+# Nombre de domaines par classement de /api/stats/
+STATS_LEADERBOARD_SIZE = config('STATS_LEADERBOARD_SIZE', default=10, cast=int)
+
+# Durée de cache navigateur/CDN (secondes) de /api/snapshot/ et /api/badge/,
+# revalidée ensuite par ETag
+SNAPSHOT_MAX_AGE = config('SNAPSHOT_MAX_AGE', default=60, cast=int)
+
+# Notifications de fin d'analyse (callback_url de POST /api/analyze/) :
+# clé HMAC par défaut, délai de réponse, tentatives (délai doublé à chaque
+# fois), analyses par requête et fenêtre de regroupement (secondes), durée
+# d'attente maximale d'une analyse, URLs du réseau local acceptées
+WEBHOOK_SECRET = config('WEBHOOK_SECRET', default='')
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=float)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_RETRY_DELAY = config('WEBHOOK_RETRY_DELAY', default=30, cast=float)
+WEBHOOK_BATCH_SIZE = config('WEBHOOK_BATCH_SIZE', default=50, cast=int)
+WEBHOOK_BATCH_WINDOW = config('WEBHOOK_BATCH_WINDOW', default=1.0, cast=float)
+WEBHOOK_WAIT_TTL = config('WEBHOOK_WAIT_TTL', default=86400, cast=int)
+WEBHOOK_ALLOW_PRIVATE = config('WEBHOOK_ALLOW_PRIVATE', default=DEBUG, cast=bool)
+
+# Préchauffage au chargement de wsgi/asgi (modules, parseur, clients LLM) :
+# une seule fois dans le processus maître avec gunicorn.conf.py (preload_app)
+WARM_UP_ON_LOAD = config('WARM_UP_ON_LOAD', default=True, cast=bool)
+
+# Export des analyses : nombre d'analyses lues par lot
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=500, cast=int)
@@ -25,8 +25,14 @@ def api_root(request):
         'version': '1.0.0',
         'endpoints': {
             'analyze': '/api/analyze/',
+            'compare': '/api/compare/',
             'analysis': '/api/analysis/{domain}/',
+            'snapshot': '/api/snapshot/{domain}/',
+            'badge': '/api/badge/{domain}/',
             'analyses': '/api/analyses/',
+            'stats': '/api/stats/',
+            'export': '/api/export/',
+            'metrics': '/api/metrics/',
             'health': '/api/health/',
             'admin': '/admin/'
         }
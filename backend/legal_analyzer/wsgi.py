@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_analyzer.settings')
 
 application = get_wsgi_application()
+
+# Préchauffage (une seule fois dans le processus maître avec preload_app)
+from django.conf import settings  # noqa: E402
+
+if settings.WARM_UP_ON_LOAD:
+    from analyzer.startup import warm_up
+
+    warm_up()